@@ -1,7 +1,7 @@
 # backend/app/api/routes/admin.py
 from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import logging
 import os
@@ -11,7 +11,10 @@ import shutil
 from app.core.security import get_current_user
 from app.db.session import get_db
 from app.db.models import User, MedicalSource
-from app.rag.service import process_document
+from app.rag.service import (
+    get_cache_stats, get_shard_stats, load_shard, process_document, rebuild_index, reindex_source,
+    reload_index, remove_source_vectors, unload_shard
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +34,10 @@ class SourceResponse(BaseModel):
 class SourceListResponse(BaseModel):
     sources: List[SourceResponse]
 
+class IndexRebuildResponse(BaseModel):
+    index_type: str
+    params: Dict[str, Any]
+
 @router.get("/sources", response_model=SourceListResponse)
 async def list_sources(
     current_user: User = Depends(get_current_user),
@@ -169,6 +176,53 @@ async def index_source(
         "created_at": source.created_at.isoformat()
     }
 
+@router.post("/sources/{source_id}/reindex", response_model=SourceResponse)
+async def reindex_source_endpoint(
+    source_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Indiziert eine geänderte Quelle neu und ersetzt ihre Vektoren (nur für Administratoren)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    # Quelle aus der Datenbank laden
+    source = db.query(MedicalSource).filter(MedicalSource.id == source_id).first()
+    if not source:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Quelle nicht gefunden"
+        )
+    
+    # Quelle neu indizieren
+    try:
+        await reindex_source(source_id, db)
+    except Exception as e:
+        logger.error(f"Fehler beim Neuindizieren der Quelle: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Fehler beim Neuindizieren der Quelle: {str(e)}"
+        )
+    
+    # Aktualisierte Quelle zurückgeben
+    db.refresh(source)
+    
+    return {
+        "id": source.id,
+        "title": source.title,
+        "source_type": source.source_type,
+        "publisher": source.publisher,
+        "publication_date": source.publication_date.isoformat() if source.publication_date else None,
+        "indexed": source.indexed,
+        "index_date": source.index_date.isoformat() if source.index_date else None,
+        "created_at": source.created_at.isoformat()
+    }
+
 @router.delete("/sources/{source_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_source(
     source_id: int,
@@ -192,6 +246,16 @@ async def delete_source(
             detail="Quelle nicht gefunden"
         )
     
+    # Vektoren der Quelle aus dem Index entfernen
+    try:
+        await remove_source_vectors(source_id)
+    except Exception as e:
+        logger.error(f"Fehler beim Entfernen der Vektoren: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Fehler beim Entfernen der Vektoren: {str(e)}"
+        )
+    
     # Datei löschen
     if source.local_path and os.path.exists(source.local_path):
         try:
@@ -203,4 +267,148 @@ async def delete_source(
     db.delete(source)
     db.commit()
     
-    return None
\ No newline at end of file
+    return None
+
+@router.post("/index/rebuild", response_model=IndexRebuildResponse)
+async def rebuild_vector_index(
+    index_type: Optional[str] = None,
+    shard: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Baut den Vektorindex (oder einen Shard) mit dem konfigurierten oder angegebenen Indextyp neu auf (nur für Administratoren)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    try:
+        params = await rebuild_index(index_type, shard)
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e.args[0])
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Fehler beim Neuaufbau des Vektorindex: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Fehler beim Neuaufbau des Vektorindex: {str(e)}"
+        )
+    
+    return {
+        "index_type": params["index_type"],
+        "params": params
+    }
+
+@router.post("/index/reload", response_model=Dict[str, Any])
+async def reload_vector_index(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lädt den Vektorindex ohne Neustart von der Festplatte neu (nur für Administratoren)
+    
+    Laufende Suchen werden auf dem bisherigen Stand beendet.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    try:
+        return await reload_index()
+    except Exception as e:
+        logger.error(f"Fehler beim Neuladen des Vektorindex: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Fehler beim Neuladen des Vektorindex: {str(e)}"
+        )
+
+@router.get("/index/shards", response_model=List[Dict[str, Any]])
+async def list_shards(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Listet die Shards des Vektorindex (nur für Administratoren)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    return get_shard_stats()
+
+@router.post("/index/shards/{shard}/load", response_model=Dict[str, Any])
+async def load_index_shard(
+    shard: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lädt einen Shard des Vektorindex (nur für Administratoren)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    try:
+        return await load_shard(shard)
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e.args[0])
+        )
+
+@router.post("/index/shards/{shard}/unload", status_code=status.HTTP_204_NO_CONTENT)
+async def unload_index_shard(
+    shard: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Entlädt einen Shard des Vektorindex, um Speicher freizugeben (nur für Administratoren)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    try:
+        await unload_shard(shard)
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e.args[0])
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return None
+
+@router.get("/cache", response_model=Dict[str, Any])
+async def cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Kennzahlen der RAG-Caches (nur für Administratoren)
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Nur Administratoren können auf diese Ressource zugreifen"
+        )
+    
+    return get_cache_stats()
@@ -5,12 +5,15 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 import logging
 import asyncio
+from datetime import date
 
 from app.core.security import get_current_user
 from app.db.session import get_db
 from app.db.models import User, Chat, Message
 from app.llm.service import generate_llm_response, get_medical_reasoning
-from app.rag.service import generate_rag_response
+from app.core.config import settings
+from app.rag.filters import normalize_filters
+from app.rag.service import generate_rag_response, semantic_search_many
 
 logger = logging.getLogger(__name__)
 
@@ -29,11 +32,24 @@ class PatientInfoModel(BaseModel):
     vitals: Optional[Dict[str, Any]] = Field(None, description="Vitalparameter")
     travel_history: Optional[List[str]] = Field(None, description="Reiseanamnese")
     
+class SearchFilterModel(BaseModel):
+    source_types: Optional[List[str]] = Field(None, description="Nur Quellen dieser Typen (z.B. guideline)")
+    source_ids: Optional[List[int]] = Field(None, description="Nur diese Quellen")
+    publishers: Optional[List[str]] = Field(None, description="Nur Quellen dieser Herausgeber (z.B. Fachgesellschaften)")
+    published_from: Optional[date] = Field(None, description="Frühestes Veröffentlichungsdatum")
+    published_to: Optional[date] = Field(None, description="Spätestes Veröffentlichungsdatum")
+    
 class MedicalQueryModel(BaseModel):
     query: str = Field(..., description="Medizinische Anfrage")
     patient_info: Optional[PatientInfoModel] = Field(None, description="Patienteninformationen")
     use_rag: bool = Field(True, description="RAG-System verwenden")
     temperature: float = Field(0.1, description="Kreativität der Antwort (0.0-1.0)")
+    filters: Optional[SearchFilterModel] = Field(None, description="Quellen für die RAG-Suche einschränken")
+    
+class BatchQueryModel(BaseModel):
+    queries: List[str] = Field(..., min_length=1, description="Medizinische Anfragen")
+    top_k: int = Field(5, ge=1, le=50, description="Anzahl der Treffer je Anfrage")
+    filters: Optional[SearchFilterModel] = Field(None, description="Quellen für die Suche einschränken")
     
 class SourceInfo(BaseModel):
     title: str
@@ -61,6 +77,16 @@ class ChatDetailResponse(BaseModel):
     chat: ChatModel
     messages: List[MessageResponse]
 
+def _search_filters(filters: Optional[SearchFilterModel]) -> Optional[Dict[str, Any]]:
+    """Prüft die Suchfilter vorab, damit ungültige Filter als 400 und nicht als Serverfehler gemeldet werden"""
+    try:
+        return normalize_filters(filters.dict(exclude_none=True) if filters else None)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ungültige Filter: {str(e)}"
+        )
+
 @router.post("/query", response_model=Dict[str, Any])
 async def medical_query(
     query: MedicalQueryModel,
@@ -70,13 +96,16 @@ async def medical_query(
     """
     Stellt eine medizinische Anfrage ohne einen Chat zu erstellen
     """
+    filters = _search_filters(query.filters)
+    
     try:
         if query.use_rag:
             # RAG-basierte Antwort generieren
             response = await generate_rag_response(
                 query=query.query,
                 patient_info=query.patient_info.dict() if query.patient_info else None,
-                temperature=query.temperature
+                temperature=query.temperature,
+                filters=filters
             )
             return {
                 "answer": response["answer"],
@@ -126,6 +155,57 @@ Antworte auf Deutsch und in einem professionellen, sachlichen Stil für medizini
             detail="Ein Fehler ist bei der Verarbeitung Ihrer Anfrage aufgetreten."
         )
 
+@router.post("/query/batch", response_model=Dict[str, Any])
+async def medical_query_batch(
+    batch: BatchQueryModel,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Sucht relevante Quellenabschnitte für mehrere Anfragen in einem Aufruf
+    
+    Die Anfragen werden gemeinsam eingebettet und gesucht; es wird keine
+    LLM-Antwort generiert.
+    """
+    if len(batch.queries) > settings.BATCH_QUERY_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximal {settings.BATCH_QUERY_MAX} Anfragen pro Aufruf"
+        )
+    filters = _search_filters(batch.filters)
+    
+    try:
+        results = await semantic_search_many(
+            batch.queries,
+            top_k=batch.top_k,
+            filters=filters
+        )
+    except Exception as e:
+        logger.error(f"Fehler bei der Batch-Anfrage: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ein Fehler ist bei der Verarbeitung Ihrer Anfrage aufgetreten."
+        )
+    
+    return {
+        "results": [
+            {
+                "query": query,
+                "documents": [
+                    {
+                        "text": doc["text"],
+                        "title": doc["metadata"].get("source_title", "Unbekannte Quelle"),
+                        "type": doc["metadata"].get("source_type", "Unbekannt"),
+                        "metadata": doc["metadata"],
+                        "references": doc.get("references", []),
+                        "relevance": doc["score"]
+                    }
+                    for doc in docs
+                ]
+            }
+            for query, docs in zip(batch.queries, results)
+        ]
+    }
+
 @router.get("/", response_model=ChatListResponse)
 async def list_chats(
     current_user: User = Depends(get_current_user),
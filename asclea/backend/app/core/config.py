@@ -22,9 +22,79 @@ class Settings(BaseModel):
     # LLM
     MODEL_PATH: str = os.getenv("MODEL_PATH", "./models/llama3-70b-medical.gguf")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")  # torch, torch_int8, onnx, onnx_int8
+    EMBEDDING_ONNX_FILE: str = os.getenv("EMBEDDING_ONNX_FILE", "")  # ONNX-Datei im Modellverzeichnis, leer = Standard
+    LLM_N_CTX: int = int(os.getenv("LLM_N_CTX", "4096"))  # Kontextfenster in Tokens
+    RAG_MAX_ANSWER_TOKENS: int = int(os.getenv("RAG_MAX_ANSWER_TOKENS", "2048"))  # für die Antwort reserviert
+    
+    # Kontextaufbau (Token-Budget und MMR-Deduplizierung)
+    CONTEXT_MMR_LAMBDA: float = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))  # 1.0 = reine Relevanz
+    CONTEXT_DUPLICATE_THRESHOLD: float = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.95"))  # Kosinus-Ähnlichkeit
+    CONTEXT_SAFETY_TOKENS: int = int(os.getenv("CONTEXT_SAFETY_TOKENS", "64"))
     
     # Vektordatenbank
     VECTOR_DB_PATH: str = os.getenv("VECTOR_DB_PATH", "./data/vector_db")
+    VECTOR_INDEX_TYPE: str = os.getenv("VECTOR_INDEX_TYPE", "flat")  # flat, ivf_flat, ivf_pq, hnsw
+    VECTOR_METRIC: str = os.getenv("VECTOR_METRIC", "l2")  # l2 oder ip (Kosinus über normierte Vektoren)
+    VECTOR_STORAGE: str = os.getenv("VECTOR_STORAGE", "float32")  # float32, fp16 oder sq8
+    DENSE_MIN_SCORE: float = float(os.getenv("DENSE_MIN_SCORE", "0.0"))  # Mindestscore der Vektorsuche (0-1)
+    IVF_NLIST: int = int(os.getenv("IVF_NLIST", "1024"))
+    IVF_NPROBE: int = int(os.getenv("IVF_NPROBE", "16"))
+    PQ_M: int = int(os.getenv("PQ_M", "48"))
+    PQ_NBITS: int = int(os.getenv("PQ_NBITS", "8"))
+    HNSW_M: int = int(os.getenv("HNSW_M", "32"))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
+    INDEX_TRAIN_SAMPLE: int = int(os.getenv("INDEX_TRAIN_SAMPLE", "100000"))
+    WAL_COMPACT_BYTES: int = int(os.getenv("WAL_COMPACT_BYTES", str(64 * 1024 * 1024)))
+    WAL_FSYNC: bool = os.getenv("WAL_FSYNC", "True").lower() == "true"
+    SHARD_BY: str = os.getenv("SHARD_BY", "")  # "", source_type, publisher oder directory
+    SHARD_SEARCH_THREADS: int = int(os.getenv("SHARD_SEARCH_THREADS", "4"))
+    
+    # Hybridsuche (Vektor + BM25)
+    HYBRID_SEARCH: bool = os.getenv("HYBRID_SEARCH", "True").lower() == "true"
+    HYBRID_DENSE_WEIGHT: float = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+    HYBRID_LEXICAL_WEIGHT: float = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "50"))  # Kandidaten je Suchverfahren
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    BM25_K1: float = float(os.getenv("BM25_K1", "1.2"))
+    BM25_B: float = float(os.getenv("BM25_B", "0.75"))
+    
+    # Batch-Suche
+    BATCH_QUERY_MAX: int = int(os.getenv("BATCH_QUERY_MAX", "200"))  # Anfragen pro /chat/query/batch
+    
+    # Gefilterte Suche
+    FILTER_EXACT_MAX: int = int(os.getenv("FILTER_EXACT_MAX", "2048"))  # Bis zu dieser Treffermenge exakt suchen
+    FILTER_CACHE_SIZE: int = int(os.getenv("FILTER_CACHE_SIZE", "128"))  # Zwischengespeicherte Filter-Bitmaps
+    
+    # Reranking (Cross-Encoder, leer = deaktiviert)
+    RERANKER_MODEL: str = os.getenv("RERANKER_MODEL", "")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "30"))
+    RERANK_TOP_N: int = int(os.getenv("RERANK_TOP_N", "3"))
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", "300"))
+    
+    # Caches
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "4096"))  # 0 deaktiviert den Cache
+    QUERY_CACHE_TTL: int = int(os.getenv("QUERY_CACHE_TTL", "86400"))  # Sekunden, 0 = unbegrenzt
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))  # 0 deaktiviert den Cache
+    ANSWER_CACHE_TTL: int = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "1.0"))  # Kosinus-Ähnlichkeit, 1 = nur identische Anfragen
+    ANSWER_CACHE_DIR: Optional[str] = os.getenv("ANSWER_CACHE_DIR")  # diskcache-Verzeichnis, leer = nur Arbeitsspeicher
+    EMBEDDING_CACHE_DIR: str = os.getenv("EMBEDDING_CACHE_DIR", "./data/embedding_cache")  # leer deaktiviert den Cache
+    EMBEDDING_CACHE_SIZE_LIMIT: int = int(os.getenv("EMBEDDING_CACHE_SIZE_LIMIT", str(8 * 1024 ** 3)))  # Bytes
+    
+    # Indizierung
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+    QUERY_BATCH_MAX_SIZE: int = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))  # Gebündelte Query-Embeddings pro Forward-Pass
+    QUERY_BATCH_WAIT_MS: float = float(os.getenv("QUERY_BATCH_WAIT_MS", "5"))  # Wartezeit auf weitere Anfragen
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))  # 0 = ohne Prozesspool
+    EXTRACTION_PDF_PAGES_PER_TASK: int = int(os.getenv("EXTRACTION_PDF_PAGES_PER_TASK", "16"))
+    TABLE_READ_ROWS: int = int(os.getenv("TABLE_READ_ROWS", "10000"))  # Zeilen je gelesenem Abschnitt (CSV/Excel)
+    TABLE_ROWS_PER_CHUNK: int = int(os.getenv("TABLE_ROWS_PER_CHUNK", "1"))
+    CHUNK_TOKENS: int = int(os.getenv("CHUNK_TOKENS", "0"))  # 0 = maximale Sequenzlänge des Embedding-Modells
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+    CHUNK_MIN_TOKENS: int = int(os.getenv("CHUNK_MIN_TOKENS", "16"))
     
     # CORS
     CORS_ORIGINS: List[str] = os.getenv("CORS_ORIGINS", "*").split(",")
@@ -29,7 +29,7 @@ async def initialize_llm_service():
             None, 
             lambda: Llama(
                 model_path=model_path,
-                n_ctx=4096,  # Kontextfenster
+                n_ctx=settings.LLM_N_CTX,  # Kontextfenster
                 n_gpu_layers=-1,  # -1 bedeutet, alle Schichten auf der GPU, wenn möglich
                 n_threads=os.cpu_count(),  # Anzahl der CPU-Threads
                 seed=42,  # Für Reproduzierbarkeit
@@ -41,6 +41,20 @@ async def initialize_llm_service():
         logger.error(f"Fehler beim Laden des LLM-Modells: {str(e)}")
         raise
 
+def get_context_size() -> int:
+    """Größe des Kontextfensters des geladenen Modells in Tokens"""
+    return llm.n_ctx() if llm is not None else settings.LLM_N_CTX
+
+def count_tokens(text: str) -> int:
+    """
+    Zählt die Tokens eines Textes mit dem Tokenizer des LLM
+    
+    Ist das Modell nicht geladen, wird die Tokenzahl über die Textlänge geschätzt.
+    """
+    if llm is None:
+        return len(text) // 3 + 1
+    return len(llm.tokenize(text.encode("utf-8"), add_bos=False, special=True))
+
 async def generate_llm_response(
     prompt: str,
     temperature: float = 0.1,
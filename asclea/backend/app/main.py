@@ -6,7 +6,7 @@ from dotenv import load_dotenv
 from .core.config import settings
 from .api.routes import api_router
 from .llm.service import initialize_llm_service
-from .rag.service import initialize_rag_service
+from .rag.service import initialize_rag_service, shutdown_rag_service
 
 # Load environment variables
 load_dotenv()
@@ -38,6 +38,7 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await shutdown_rag_service()
     print("ASCLEA API is shutting down.")
 
 @app.get("/health")
@@ -0,0 +1,137 @@
+# backend/app/rag/batching.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingBatcher:
+    """
+    Bündelt gleichzeitige Embedding-Anfragen zu einem Forward-Pass
+
+    Anfragen werden in einer Warteschlange gesammelt, bis max_batch_size Texte
+    vorliegen oder max_wait_ms seit der ersten Anfrage vergangen sind. Der Batch
+    wird in einem eigenen Thread eingebettet, sodass immer nur ein Forward-Pass
+    läuft; während er läuft, eintreffende Anfragen bilden den nächsten Batch.
+    Identische Texte innerhalb eines Batches werden nur einmal eingebettet.
+    Die Texte einer Anfrage (encode_many) werden nie auf mehrere Batches
+    verteilt, auch wenn es mehr als max_batch_size sind.
+
+    Args:
+        embedder: Embedding-Modell (app.rag.embedder.Embedder)
+        max_batch_size: Maximale Anzahl Texte pro Forward-Pass
+        max_wait_ms: Maximale Wartezeit auf weitere Anfragen
+    """
+
+    def __init__(self, embedder, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-batcher")
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Bettet einen Text ein, gemeinsam mit gleichzeitig eintreffenden Anfragen"""
+        return (await self.encode_many([text]))[0]
+
+    async def encode_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Bettet mehrere Texte gemeinsam in einem Forward-Pass ein
+
+        Gleichzeitige Anfragen werden mit in den Batch aufgenommen, solange
+        max_batch_size nicht erreicht ist; die übergebenen Texte selbst werden
+        nicht geteilt.
+        """
+        if not texts:
+            return np.zeros((0, self.embedder.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((list(texts), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Weitere Anfragen bis zur Batchgröße oder zum Ablauf der Wartezeit sammeln
+            while size < self.max_batch_size:
+                try:
+                    request = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        request = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(request)
+                size += len(request[0])
+
+            await self._process(batch)
+
+    async def _process(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        pending = [(texts, future) for texts, future in batch if not future.done()]
+        if not pending:
+            return
+
+        texts = list(dict.fromkeys(text for request_texts, _ in pending for text in request_texts))
+        try:
+            loop = asyncio.get_running_loop()
+            embeddings = await loop.run_in_executor(
+                self._executor,
+                partial(self.embedder.encode, texts, batch_size=len(texts))
+            )
+        except Exception as e:
+            logger.error(f"Fehler beim gebündelten Erzeugen von Embeddings: {str(e)}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.texts += len(texts)
+
+        by_text = dict(zip(texts, embeddings))
+        for request_texts, future in pending:
+            if not future.done():
+                future.set_result(np.vstack([by_text[text] for text in request_texts]))
+
+    async def stop(self):
+        """Beendet den Sammel-Task und den Embedding-Thread"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Kennzahlen der Bündelung"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
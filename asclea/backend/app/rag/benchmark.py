@@ -0,0 +1,556 @@
+# backend/app/rag/benchmark.py
+"""
+Benchmark der Retrieval-Schicht von semantic_search
+
+Gesucht wird über denselben Pfad wie die dichte Suche von semantic_search
+(prepare_vectors, ShardedIndex.search mit paralleler Suche über die Shards);
+Datenbank, Hybridsuche und Reranking sind nicht Teil der Messung.
+
+Misst für jede Kombination aus Embedding-Konfiguration (Modell, Backend) und
+Indexkonfiguration (Indextyp, Speicherformat, Ähnlichkeitsmaß) recall@k, MRR,
+Latenz-Perzentile (p50/p95/p99) einzelner Anfragen, Durchsatz (QPS) bei
+mehreren gleichzeitigen Anfragen sowie den Speicherbedarf des Index
+(serialisierte Größe und Zuwachs des Prozessspeichers je Konfiguration).
+
+Korpus und Anfragen:
+    - Standard: synthetischer Korpus aus medizinischen Textbausteinen mit
+      gelabelten Anfragen (relevant sind alle Dokumente zu Wirkstoff,
+      Indikation und Aspekt der Anfrage)
+    - --corpus/--queries: JSONL-Dateien mit {"id", "text"} bzw.
+      {"query", "relevant": [ids]}
+    - --vectors: zufällige, geclusterte Vektoren ohne Embedding-Modell (für
+      große Korpusgrößen); relevant sind die exakten k nächsten Nachbarn
+
+Mit --baseline wird gegen eine frühere Ergebnisdatei verglichen; bei einer
+Verschlechterung über den Toleranzen endet der Aufruf mit Exit-Code 1.
+
+Aufruf:
+    python -m app.rag.benchmark --corpus-size 20000 --index-types flat,ivf_flat,hnsw --output benchmark.json
+    python -m app.rag.benchmark --vectors --corpus-size 1000000 --index-types ivf_pq,hnsw --storages float32,sq8
+    python -m app.rag.benchmark --backends torch,onnx_int8 --baseline benchmark.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.rag.index import build_index, create_index, default_index_params, fit_params_to_data, prepare_vectors
+from app.rag.shards import DEFAULT_SHARD, ShardedIndex
+
+logger = logging.getLogger(__name__)
+
+# Textbausteine des synthetischen Korpus
+DRUGS = [
+    "Metformin", "Amoxicillin", "Ibuprofen", "Ramipril", "Bisoprolol", "Apixaban", "Atorvastatin", "Levothyroxin",
+    "Pantoprazol", "Prednisolon", "Salbutamol", "Clopidogrel", "Furosemid", "Sertralin", "Insulin glargin",
+    "Ceftriaxon", "Doxycyclin", "Amlodipin", "Methotrexat", "Allopurinol", "Empagliflozin", "Rivaroxaban",
+    "Candesartan", "Tramadol", "Azithromycin", "Spironolacton", "Budesonid", "Levetiracetam", "Quetiapin",
+    "Hydrochlorothiazid", "Piperacillin", "Valproat", "Lithium", "Digoxin", "Enoxaparin", "Montelukast",
+    "Colchicin", "Fluconazol", "Mirtazapin", "Tamsulosin"
+]
+CONDITIONS = [
+    "Typ-2-Diabetes", "ambulant erworbener Pneumonie", "Herzinsuffizienz", "arterieller Hypertonie",
+    "Vorhofflimmern", "koronarer Herzkrankheit", "Hypothyreose", "Refluxkrankheit", "Asthma bronchiale",
+    "COPD", "Gicht", "rheumatoider Arthritis", "Depression", "Epilepsie", "chronischer Niereninsuffizienz",
+    "Harnwegsinfektion", "Sepsis", "tiefer Venenthrombose", "Lungenembolie", "Migräne", "Osteoporose",
+    "Psoriasis", "Borreliose", "Schizophrenie", "bipolarer Störung", "Leberzirrhose", "akuter Otitis media",
+    "Morbus Crohn", "Colitis ulcerosa", "Herpes zoster", "Tuberkulose", "Anämie", "Pankreatitis",
+    "Schlaganfall", "benigner Prostatahyperplasie", "Candidose", "Angststörung", "Hyperkaliämie",
+    "Hyponatriämie", "Schwangerschaftsdiabetes"
+]
+ASPECTS = {
+    "dosierung": (
+        "Die empfohlene Dosierung von {drug} bei {condition} richtet sich nach Nierenfunktion und Körpergewicht.",
+        "Wie wird {drug} bei {condition} dosiert?"
+    ),
+    "kontraindikationen": (
+        "Kontraindikationen für {drug} bei Patienten mit {condition} sind vor Therapiebeginn zu prüfen.",
+        "Wann darf {drug} bei {condition} nicht gegeben werden?"
+    ),
+    "nebenwirkungen": (
+        "Unter {drug} treten bei {condition} häufig unerwünschte Wirkungen auf, die engmaschig erfasst werden.",
+        "Welche Nebenwirkungen hat {drug} bei {condition}?"
+    ),
+    "wechselwirkungen": (
+        "Bei {condition} sind die Wechselwirkungen von {drug} mit der Begleitmedikation zu beachten.",
+        "Mit welchen Medikamenten interagiert {drug} bei {condition}?"
+    ),
+    "monitoring": (
+        "Während der Behandlung von {condition} mit {drug} werden Laborwerte regelmäßig kontrolliert.",
+        "Welche Kontrollen sind unter {drug} bei {condition} nötig?"
+    )
+}
+FILLERS = [
+    "Die Empfehlung beruht auf randomisierten kontrollierten Studien.",
+    "Die Leitliniengruppe spricht eine starke Empfehlung aus.",
+    "Bei älteren Patienten ist eine Anpassung zu erwägen.",
+    "Die Evidenz ist von moderater Qualität.",
+    "Abweichungen sind im Einzelfall zu dokumentieren.",
+    "Die Empfehlung entspricht dem Expertenkonsens."
+]
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def _str_list(value: str) -> List[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def synthetic_corpus(size: int, num_queries: int, seed: int) -> Tuple[List[str], List[str], List[Set[int]]]:
+    """
+    Erzeugt einen gelabelten Korpus aus Textbausteinen
+
+    Jedes Dokument behandelt einen Aspekt eines Wirkstoffs bei einer
+    Indikation; Anfragen sind anders formuliert und verweisen auf alle
+    Dokumente mit derselben Kombination.
+
+    Returns:
+        Tupel aus (Dokumenttexte, Anfragen, relevante Dokumentpositionen je Anfrage)
+    """
+    rng = np.random.default_rng(seed)
+    combinations = [
+        (drug, condition, aspect)
+        for drug in DRUGS for condition in CONDITIONS for aspect in ASPECTS
+    ]
+    rng.shuffle(combinations)
+
+    texts = []
+    documents_by_combination: Dict[Tuple[str, str, str], Set[int]] = {}
+    for position in range(size):
+        drug, condition, aspect = combinations[position % len(combinations)]
+        variant = position // len(combinations)
+        sentence = ASPECTS[aspect][0].format(drug=drug, condition=condition)
+        texts.append(f"{sentence} {FILLERS[(position + variant) % len(FILLERS)]}")
+        documents_by_combination.setdefault((drug, condition, aspect), set()).add(position)
+
+    covered = list(documents_by_combination)
+    chosen = rng.choice(len(covered), min(num_queries, len(covered)), replace=False)
+    queries, relevant = [], []
+    for choice in chosen:
+        drug, condition, aspect = covered[choice]
+        queries.append(ASPECTS[aspect][1].format(drug=drug, condition=condition))
+        relevant.append(documents_by_combination[covered[choice]])
+    return texts, queries, relevant
+
+def load_corpus(corpus_path: str, queries_path: str) -> Tuple[List[str], List[str], List[Set[int]]]:
+    """
+    Lädt Korpus und gelabelte Anfragen aus JSONL-Dateien
+
+    Returns:
+        Tupel aus (Dokumenttexte, Anfragen, relevante Dokumentpositionen je Anfrage)
+    """
+    texts, positions = [], {}
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                document = json.loads(line)
+                positions[str(document["id"])] = len(texts)
+                texts.append(document["text"])
+
+    queries, relevant = [], []
+    with open(queries_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                query = json.loads(line)
+                labels = {positions[str(doc_id)] for doc_id in query["relevant"] if str(doc_id) in positions}
+                if labels:
+                    queries.append(query["query"])
+                    relevant.append(labels)
+    return texts, queries, relevant
+
+def synthetic_vectors(size: int, dimension: int, num_queries: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Erzeugt geclusterte Zufallsvektoren und leicht gestörte Anfragen
+
+    Returns:
+        Tupel aus (Korpusvektoren, Anfragevektoren)
+    """
+    rng = np.random.default_rng(seed)
+    num_clusters = max(1, int(np.sqrt(size)))
+    centers = rng.normal(size=(num_clusters, dimension)).astype(np.float32)
+    vectors = np.empty((size, dimension), dtype=np.float32)
+    for start in range(0, size, 100000):  # Blockweise, um Zwischenergebnisse klein zu halten
+        end = min(start + 100000, size)
+        assignment = rng.integers(num_clusters, size=end - start)
+        vectors[start:end] = centers[assignment] + rng.normal(scale=0.5, size=(end - start, dimension))
+
+    sample = vectors[rng.choice(size, min(num_queries, size), replace=False)]
+    queries = (sample + rng.normal(scale=0.1, size=sample.shape)).astype(np.float32)
+    return vectors, queries
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int, metric: str) -> List[Set[int]]:
+    """Exakte k nächste Nachbarn als relevante Dokumente (für --vectors)"""
+    params = dict(default_index_params("flat"), metric=metric, storage="float32")
+    index = build_index(prepare_vectors(vectors, params), params)
+    _, I = index.search(prepare_vectors(queries, params), k)
+    return [set(int(i) for i in row if i != -1) for row in I]
+
+def percentiles(latencies_ms: Sequence[float]) -> Dict[str, float]:
+    """p50, p95 und p99 sowie Mittelwert in Millisekunden"""
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99))
+    }
+
+def retrieval_quality(found: np.ndarray, relevant: List[Set[int]], k: int) -> Dict[str, float]:
+    """
+    recall@k und MRR gegenüber den gelabelten Dokumenten
+
+    recall@k ist der Anteil der relevanten Dokumente unter den ersten k
+    Treffern (bei mehr als k relevanten Dokumenten bezogen auf k).
+    """
+    recalls, reciprocal_ranks = [], []
+    for row, labels in zip(found, relevant):
+        hits = [rank for rank, doc_id in enumerate(row[:k]) if doc_id in labels]
+        recalls.append(len(hits) / min(len(labels), k))
+        reciprocal_ranks.append(1.0 / (hits[0] + 1) if hits else 0.0)
+    return {"recall": float(np.mean(recalls)), "mrr": float(np.mean(reciprocal_ranks))}
+
+def measure_latency(index: ShardedIndex, queries: np.ndarray, k: int) -> Tuple[np.ndarray, List[float]]:
+    """
+    Sucht jede Anfrage einzeln (wie eine API-Anfrage) und misst ihre Latenz
+
+    Returns:
+        Tupel aus (gefundene IDs je Anfrage, Latenzen in Millisekunden)
+    """
+    found = np.empty((len(queries), k), dtype=np.int64)
+    latencies = []
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, I = index.search(queries[i:i + 1], k)
+        latencies.append(1000.0 * (time.perf_counter() - start))
+        found[i] = I[0]
+    return found, latencies
+
+def measure_qps(index: ShardedIndex, queries: np.ndarray, k: int, concurrency: int) -> float:
+    """Durchsatz in Anfragen pro Sekunde bei concurrency gleichzeitigen Einzelanfragen"""
+    def run(worker: int):
+        for i in range(worker, len(queries), concurrency):
+            index.search(queries[i:i + 1], k)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        list(executor.map(run, range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return len(queries) / max(elapsed, 1e-9)
+
+def build_sharded_index(
+    directory: str,
+    vectors: np.ndarray,
+    params: Dict[str, Any],
+    num_shards: int
+) -> ShardedIndex:
+    """
+    Baut einen ShardedIndex wie im Service (Vektor-ID = Position im Korpus)
+
+    Die Vektoren werden fortlaufend auf num_shards Shards verteilt; jeder
+    Shard wird mit seinen eigenen, an seine Größe angepassten Parametern
+    trainiert.
+    """
+    dimension = vectors.shape[1]
+    index = ShardedIndex(
+        Path(directory),
+        dimension,
+        lambda: (create_index(dimension, params), params),
+        settings.SHARD_SEARCH_THREADS
+    )
+    ids = np.arange(len(vectors), dtype=np.int64)
+    for number, (part_ids, part) in enumerate(zip(np.array_split(ids, num_shards), np.array_split(vectors, num_shards))):
+        shard_params = fit_params_to_data(dict(params), len(part))
+        key = DEFAULT_SHARD if number == 0 else f"shard_{number}"
+        index.attach(key, build_index(part, shard_params, part_ids), shard_params)
+    return index
+
+def current_rss_mb() -> Optional[float]:
+    """Aktueller Speicherverbrauch des Prozesses (MB; None, wenn /proc nicht verfügbar ist)"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+class RssSampler:
+    """
+    Höchster Zuwachs des Speicherverbrauchs gegenüber dem Beginn der Messung
+
+    ru_maxrss ist das Maximum über die gesamte Laufzeit des Prozesses und
+    würde jeder Konfiguration den Bedarf der bisher größten zuschreiben. Der
+    aktuelle Verbrauch wird daher in einem Hintergrund-Thread abgetastet.
+
+    Args:
+        interval: Abstand der Messungen in Sekunden
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_delta_mb: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = current_rss_mb()
+        if rss is not None and self._baseline is not None:
+            self.peak_delta_mb = max(self.peak_delta_mb or 0.0, rss - self._baseline)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def stop(self):
+        """Beendet die Messung (mehrfacher Aufruf ist möglich)"""
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+    def __enter__(self) -> "RssSampler":
+        self._baseline = current_rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def index_configurations(
+    index_types: List[str],
+    storages: List[str],
+    metrics: List[str],
+    nprobe: List[int],
+    ef_search: List[int],
+    num_vectors: int
+) -> List[Dict[str, Any]]:
+    """Alle zu messenden Indexparameter (ivf_pq nur einmal je Maß, da per PQ komprimiert)"""
+    configurations = []
+    for index_type in index_types:
+        for metric in metrics:
+            for storage in (["float32"] if index_type == "ivf_pq" else storages):
+                params = dict(default_index_params(index_type), metric=metric, storage=storage)
+                params = fit_params_to_data(params, num_vectors)
+                if index_type in ("ivf_flat", "ivf_pq") and nprobe:
+                    configurations.extend(dict(params, nprobe=value) for value in nprobe if value <= params["nlist"])
+                elif index_type == "hnsw" and ef_search:
+                    configurations.extend(dict(params, ef_search=value) for value in ef_search)
+                else:
+                    configurations.append(params)
+    return configurations
+
+def config_label(embedding: str, params: Dict[str, Any]) -> str:
+    """Eindeutige Bezeichnung einer Konfiguration (Schlüssel für den Vergleich mit --baseline)"""
+    label = f"{embedding} {params['index_type']}/{params['storage']}/{params['metric']}"
+    if params["index_type"] in ("ivf_flat", "ivf_pq"):
+        label += f" nprobe={params['nprobe']}"
+    elif params["index_type"] == "hnsw":
+        label += f" ef_search={params['ef_search']}"
+    return label
+
+def benchmark_index(
+    label: str,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    relevant: List[Set[int]],
+    params: Dict[str, Any],
+    k: int,
+    concurrency: List[int],
+    num_shards: int = 1
+) -> Dict[str, Any]:
+    """
+    Baut einen Index und misst Qualität, Latenz, Durchsatz und Speicherbedarf
+
+    Gesucht wird wie in semantic_search über ShardedIndex.search (parallele
+    Suche über die Shards, Zusammenführen der Treffer).
+    """
+    vectors = prepare_vectors(vectors, params)
+    queries = prepare_vectors(queries, params)
+
+    with tempfile.TemporaryDirectory() as directory, RssSampler() as memory:
+        start = time.perf_counter()
+        index = build_sharded_index(directory, vectors, params, num_shards)
+        build_seconds = time.perf_counter() - start
+
+        try:
+            index.search(queries[:min(len(queries), 10)], k)  # Aufwärmen
+            found, latencies = measure_latency(index, queries, k)
+            qps = {str(level): measure_qps(index, queries, k, level) for level in concurrency}
+            memory.stop()  # Serialisierung für index_bytes nicht mitmessen
+
+            result = {
+                "config": label,
+                "params": params,
+                "vectors": len(vectors),
+                "queries": len(queries),
+                "shards": num_shards,
+                "k": k,
+                **retrieval_quality(found, relevant, k),
+                "latency_ms": percentiles(latencies),
+                "qps": qps,
+                "build_seconds": build_seconds,
+                "index_bytes": sum(int(faiss.serialize_index(shard).nbytes) for shard in index.shards.values()),
+                "peak_rss_delta_mb": memory.peak_delta_mb  # Zuwachs während Aufbau und Suche
+            }
+        finally:
+            index.close()
+    return result
+
+def compare_to_baseline(
+    results: List[Dict[str, Any]],
+    baseline: List[Dict[str, Any]],
+    max_recall_drop: float,
+    max_latency_increase: float
+) -> List[str]:
+    """
+    Vergleicht Ergebnisse mit einer früheren Messung
+
+    Returns:
+        Beschreibungen der Verschlechterungen (leer, wenn keine vorliegt)
+    """
+    previous = {result["config"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["config"])
+        if before is None:
+            continue
+        if before["recall"] - result["recall"] > max_recall_drop:
+            regressions.append(f"{result['config']}: recall {before['recall']:.4f} -> {result['recall']:.4f}")
+        p95_before, p95 = before["latency_ms"]["p95"], result["latency_ms"]["p95"]
+        if p95 > p95_before * (1 + max_latency_increase):
+            regressions.append(f"{result['config']}: p95 {p95_before:.3f} ms -> {p95:.3f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="recall@k, MRR, Latenz, QPS und Speicherbedarf der Retrieval-Schicht")
+    parser.add_argument("--corpus", help="JSONL-Datei mit {\"id\", \"text\"} je Zeile")
+    parser.add_argument("--queries", help="JSONL-Datei mit {\"query\", \"relevant\": [ids]} je Zeile")
+    parser.add_argument("--vectors", action="store_true", help="Zufallsvektoren statt Texte (ohne Embedding-Modell)")
+    parser.add_argument("--corpus-size", type=int, default=10000, help="Größe des synthetischen Korpus")
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--dimension", type=int, default=768, help="Dimension der Zufallsvektoren")
+    parser.add_argument("--models", type=_str_list, default=[settings.EMBEDDING_MODEL])
+    parser.add_argument("--backends", type=_str_list, default=[settings.EMBEDDING_BACKEND])
+    parser.add_argument("--index-types", type=_str_list, default=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    parser.add_argument("--storages", type=_str_list, default=["float32"], help="float32, fp16, sq8")
+    parser.add_argument("--metrics", type=_str_list, default=[settings.VECTOR_METRIC], help="l2, ip")
+    parser.add_argument("--nprobe", type=_int_list, default=[], help="Werte für IVF-Indizes (Standard: IVF_NPROBE)")
+    parser.add_argument("--ef-search", type=_int_list, default=[], help="Werte für HNSW (Standard: HNSW_EF_SEARCH)")
+    parser.add_argument("--k", type=int, default=5, help="Treffer je Anfrage (wie top_k von semantic_search)")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Gleichzeitige Anfragen für QPS")
+    parser.add_argument("--shards", type=int, default=1, help="Anzahl der Shards, auf die der Korpus verteilt wird")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Ergebnisse als JSON speichern")
+    parser.add_argument("--baseline", help="Frühere Ergebnisdatei, gegen die verglichen wird")
+    parser.add_argument("--max-recall-drop", type=float, default=0.01, help="Erlaubter Rückgang von recall@k (absolut)")
+    parser.add_argument("--max-latency-increase", type=float, default=0.2, help="Erlaubter Anstieg der p95-Latenz (relativ)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    # Embedding-Konfigurationen: je Modell und Backend (Korpus-)Vektoren, Anfragevektoren und Labels
+    embeddings = []
+    if args.vectors:
+        vectors, queries = synthetic_vectors(args.corpus_size, args.dimension, args.num_queries, args.seed)
+        embeddings.append(("random", vectors, queries, None, None))
+    else:
+        from app.rag.embedder import create_embedder
+
+        if args.corpus and args.queries:
+            texts, query_texts, relevant = load_corpus(args.corpus, args.queries)
+        else:
+            texts, query_texts, relevant = synthetic_corpus(args.corpus_size, args.num_queries, args.seed)
+        logger.info(f"Korpus: {len(texts)} Dokumente, {len(query_texts)} Anfragen")
+
+        for model_name in args.models:
+            for backend in args.backends:
+                model = create_embedder(model_name, backend)
+                start = time.perf_counter()
+                vectors = model.encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)
+                corpus_rate = len(texts) / max(time.perf_counter() - start, 1e-9)
+
+                # Anfragen einzeln einbetten wie in der API (Latenz des Embeddings)
+                model.encode(query_texts[:1], batch_size=1)  # Aufwärmen
+                query_vectors, query_latencies = [], []
+                for text in query_texts:
+                    start = time.perf_counter()
+                    query_vectors.append(model.encode([text], batch_size=1)[0])
+                    query_latencies.append(1000.0 * (time.perf_counter() - start))
+
+                embedding_stats = {
+                    "model": model_name,
+                    "backend": backend,
+                    "corpus_texts_per_second": corpus_rate,
+                    "query_latency_ms": percentiles(query_latencies)
+                }
+                logger.info(
+                    f"{model.name}: {corpus_rate:.1f} Texte/s, "
+                    f"Anfrage p50={embedding_stats['query_latency_ms']['p50']:.1f} ms"
+                )
+                embeddings.append((model.name, vectors, np.asarray(query_vectors, dtype=np.float32), relevant, embedding_stats))
+                del model
+
+    results = []
+    for embedding, vectors, queries, relevant, embedding_stats in embeddings:
+        configurations = index_configurations(
+            args.index_types, args.storages, args.metrics, args.nprobe, args.ef_search, len(vectors)
+        )
+        neighbors = {}
+        for params in configurations:
+            labels = relevant
+            if labels is None:
+                if params["metric"] not in neighbors:
+                    neighbors[params["metric"]] = exact_neighbors(vectors, queries, args.k, params["metric"])
+                labels = neighbors[params["metric"]]
+
+            label = config_label(embedding, params)
+            result = benchmark_index(label, vectors, queries, labels, params, args.k, args.concurrency, args.shards)
+            if embedding_stats is not None:
+                result["embedding"] = embedding_stats
+            results.append(result)
+
+            latency = result["latency_ms"]
+            qps = "  ".join(f"QPS@{level}={value:.0f}" for level, value in result["qps"].items())
+            print(
+                f"{label:<60} recall@{args.k}={result['recall']:.4f}  MRR={result['mrr']:.4f}  "
+                f"p50={latency['p50']:.3f} p95={latency['p95']:.3f} p99={latency['p99']:.3f} ms  {qps}  "
+                f"{result['index_bytes'] / 1024 ** 2:.1f} MB"
+            )
+
+    if args.output:
+        report = {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "host": {
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "cpu_count": os.cpu_count(),
+                "faiss_threads": faiss.omp_get_max_threads()
+            },
+            "settings": vars(args),
+            "results": results
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_to_baseline(results, baseline, args.max_recall_drop, args.max_latency_increase)
+        for regression in regressions:
+            print(f"Verschlechterung: {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
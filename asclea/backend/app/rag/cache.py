@@ -0,0 +1,329 @@
+# backend/app/rag/cache.py
+import hashlib
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+def normalize_query(query: str) -> str:
+    """Vereinheitlicht Unicode-Darstellung und Leerzeichen einer Anfrage"""
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+class LRUCache:
+    """
+    Threadsicherer In-Process-Cache mit LRU- und TTL-Verdrängung
+
+    Args:
+        max_size: Maximale Anzahl Einträge (0 deaktiviert den Cache)
+        ttl_seconds: Lebensdauer eines Eintrags in Sekunden (0 = unbegrenzt)
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Liefert den Wert zum Schlüssel oder None, falls nicht vorhanden bzw. abgelaufen"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        """Speichert einen Wert und verdrängt bei Bedarf den am längsten ungenutzten Eintrag"""
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Entfernt alle Einträge"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Kennzahlen des Caches"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class SemanticAnswerCache:
+    """
+    Cache für RAG-Antworten zu identischen oder (optional) nahezu identischen Anfragen
+
+    Einträge werden über einen Kontextschlüssel (Temperatur, Patienteninformationen,
+    Indexversion) gruppiert. Eine Anfrage trifft, wenn ihr normalisierter Text
+    in der Gruppe bereits gespeichert ist. Nur mit threshold < 1 trifft sie
+    auch, wenn die Kosinus-Ähnlichkeit ihres Embeddings zu einer gespeicherten
+    Anfrage mindestens threshold beträgt; das kann Anfragen verwechseln, die
+    sich nur in einer Dosis oder einem Laborwert unterscheiden. Optional werden
+    die Einträge zusätzlich in einem diskcache-Verzeichnis abgelegt und
+    überleben so einen Neustart.
+
+    Args:
+        max_size: Maximale Anzahl Einträge (0 deaktiviert den Cache)
+        ttl_seconds: Lebensdauer eines Eintrags in Sekunden (0 = unbegrenzt)
+        threshold: Minimale Kosinus-Ähnlichkeit für einen Treffer (1 = nur identische Anfragen)
+        directory: Verzeichnis für die persistente Ablage (None = nur im Arbeitsspeicher)
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, threshold: float, directory: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str], str] = {}  # (Kontextschlüssel, Anfrage) -> Eintrag
+        self._groups: Dict[str, Dict[str, None]] = {}  # Kontextschlüssel -> Einträge
+        self._matrices: Dict[str, Tuple[List[str], np.ndarray, np.ndarray]] = {}  # Embeddings je Gruppe
+        self._lock = threading.Lock()
+        self._disk = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if directory and max_size > 0:
+            import diskcache
+
+            self._disk = diskcache.Cache(directory)
+            self._load_from_disk()
+
+    def _load_from_disk(self):
+        """Übernimmt die jüngsten noch gültigen Einträge (höchstens max_size) aus der persistenten Ablage"""
+        now = time.time()
+        entries = []
+        for key in list(self._disk.iterkeys()):
+            entry = self._disk.get(key)
+            if entry is None or (entry["expires_at"] and entry["expires_at"] <= now) or "query" not in entry:
+                self._disk.delete(key)
+                continue
+            entry["embedding"] = np.frombuffer(entry["embedding"], dtype=np.float32)
+            entries.append((key, entry))
+
+        entries.sort(key=lambda item: item[1]["stored_at"])
+        for key, _ in entries[:-self.max_size]:
+            self._disk.delete(key)
+        for key, entry in entries[-self.max_size:]:
+            self._add(key, entry)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def _add(self, key: str, entry: Dict[str, Any]):
+        context_key = entry["context_key"]
+        self._entries[key] = entry
+        self._exact[(context_key, entry["query"])] = key
+        self._groups.setdefault(context_key, {})[key] = None
+        self._matrices.pop(context_key, None)
+
+    def _nearest(self, query: np.ndarray, context_key: str, now: float) -> Optional[str]:
+        """Ähnlichste gültige Anfrage der Gruppe (Matrixprodukt über die gestapelten Embeddings)"""
+        group = self._groups.get(context_key)
+        if not group:
+            return None
+
+        cached = self._matrices.get(context_key)
+        if cached is None:
+            keys = list(group)
+            matrix = np.stack([self._entries[key]["embedding"] for key in keys])
+            expires = np.array([self._entries[key]["expires_at"] or np.inf for key in keys])
+            cached = self._matrices[context_key] = (keys, matrix, expires)
+
+        keys, matrix, expires = cached
+        scores = matrix @ query
+        scores[expires <= now] = -np.inf
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def lookup(self, query: str, embedding: np.ndarray, context_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Sucht eine gespeicherte Antwort zu einer identischen bzw. ähnlichen Anfrage
+
+        Args:
+            query: Text der Anfrage
+            embedding: Embedding der Anfrage
+            context_key: Schlüssel aus Temperatur, Patienteninformationen und Indexversion
+
+        Returns:
+            Die gespeicherte Antwort oder None
+        """
+        if self.max_size <= 0:
+            return None
+
+        now = time.time()
+        with self._lock:
+            key = self._exact.get((context_key, normalize_query(query)))
+            if key is not None and self._entries[key]["expires_at"] and self._entries[key]["expires_at"] <= now:
+                self._evict(key)
+                key = None
+            if key is None and self.threshold < 1:
+                key = self._nearest(self._normalize(embedding), context_key, now)
+
+            if key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]["response"]
+
+    def store(self, query: str, embedding: np.ndarray, context_key: str, response: Dict[str, Any]):
+        """Speichert eine Antwort zu einer Anfrage"""
+        if self.max_size <= 0:
+            return
+
+        now = time.time()
+        entry = {
+            "query": normalize_query(query),
+            "embedding": self._normalize(embedding),
+            "context_key": context_key,
+            "response": response,
+            "stored_at": now,
+            "expires_at": now + self.ttl_seconds if self.ttl_seconds > 0 else None
+        }
+        key = uuid.uuid4().hex
+
+        with self._lock:
+            previous = self._exact.get((context_key, entry["query"]))
+            if previous is not None:
+                self._evict(previous)
+            self._add(key, entry)
+            if self._disk is not None:
+                self._disk.set(
+                    key,
+                    dict(entry, embedding=entry["embedding"].tobytes()),
+                    expire=self.ttl_seconds or None
+                )
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key)
+        context_key = entry["context_key"]
+        self._exact.pop((context_key, entry["query"]), None)
+        group = self._groups[context_key]
+        del group[key]
+        if not group:
+            del self._groups[context_key]
+        self._matrices.pop(context_key, None)
+        if self._disk is not None:
+            self._disk.delete(key)
+        self.evictions += 1
+
+    def clear(self):
+        """Entfernt alle Einträge"""
+        with self._lock:
+            if not self._entries:
+                return
+            self._entries.clear()
+            self._exact.clear()
+            self._groups.clear()
+            self._matrices.clear()
+            if self._disk is not None:
+                self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Kennzahlen des Caches"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "threshold": self.threshold,
+                "persistent": self._disk is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class EmbeddingCache:
+    """
+    Persistenter Cache für Chunk-Embeddings (diskcache)
+
+    Schlüssel ist der Name des Embedding-Modells (inklusive Backend) und der
+    SHA-256-Hash des Textes, sodass ein Modellwechsel keine alten Embeddings
+    liefert. Gespeichert werden die unveränderten Modellausgaben (float32);
+    Normierung für das Ähnlichkeitsmaß erfolgt erst beim Einfügen in den Index.
+
+    Args:
+        directory: Verzeichnis des Caches
+        size_limit: Maximale Größe in Bytes (ältere Einträge werden verdrängt)
+    """
+
+    def __init__(self, directory: str, size_limit: int):
+        import diskcache
+
+        self._disk = diskcache.Cache(directory, size_limit=size_limit, eviction_policy="least-recently-stored")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(model_name: str, text: str) -> str:
+        return f"{model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Liest die Embeddings der Texte (None für nicht gespeicherte Texte)"""
+        with self._disk.transact():
+            values = [self._disk.get(self._key(model_name, text)) for text in texts]
+
+        embeddings = [np.frombuffer(value, dtype=np.float32) if value is not None else None for value in values]
+        found = sum(embedding is not None for embedding in embeddings)
+        self.hits += found
+        self.misses += len(texts) - found
+        return embeddings
+
+    def set_many(self, model_name: str, texts: List[str], embeddings: np.ndarray):
+        """Speichert die Embeddings der Texte"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._disk.transact():
+            for text, embedding in zip(texts, embeddings):
+                self._disk.set(self._key(model_name, text), embedding.tobytes())
+
+    def close(self):
+        self._disk.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Kennzahlen des Caches"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._disk),
+            "volume_bytes": self._disk.volume(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
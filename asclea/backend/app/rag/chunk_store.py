@@ -0,0 +1,387 @@
+# backend/app/rag/chunk_store.py
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# SQLite begrenzt die Anzahl der Parameter pro Anweisung
+MAX_SQL_PARAMS = 900
+
+def content_hash(text: str) -> str:
+    """Inhalts-Hash eines Chunks (Leerraum vereinheitlicht)"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def file_content_hash(path: str) -> str:
+    """Inhalts-Hash einer Datei"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ChunkStore:
+    """
+    Persistenter Speicher für Chunk-Texte und Metadaten, adressiert über die Vektor-ID
+
+    Die Daten liegen in einer SQLite-Datenbank neben dem FAISS-Index. Bei der
+    Suche werden nur die Texte der tatsächlich zurückgegebenen Treffer gelesen,
+    sodass Startzeit und Speicherbedarf nicht mit der Korpusgröße wachsen.
+
+    Jeder Chunk gehört einer Quelle (source_id) und trägt einen Inhalts-Hash.
+    Weitere Quellen mit demselben Chunk werden als Referenz (chunk_refs) mit
+    eigenen Metadaten erfasst, statt den Chunk erneut einzubetten; die Zahl
+    der Quellen je Chunk ist damit 1 + Anzahl der Referenzen. Datei-Hashes
+    (files) erkennen vollständig identische Dokumente.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                source_id INTEGER,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source_id ON chunks (source_id)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_refs (
+                chunk_id INTEGER NOT NULL,
+                source_id INTEGER NOT NULL,
+                metadata TEXT NOT NULL,
+                PRIMARY KEY (chunk_id, source_id)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_refs_source_id ON chunk_refs (source_id)")
+        conn.execute("CREATE TABLE IF NOT EXISTS files (content_hash TEXT PRIMARY KEY, source_id INTEGER NOT NULL)")
+
+        # Ältere Speicher ohne Inhalts-Hash ergänzen
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(chunks)")]
+        if "content_hash" not in columns:
+            conn.execute("ALTER TABLE chunks ADD COLUMN content_hash TEXT")
+            rows = conn.execute("SELECT id, text FROM chunks").fetchall()
+            conn.executemany(
+                "UPDATE chunks SET content_hash = ? WHERE id = ?",
+                [(content_hash(text), chunk_id) for chunk_id, text in rows]
+            )
+            if rows:
+                logger.info(f"Inhalts-Hash für {len(rows)} Chunks ergänzt")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_content_hash ON chunks (content_hash)")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Eine Verbindung pro Thread, da die Suche in Executor-Threads läuft"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path))
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add_many(self, entries: Iterable[Tuple[int, str, Dict[str, Any]]]):
+        """
+        Speichert mehrere Chunks in einer Transaktion
+
+        Args:
+            entries: Tupel aus (Vektor-ID, Text, Metadaten)
+        """
+        rows = [
+            (int(chunk_id), metadata.get("source_id"), text, json.dumps(metadata, ensure_ascii=False), content_hash(text))
+            for chunk_id, text, metadata in entries
+        ]
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, source_id, text, metadata, content_hash) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Liest Text und Metadaten für die angegebenen Vektor-IDs
+
+        Returns:
+            Dict von Vektor-ID auf {"text": ..., "metadata": ..., "references": [...]};
+            references enthält die Metadaten weiterer Quellen mit demselben Chunk.
+            Fehlende IDs fehlen im Ergebnis
+        """
+        ids = [int(chunk_id) for chunk_id in ids]
+        result = {}
+        conn = self._connection()
+
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            batch = ids[start:start + MAX_SQL_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})",
+                batch
+            )
+            for chunk_id, text, metadata in rows:
+                result[chunk_id] = {
+                    "text": text,
+                    "metadata": json.loads(metadata),
+                    "references": []
+                }
+
+            refs = conn.execute(
+                f"SELECT chunk_id, metadata FROM chunk_refs WHERE chunk_id IN ({placeholders}) ORDER BY source_id",
+                batch
+            )
+            for chunk_id, metadata in refs:
+                if chunk_id in result:
+                    result[chunk_id]["references"].append(json.loads(metadata))
+
+        return result
+
+    def update_metadata(self, entries: Dict[int, Dict[str, Any]]):
+        """Ersetzt die Metadaten vorhandener Chunks (Vektor-ID -> Metadaten)"""
+        rows = [
+            (json.dumps(metadata, ensure_ascii=False), metadata.get("source_id"), int(chunk_id))
+            for chunk_id, metadata in entries.items()
+        ]
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("UPDATE chunks SET metadata = ?, source_id = ? WHERE id = ?", rows)
+
+    def find_hashes(self, hashes: Iterable[str]) -> Dict[str, Tuple[int, Optional[int]]]:
+        """
+        Sucht bereits gespeicherte Chunks mit den angegebenen Inhalts-Hashes
+
+        Returns:
+            Dict von Hash auf (Vektor-ID, Quellen-ID) des ältesten passenden Chunks
+        """
+        hashes = list(set(hashes))
+        result = {}
+        conn = self._connection()
+
+        for start in range(0, len(hashes), MAX_SQL_PARAMS):
+            batch = hashes[start:start + MAX_SQL_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT content_hash, MIN(id), source_id FROM chunks WHERE content_hash IN ({placeholders}) GROUP BY content_hash",
+                batch
+            )
+            for digest, chunk_id, source_id in rows:
+                result[digest] = (chunk_id, source_id)
+
+        return result
+
+    def add_refs(self, entries: Iterable[Tuple[int, int, Dict[str, Any]]]):
+        """
+        Erfasst weitere Quellen vorhandener Chunks
+
+        Args:
+            entries: Tupel aus (Vektor-ID, Quellen-ID, Metadaten der Quelle)
+        """
+        rows = [
+            (int(chunk_id), int(source_id), json.dumps(metadata, ensure_ascii=False))
+            for chunk_id, source_id, metadata in entries
+        ]
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chunk_refs (chunk_id, source_id, metadata) VALUES (?, ?, ?)",
+                    rows
+                )
+
+    def ref_ids_for_source(self, source_id: int) -> List[int]:
+        """Vektor-IDs der Chunks, die eine Quelle nur referenziert"""
+        rows = self._connection().execute(
+            "SELECT chunk_id FROM chunk_refs WHERE source_id = ? ORDER BY chunk_id",
+            (source_id,)
+        )
+        return [row[0] for row in rows]
+
+    def remove_refs(self, source_id: int, ids: Optional[Iterable[int]] = None):
+        """Entfernt die Referenzen einer Quelle (alle oder nur auf die angegebenen Chunks)"""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                if ids is None:
+                    conn.execute("DELETE FROM chunk_refs WHERE source_id = ?", (source_id,))
+                    return
+                conn.executemany(
+                    "DELETE FROM chunk_refs WHERE source_id = ? AND chunk_id = ?",
+                    [(source_id, int(chunk_id)) for chunk_id in ids]
+                )
+
+    def transfer_referenced(self, ids: Iterable[int]) -> List[Tuple[int, int]]:
+        """
+        Übergibt referenzierte Chunks an eine ihrer referenzierenden Quellen
+
+        Wird vor dem Entfernen von Chunks aufgerufen: Chunks, die noch von
+        anderen Quellen referenziert werden, bleiben erhalten und gehören
+        danach der Quelle mit der kleinsten ID (deren Referenz entfällt).
+
+        Returns:
+            Paare aus (Vektor-ID, neue Quellen-ID) der übergebenen Chunks
+        """
+        ids = [int(chunk_id) for chunk_id in ids]
+        transferred = []
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                for start in range(0, len(ids), MAX_SQL_PARAMS):
+                    batch = ids[start:start + MAX_SQL_PARAMS]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT chunk_id, source_id, metadata FROM chunk_refs WHERE chunk_id IN ({placeholders}) "
+                        f"ORDER BY chunk_id, source_id",
+                        batch
+                    ).fetchall()
+
+                    seen = set()
+                    for chunk_id, source_id, metadata in rows:
+                        if chunk_id in seen:
+                            continue
+                        seen.add(chunk_id)
+                        conn.execute(
+                            "UPDATE chunks SET source_id = ?, metadata = ? WHERE id = ?",
+                            (source_id, metadata, chunk_id)
+                        )
+                        conn.execute(
+                            "DELETE FROM chunk_refs WHERE chunk_id = ? AND source_id = ?",
+                            (chunk_id, source_id)
+                        )
+                        transferred.append((chunk_id, source_id))
+        return transferred
+
+    def metadata_for_source(self, source_id: int) -> Dict[int, Dict[str, Any]]:
+        """Metadaten aller Chunks einer Quelle, eigene und referenzierte (Vektor-ID -> Metadaten)"""
+        conn = self._connection()
+        result = {
+            chunk_id: json.loads(metadata)
+            for chunk_id, metadata in conn.execute("SELECT id, metadata FROM chunks WHERE source_id = ?", (source_id,))
+        }
+        for chunk_id, metadata in conn.execute("SELECT chunk_id, metadata FROM chunk_refs WHERE source_id = ?", (source_id,)):
+            result[chunk_id] = json.loads(metadata)
+        return result
+
+    def source_for_file(self, digest: str) -> Optional[int]:
+        """Quelle, unter der eine Datei mit diesem Inhalts-Hash indiziert ist"""
+        row = self._connection().execute("SELECT source_id FROM files WHERE content_hash = ?", (digest,)).fetchone()
+        return row[0] if row else None
+
+    def set_file(self, digest: str, source_id: int):
+        """Merkt sich den Inhalts-Hash der Datei einer Quelle (die erste Quelle behält ihn)"""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM files WHERE source_id = ? AND content_hash != ?", (source_id, digest))
+                conn.execute("INSERT OR IGNORE INTO files (content_hash, source_id) VALUES (?, ?)", (digest, source_id))
+
+    def remove_files(self, source_id: int):
+        """Vergisst die Datei-Hashes einer Quelle"""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM files WHERE source_id = ?", (source_id,))
+
+    def dedup_stats(self) -> Dict[str, int]:
+        """Anzahl der Chunks, Referenzen und Dateien"""
+        conn = self._connection()
+        return {
+            "chunks": conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0],
+            "references": conn.execute("SELECT COUNT(*) FROM chunk_refs").fetchone()[0],
+            "files": conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        }
+
+    def ids_for_source(self, source_id: int) -> List[int]:
+        """Vektor-IDs aller Chunks einer Quelle"""
+        rows = self._connection().execute(
+            "SELECT id FROM chunks WHERE source_id = ? ORDER BY id",
+            (source_id,)
+        )
+        return [row[0] for row in rows]
+
+    def source_assignments(self) -> Iterator[Tuple[int, Optional[int]]]:
+        """Paare aus (Vektor-ID, Quellen-ID) aller gespeicherten Chunks"""
+        return iter(self._connection().execute("SELECT id, source_id FROM chunks"))
+
+    def ref_assignments(self) -> Iterator[Tuple[int, int]]:
+        """Paare aus (Vektor-ID, Quellen-ID) aller Referenzen auf Chunks anderer Quellen"""
+        return iter(self._connection().execute("SELECT chunk_id, source_id FROM chunk_refs"))
+
+    def all_ids(self) -> List[int]:
+        """Vektor-IDs aller gespeicherten Chunks"""
+        return [row[0] for row in self._connection().execute("SELECT id FROM chunks")]
+
+    def existing_ids(self, ids: Iterable[int]) -> Set[int]:
+        """Die angegebenen Vektor-IDs, zu denen ein Chunk gespeichert ist"""
+        ids = [int(chunk_id) for chunk_id in ids]
+        conn = self._connection()
+        found = set()
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            batch = ids[start:start + MAX_SQL_PARAMS]
+            placeholders = ",".join("?" * len(batch))
+            found.update(row[0] for row in conn.execute(f"SELECT id FROM chunks WHERE id IN ({placeholders})", batch))
+        return found
+
+    def delete_many(self, ids: Iterable[int]):
+        """Entfernt die Chunks mit den angegebenen Vektor-IDs"""
+        ids = [int(chunk_id) for chunk_id in ids]
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                for start in range(0, len(ids), MAX_SQL_PARAMS):
+                    batch = ids[start:start + MAX_SQL_PARAMS]
+                    placeholders = ",".join("?" * len(batch))
+                    conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+                    conn.execute(f"DELETE FROM chunk_refs WHERE chunk_id IN ({placeholders})", batch)
+
+    def clear(self):
+        """Entfernt alle Chunks"""
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM chunks")
+                conn.execute("DELETE FROM chunk_refs")
+                conn.execute("DELETE FROM files")
+
+    def max_id(self) -> Optional[int]:
+        """Größte vergebene Vektor-ID (None, wenn der Speicher leer ist)"""
+        return self._connection().execute("SELECT MAX(id) FROM chunks").fetchone()[0]
+
+    def count(self) -> int:
+        """Anzahl der gespeicherten Chunks"""
+        return self._connection().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def import_lookup(self, lookup_file: Path) -> int:
+        """
+        Übernimmt ein altes document_lookup.json in den Chunk-Speicher
+
+        Die JSON-Datei wird danach in document_lookup.json.migrated umbenannt.
+
+        Returns:
+            Anzahl der übernommenen Chunks
+        """
+        with open(lookup_file, 'r', encoding='utf-8') as f:
+            lookup = json.load(f)
+
+        entries: List[Tuple[int, str, Dict[str, Any]]] = [
+            (int(doc_id), doc["text"], doc["metadata"])
+            for doc_id, doc in lookup.items()
+        ]
+        self.add_many(entries)
+
+        lookup_file.rename(lookup_file.with_name(lookup_file.name + ".migrated"))
+        logger.info(f"{len(entries)} Chunks aus {lookup_file.name} in den Chunk-Speicher übernommen")
+        return len(entries)
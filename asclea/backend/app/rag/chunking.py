@@ -0,0 +1,229 @@
+# backend/app/rag/chunking.py
+import copy
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Satzgrenze: Satzzeichen, Leerraum, danach Großbuchstabe, Ziffer oder Aufzählungszeichen
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[A-ZÄÖÜ0-9•\-–(])")
+
+# Häufige Abkürzungen, nach denen kein Satz endet
+ABBREVIATIONS = frozenset([
+    "z.", "b.", "z.b.", "bzw.", "ca.", "dr.", "prof.", "abb.", "tab.", "vgl.", "ggf.", "u.", "a.", "d.",
+    "d.h.", "u.a.", "nr.", "i.v.", "i.m.", "s.c.", "p.o.", "evtl.", "inkl.", "max.", "s.",
+    "kap.", "mind.", "sog.", "usw.", "etc.", "jh.", "e.v.", "v.a.", "z.t.", "u.u.", "o.g.", "s.o.", "s.u.",
+    "i.d.r.", "bzgl.", "ggü.", "tbl.", "pat.", "hrsg.", "mio.", "mrd."
+])
+
+# Datumsangaben ("am 12. März"): der Punkt nach dem Tag beendet keinen Satz
+DATE_DAY = re.compile(r"^\d{1,2}\.$")
+MONTH_START = re.compile(r"^(?:Januar|Februar|März|April|Mai|Juni|Juli|August|September|Oktober|November|Dezember)\b")
+
+# Einheiten beenden häufig einen Satz ("Dann 5 mg. Danach ..."); nur vor einer Zahl
+# ist der Punkt eine Abkürzung (vor Kleinbuchstaben wird ohnehin nicht getrennt)
+UNIT_ABBREVIATIONS = frozenset(["mg.", "µg.", "g.", "kg.", "ml.", "l.", "mmol.", "std.", "min."])
+
+# Nummerierte Überschriften wie "3.2 Diagnostik" oder "3.2.1. Labor"
+NUMBERED_HEADING = re.compile(r"^\d+(?:\.\d+)*\.?\s+\S.{0,100}$")
+
+# Positionsangaben, deren Bereich in den Chunk-Metadaten festgehalten wird
+POSITION_KEYS = ("page", "paragraph", "row")
+
+TokenCounter = Callable[[str], int]
+
+def make_token_counter(tokenizer=None) -> TokenCounter:
+    """
+    Erstellt eine Funktion, die Tokens eines Textes zählt
+
+    Schnelle Hugging-Face-Tokenizer sind nicht threadsicher ("Already
+    borrowed"). Die Funktion verwendet daher eine eigene Kopie des Tokenizers,
+    die sie nicht mit dem Embedding-Modell teilt, und zählt unter einer Sperre,
+    da mehrere Dokumente gleichzeitig in Executor-Threads zerlegt werden.
+
+    Args:
+        tokenizer: Hugging-Face-Tokenizer (z.B. SentenceTransformer.tokenizer);
+            ohne Tokenizer wird über die Wortzahl geschätzt
+    """
+    if tokenizer is not None:
+        tokenizer = copy.deepcopy(tokenizer)
+        lock = threading.Lock()
+
+        def count_tokens(text: str) -> int:
+            with lock:
+                return len(tokenizer.encode(text, add_special_tokens=False))
+
+        return count_tokens
+    return lambda text: int(len(text.split()) * 1.3) + 1
+
+def normalize_text(text: str) -> str:
+    """Fügt Silbentrennungen am Zeilenende zusammen und vereinheitlicht Leerraum"""
+    text = re.sub(r"(?<=[a-zäöüß])-\n(?=[a-zäöüß])", "", text)
+    return " ".join(text.split())
+
+def looks_like_heading(text: str) -> bool:
+    """Heuristik für Überschriften in unstrukturiertem Text (z.B. PDF-Blöcke)"""
+    text = text.strip()
+    return "\n" not in text and not text.endswith((".", ",", ";", ":")) and bool(NUMBERED_HEADING.match(text))
+
+def split_sentences(text: str) -> List[str]:
+    """Zerlegt einen Text in Sätze und berücksichtigt dabei gängige Abkürzungen"""
+    sentences: List[str] = []
+    for part in SENTENCE_BOUNDARY.split(normalize_text(text)):
+        last_word = sentences[-1].rsplit(" ", 1)[-1].lower() if sentences else ""
+        if (
+            last_word in ABBREVIATIONS
+            or (last_word in UNIT_ABBREVIATIONS and part[:1].isdigit())
+            or (DATE_DAY.match(last_word) and MONTH_START.match(part))
+        ):
+            sentences[-1] = f"{sentences[-1]} {part}"
+        elif part:
+            sentences.append(part)
+    return sentences
+
+def _split_long_sentence(sentence: str, count_tokens: TokenCounter, max_tokens: int) -> List[Tuple[str, int]]:
+    """Teilt einen Satz, der allein das Token-Budget überschreitet, an Wortgrenzen"""
+    pieces, words, tokens = [], [], 0
+    for word in sentence.split():
+        word_tokens = count_tokens(word)
+        if words and tokens + word_tokens > max_tokens:
+            pieces.append((" ".join(words), tokens))
+            words, tokens = [], 0
+        words.append(word)
+        tokens += word_tokens
+    if words:
+        pieces.append((" ".join(words), tokens))
+    return pieces
+
+def _merge_metadata(first: Dict[str, Any], last: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadaten des ersten Blocks, ergänzt um den Endbereich der Positionsangaben"""
+    metadata = dict(first)
+    for key in POSITION_KEYS:
+        if key in last and last[key] != first.get(key):
+            metadata[f"{key}_end"] = last[key]
+    return metadata
+
+def chunk_blocks(
+    blocks: Iterable[Dict[str, Any]],
+    count_tokens: TokenCounter,
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+    min_tokens: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    Fasst Textblöcke zu Chunks mit annähernd gleicher Tokenzahl zusammen
+
+    Chunks enden an Satzgrenzen und überschreiten keine Überschrift. Die
+    Überschriftenhierarchie wird dem Chunk-Text vorangestellt und als
+    "section" in den Metadaten gespeichert. Aufeinanderfolgende Chunks
+    überlappen um bis zu overlap_tokens Tokens ganzer Sätze; Teile eines
+    überlangen Satzes werden nur mit dem Satzanfang übernommen.
+
+    Args:
+        blocks: Dicts mit "text" und "metadata"; Überschriften zusätzlich mit
+            "heading_level" (1 = oberste Ebene)
+        count_tokens: Funktion zum Zählen der Tokens
+        chunk_tokens: Ziel-Tokenzahl pro Chunk (inklusive Überschrift)
+        overlap_tokens: Überlappung zwischen aufeinanderfolgenden Chunks
+        min_tokens: Kleinere Reste werden an den vorherigen Chunk derselben Sektion angehängt
+
+    Returns:
+        Liste von Dicts mit "text" und "metadata"
+    """
+    chunks: List[Dict[str, Any]] = []
+    chunk_sizes: List[int] = []
+    headings: List[Tuple[int, str]] = []
+    section = ""
+    section_tokens = 0
+
+    current: List[Tuple[str, int, Dict[str, Any], bool]] = []  # (Text, Tokens, Metadaten, Satzanfang)
+    current_tokens = 0
+    fresh = 0  # Sätze seit dem letzten Chunk (ohne Überlappung)
+
+    def flush(keep_overlap: bool):
+        nonlocal current, current_tokens, fresh
+        if fresh == 0:
+            current, current_tokens = [], 0
+            return
+
+        body = " ".join(sentence for sentence, _, _, _ in current)
+        metadata = _merge_metadata(current[0][2], current[-1][2])
+
+        previous = chunks[-1] if chunks else None
+        if (
+            current_tokens < min_tokens and previous is not None
+            and previous["metadata"].get("section", "") == section
+            and chunk_sizes[-1] + current_tokens <= chunk_tokens + min_tokens
+        ):
+            # Kleinen Rest an den vorherigen Chunk anhängen
+            new_part = " ".join(sentence for sentence, _, _, _ in current[len(current) - fresh:])
+            previous["text"] = f"{previous['text']} {new_part}"
+            previous["metadata"] = _merge_metadata(previous["metadata"], current[-1][2])
+            chunk_sizes[-1] += current_tokens
+        else:
+            if section:
+                metadata["section"] = section
+            metadata["chunk"] = len(chunks) + 1
+            chunks.append({
+                "text": f"{section}\n{body}" if section else body,
+                "metadata": metadata
+            })
+            chunk_sizes.append(section_tokens + current_tokens)
+
+        # Letzte Sätze als Überlappung in den nächsten Chunk übernehmen
+        overlap: List[Tuple[str, int, Dict[str, Any], bool]] = []
+        overlap_size = 0
+        if keep_overlap:
+            for item in reversed(current):
+                if overlap_size + item[1] > overlap_tokens:
+                    break
+                overlap.insert(0, item)
+                overlap_size += item[1]
+
+        current, current_tokens, fresh = overlap, overlap_size, 0
+        trim_to_sentence_start()
+
+    def trim_to_sentence_start():
+        # Die Überlappung beginnt immer mit einem Satzanfang
+        nonlocal current_tokens
+        while current and not current[0][3]:
+            current_tokens -= current.pop(0)[1]
+
+    for block in blocks:
+        level = block.get("heading_level")
+        if level:
+            # Überschrift: laufenden Chunk abschließen und Hierarchie aktualisieren
+            flush(keep_overlap=False)
+            headings = [(l, h) for l, h in headings if l < level] + [(level, normalize_text(block["text"]))]
+            section = " > ".join(h for _, h in headings)
+            section_tokens = count_tokens(section) if section else 0
+            continue
+
+        budget = max(1, chunk_tokens - section_tokens)
+        for sentence in split_sentences(block["text"]):
+            tokens = count_tokens(sentence)
+            pieces = _split_long_sentence(sentence, count_tokens, budget) if tokens > budget else [(sentence, tokens)]
+
+            for position, (piece, piece_tokens) in enumerate(pieces):
+                if current_tokens + piece_tokens > budget:
+                    flush(keep_overlap=True)
+                    # Überlappung darf zusammen mit dem neuen Satz das Budget nicht sprengen
+                    while current and current_tokens + piece_tokens > budget:
+                        current_tokens -= current.pop(0)[1]
+                    trim_to_sentence_start()
+                current.append((piece, piece_tokens, block["metadata"], position == 0))
+                current_tokens += piece_tokens
+                fresh += 1
+
+    flush(keep_overlap=False)
+    return chunks
+
+def resolve_chunk_tokens(configured: int, max_seq_length: Optional[int]) -> int:
+    """
+    Bestimmt die Ziel-Tokenzahl pro Chunk
+
+    0 bedeutet: maximale Sequenzlänge des Embedding-Modells abzüglich der
+    Spezialtokens, da längere Chunks beim Embedding abgeschnitten würden.
+    """
+    if configured > 0:
+        return configured
+    return max(16, max_seq_length - 2) if max_seq_length else 256
@@ -0,0 +1,123 @@
+# backend/app/rag/context.py
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+def mmr_order(
+    query_embedding: np.ndarray,
+    doc_embeddings: np.ndarray,
+    lambda_mult: float = 0.7,
+    duplicate_threshold: float = 0.95
+) -> List[int]:
+    """
+    Ordnet Treffer nach Maximal Marginal Relevance
+
+    Jeder Schritt wählt den Treffer mit der besten Abwägung zwischen Relevanz
+    zur Anfrage und Unähnlichkeit zu den bereits gewählten Treffern. Treffer,
+    deren Kosinus-Ähnlichkeit zu einem gewählten Treffer mindestens
+    duplicate_threshold beträgt, gelten als Duplikat und werden verworfen.
+
+    Args:
+        query_embedding: Embedding der Anfrage
+        doc_embeddings: Embeddings der Treffer (eine Zeile je Treffer)
+        lambda_mult: Gewicht der Relevanz (1.0 = reine Relevanz, 0.0 = reine Vielfalt)
+        duplicate_threshold: Ähnlichkeit, ab der ein Treffer als Duplikat gilt
+
+    Returns:
+        Indizes der behaltenen Treffer in Auswahlreihenfolge
+    """
+    if len(doc_embeddings) == 0:
+        return []
+
+    docs = _normalize_rows(doc_embeddings)
+    relevance = docs @ _normalize_rows(query_embedding).ravel()
+    similarity = docs @ docs.T
+
+    remaining = list(range(len(docs)))
+    selected: List[int] = []
+    while remaining:
+        if selected:
+            redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining), dtype=np.float32)
+
+        # Duplikate bereits gewählter Treffer verwerfen
+        keep = redundancy < duplicate_threshold
+        remaining = [idx for idx, k in zip(remaining, keep) if k]
+        if not remaining:
+            break
+        redundancy = redundancy[keep]
+
+        scores = lambda_mult * relevance[remaining] - (1.0 - lambda_mult) * redundancy
+        best = remaining[int(np.argmax(scores))]
+        selected.append(best)
+        remaining.remove(best)
+
+    return selected
+
+def pack_context(
+    docs: List[Dict[str, Any]],
+    count_tokens: Callable[[str], int],
+    budget_tokens: int,
+    query_embedding: Optional[np.ndarray] = None,
+    doc_embeddings: Optional[np.ndarray] = None,
+    lambda_mult: float = 0.7,
+    duplicate_threshold: float = 0.95,
+    template: str = "Information: {text}\n\n"
+) -> Dict[str, Any]:
+    """
+    Stellt den Kontext für den Prompt innerhalb eines Token-Budgets zusammen
+
+    Ohne Embeddings bleibt die Reihenfolge der Treffer erhalten und es werden
+    nur textgleiche Treffer entfernt. Treffer, die nicht mehr ins Budget
+    passen, werden übersprungen; kleinere nachfolgende Treffer können die
+    Lücke noch füllen.
+
+    Args:
+        docs: Suchtreffer mit "text" (in Rangfolge)
+        count_tokens: Funktion zum Zählen der LLM-Tokens
+        budget_tokens: Verfügbare Tokens für den Kontext
+        query_embedding: Embedding der Anfrage (für MMR)
+        doc_embeddings: Embeddings der Treffer in derselben Reihenfolge wie docs
+        lambda_mult: Gewicht der Relevanz bei MMR
+        duplicate_threshold: Ähnlichkeit, ab der ein Treffer als Duplikat gilt
+        template: Formatierung eines Treffers im Kontext
+
+    Returns:
+        Dict mit "context", den verwendeten "docs" und "tokens"
+    """
+    if query_embedding is not None and doc_embeddings is not None and len(doc_embeddings) == len(docs):
+        order = mmr_order(query_embedding, doc_embeddings, lambda_mult, duplicate_threshold)
+    else:
+        order = list(range(len(docs)))
+
+    parts, used_docs, seen_texts = [], [], set()
+    tokens = 0
+    for idx in order:
+        doc = docs[idx]
+        if doc["text"] in seen_texts:
+            continue
+        part = template.format(text=doc["text"])
+        part_tokens = count_tokens(part)
+        if tokens + part_tokens > budget_tokens:
+            continue
+        parts.append(part)
+        used_docs.append(doc)
+        seen_texts.add(doc["text"])
+        tokens += part_tokens
+
+    if len(used_docs) < len(docs):
+        logger.info(
+            f"Kontext: {len(used_docs)}/{len(docs)} Treffer verwendet "
+            f"({tokens}/{budget_tokens} Tokens, Duplikate oder Budget überschritten)"
+        )
+
+    return {"context": "".join(parts), "docs": used_docs, "tokens": tokens}
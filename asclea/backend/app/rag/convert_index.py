@@ -0,0 +1,117 @@
+# backend/app/rag/convert_index.py
+"""
+Wandelt einen gespeicherten Vektorindex in ein anderes Ähnlichkeitsmaß bzw.
+Speicherformat um (z.B. L2/float32 nach Kosinus/fp16), inklusive aller Shards.
+Die Vektor-IDs bleiben erhalten, Chunk-Speicher und BM25-Index müssen daher nicht angepasst werden.
+
+Das Vektorverzeichnis wird dafür gesperrt, und das Vektor-Log muss leer
+sein (die API übernimmt es beim regulären Beenden in den Snapshot). Eine
+laufende API sucht bis zum Neuladen (POST /api/admin/index/reload, spätestens
+vor ihrem nächsten Schreibvorgang) im bisherigen Index.
+
+Aufruf:
+    python -m app.rag.convert_index --metric ip --storage fp16
+"""
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict
+
+import faiss
+
+from app.core.config import settings
+from app.rag.index import (
+    INDEX_TYPES, METRICS, STORAGE_CODES, build_index, fit_params_to_data,
+    load_index_params, prepare_vectors, reconstruct_all, save_index_params, write_index_atomic
+)
+from app.rag.lock import DirectoryLock
+
+logger = logging.getLogger(__name__)
+
+def convert_file(index_file: Path, params_file: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Wandelt eine Indexdatei (einen Shard) um und ersetzt sie atomar
+
+    Returns:
+        Die Parameter des neuen Index
+    """
+    index = faiss.read_index(str(index_file))
+    params = load_index_params(params_file)
+    old_size = len(faiss.serialize_index(index))
+
+    new_params = dict(params, metric=args.metric, storage=args.storage)
+    if args.index_type:
+        new_params["index_type"] = args.index_type
+
+    if params["index_type"] == "ivf_pq" or params["storage"] != "float32":
+        logger.warning(f"{index_file.name} ist quantisiert, die Umwandlung verwendet nur approximierte Vektoren")
+
+    ids, vectors = reconstruct_all(index)
+    new_params = fit_params_to_data(new_params, len(vectors))
+    new_index = build_index(prepare_vectors(vectors, new_params), new_params, ids)
+    new_size = len(faiss.serialize_index(new_index))
+
+    # Neue Version, damit zwischengespeicherte Antworten verworfen werden
+    if index_file.name == "faiss_index.bin":
+        new_params["version"] = params.get("version", 0) + 1
+    write_index_atomic(new_index, index_file)
+    save_index_params(params_file, new_params)
+
+    print(
+        f"{new_index.ntotal} Vektoren umgewandelt ({index_file.name}): "
+        f"{old_size / 2**20:.1f} MiB -> {new_size / 2**20:.1f} MiB"
+    )
+    return new_params
+
+def main():
+    parser = argparse.ArgumentParser(description="Ähnlichkeitsmaß und Speicherformat eines Vektorindex umwandeln")
+    parser.add_argument("--vector-db-path", default=settings.VECTOR_DB_PATH)
+    parser.add_argument("--metric", choices=METRICS, default=settings.VECTOR_METRIC)
+    parser.add_argument("--storage", choices=list(STORAGE_CODES), default=settings.VECTOR_STORAGE)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, help="Zusätzlich den Indextyp wechseln")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    vector_db_path = Path(args.vector_db_path)
+    index_file = vector_db_path / "faiss_index.bin"
+    params_file = vector_db_path / "index_config.json"
+    log_file = vector_db_path / "faiss_index.wal"
+
+    lock = DirectoryLock(vector_db_path / ".lock")
+    try:
+        lock.acquire()
+    except RuntimeError as e:
+        logger.error(str(e))
+        raise SystemExit(1)
+
+    if log_file.exists() and log_file.stat().st_size > 0:
+        lock.release()
+        logger.error(
+            "Das Vektor-Log enthält noch nicht übernommene Änderungen. "
+            "Den Dienst einmal starten und regulär beenden, dann erneut umwandeln."
+        )
+        raise SystemExit(1)
+
+    # Standard-Shard zuerst, damit die Indexversion mit ihm gespeichert wird
+    targets = [(index_file, params_file)] + [
+        (path, path.with_suffix(".json")) for path in sorted((vector_db_path / "shards").glob("*.bin"))
+    ]
+
+    try:
+        for target_file, target_params_file in targets:
+            params = load_index_params(target_params_file)
+            new_params = convert_file(target_file, target_params_file, args)
+            print(
+                f"  {target_file.name}: {params['index_type']}/{params['metric']}/{params['storage']} -> "
+                f"{new_params['index_type']}/{new_params['metric']}/{new_params['storage']}"
+            )
+    finally:
+        # Änderungszähler erhöhen, damit eine laufende API vor dem nächsten Schreiben neu lädt
+        lock.release(changed=True)
+
+    if (new_params["metric"], new_params["storage"]) != (settings.VECTOR_METRIC, settings.VECTOR_STORAGE):
+        print("Hinweis: VECTOR_METRIC und VECTOR_STORAGE in der .env entsprechend anpassen")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# backend/app/rag/embedder.py
+"""
+Embedding-Modelle mit austauschbarem Backend
+
+Backends:
+    torch       SentenceTransformer in voller Genauigkeit (PyTorch)
+    torch_int8  PyTorch mit dynamisch int8-quantisierten Linear-Schichten
+    onnx        ONNX Runtime (benötigt optimum[onnxruntime], siehe requirements-onnx.txt)
+    onnx_int8   ONNX Runtime mit int8-quantisiertem Modell
+
+Gleichheitsprüfung gegenüber den PyTorch-Embeddings:
+    python -m app.rag.embedder --backend onnx_int8
+"""
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+# Quantisiertes ONNX-Modell, das auf allen x86-CPUs mit AVX2 läuft
+DEFAULT_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+# Beispielsätze für die Gleichheitsprüfung
+PARITY_SENTENCES = [
+    "Welche Erstlinientherapie empfiehlt die Leitlinie bei ambulant erworbener Pneumonie?",
+    "Metformin ist bei einer eGFR unter 30 ml/min kontraindiziert.",
+    "Differentialdiagnose akuter Thoraxschmerz mit ST-Hebungen im EKG",
+    "Dosierung von Amoxicillin bei Kindern mit akuter Otitis media",
+    "S3-Leitlinie Diagnostik und Therapie der Sepsis, AWMF-Registernummer 079-001",
+    "Fieber nach Rückkehr aus Westafrika: Malaria ausschließen",
+    "Kontrolle des HbA1c-Werts alle drei Monate",
+    "Warnzeichen für eine Subarachnoidalblutung sind plötzlich einsetzende, stärkste Kopfschmerzen.",
+]
+
+class Embedder:
+    """
+    Schnittstelle der Embedding-Modelle
+
+    Implementierungen liefern normale float32-Matrizen, unabhängig davon, wie
+    das Modell intern rechnet.
+    """
+
+    name: str = ""
+    max_seq_length: Optional[int] = None
+    tokenizer: Any = None
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Erzeugt die Embeddings der Texte (eine Zeile je Text)"""
+        raise NotImplementedError
+
+    def get_sentence_embedding_dimension(self) -> int:
+        raise NotImplementedError
+
+class SentenceTransformerEmbedder(Embedder):
+    """
+    Embedding-Modell auf Basis von sentence-transformers
+
+    Args:
+        model_name: Name oder Pfad des Modells
+        backend: Eines von EMBEDDING_BACKENDS
+        onnx_file: ONNX-Datei im Modellverzeichnis (Standard: model.onnx bzw.
+            DEFAULT_ONNX_INT8_FILE bei onnx_int8)
+    """
+
+    def __init__(self, model_name: str, backend: str = "torch", onnx_file: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unbekanntes Embedding-Backend: {backend} (erlaubt: {', '.join(EMBEDDING_BACKENDS)})")
+
+        if backend in ("onnx", "onnx_int8"):
+            file_name = onnx_file or (DEFAULT_ONNX_INT8_FILE if backend == "onnx_int8" else None)
+            model_kwargs = {"file_name": file_name} if file_name else None
+            self.model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        else:
+            self.model = SentenceTransformer(model_name, device="cpu" if backend == "torch_int8" else None)
+            if backend == "torch_int8":
+                import torch
+
+                # Linear-Schichten dynamisch auf int8 quantisieren (nur CPU)
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        self.backend = backend
+        self.name = f"{model_name}:{backend}"
+        self.max_seq_length = self.model.max_seq_length
+        self.tokenizer = getattr(self.model, "tokenizer", None)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+def create_embedder(
+    model_name: Optional[str] = None,
+    backend: Optional[str] = None,
+    onnx_file: Optional[str] = None
+) -> Embedder:
+    """Erstellt das Embedding-Modell gemäß den Einstellungen"""
+    return SentenceTransformerEmbedder(
+        model_name or settings.EMBEDDING_MODEL,
+        backend or settings.EMBEDDING_BACKEND,
+        onnx_file if onnx_file is not None else (settings.EMBEDDING_ONNX_FILE or None)
+    )
+
+def check_parity(
+    embedder: Embedder,
+    reference: Embedder,
+    texts: List[str],
+    batch_size: int = 32
+) -> Dict[str, float]:
+    """
+    Vergleicht die Embeddings eines Backends mit einem Referenzmodell
+
+    Returns:
+        Dict mit minimaler und mittlerer Kosinus-Ähnlichkeit, maximaler absoluter
+        Abweichung und Durchsatz (Texte pro Sekunde) beider Modelle
+    """
+    def timed(model: Embedder):
+        start = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=batch_size)
+        return embeddings, len(texts) / max(time.perf_counter() - start, 1e-9)
+
+    reference.encode(texts[:batch_size], batch_size=batch_size)  # Aufwärmen
+    embedder.encode(texts[:batch_size], batch_size=batch_size)
+    expected, reference_rate = timed(reference)
+    actual, rate = timed(embedder)
+
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+        "texts_per_second": rate,
+        "reference_texts_per_second": reference_rate
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding-Backend gegen PyTorch-Embeddings prüfen")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default=settings.EMBEDDING_BACKEND)
+    parser.add_argument("--onnx-file", default=settings.EMBEDDING_ONNX_FILE or None)
+    parser.add_argument("--texts", help="Textdatei mit einem Text pro Zeile (Standard: Beispielsätze)")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Mindestähnlichkeit je Text")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.texts:
+        with open(args.texts, 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = PARITY_SENTENCES * 16
+
+    reference = SentenceTransformerEmbedder(args.model, "torch")
+    embedder = SentenceTransformerEmbedder(args.model, args.backend, args.onnx_file)
+    result = check_parity(embedder, reference, texts, args.batch_size)
+
+    print(
+        f"{embedder.name}: Kosinus min={result['min_cosine']:.5f} mittel={result['mean_cosine']:.5f}, "
+        f"max. Abweichung={result['max_abs_diff']:.5f}, "
+        f"{result['texts_per_second']:.1f} Texte/s (torch: {result['reference_texts_per_second']:.1f} Texte/s)"
+    )
+    if result["min_cosine"] < args.min_cosine:
+        print(f"Gleichheitsprüfung fehlgeschlagen (min. Kosinus < {args.min_cosine}), Index mit diesem Backend neu aufbauen")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# backend/app/rag/evaluate_recall.py
+"""
+Vergleicht die Trefferqualität (recall@k) und Latenz verschiedener Indextypen
+mit einer exakten Suche über denselben Vektoren.
+
+Aufruf:
+    python -m app.rag.evaluate_recall --index-types ivf_flat,hnsw --nprobe 4,16,64 --ef-search 32,64,128
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import List
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.rag.index import (
+    apply_search_params, build_index, compute_recall, default_index_params,
+    fit_params_to_data, load_index_params, prepare_vectors, reconstruct_all
+)
+
+logger = logging.getLogger(__name__)
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def load_queries(args, vectors: np.ndarray) -> np.ndarray:
+    """Lädt Anfragen aus einer Textdatei oder erzeugt sie aus gestörten Indexvektoren"""
+    if args.queries:
+        from app.rag.embedder import create_embedder
+
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+        model = create_embedder()
+        return model.encode(texts, batch_size=64)
+
+    rng = np.random.default_rng(args.seed)
+    sample = vectors[rng.choice(len(vectors), min(args.num_queries, len(vectors)), replace=False)]
+    noise = rng.normal(scale=args.noise * float(np.std(vectors)), size=sample.shape)
+    return (sample + noise).astype(np.float32)
+
+def main():
+    parser = argparse.ArgumentParser(description="recall@k verschiedener Indextypen gegenüber exakter Suche")
+    parser.add_argument("--index-file", default=str(Path(settings.VECTOR_DB_PATH) / "faiss_index.bin"))
+    parser.add_argument("--index-types", default="", help="Zusätzlich zu testende Indextypen, kommagetrennt")
+    parser.add_argument("--k", type=int, default=7)
+    parser.add_argument("--num-queries", type=int, default=1000)
+    parser.add_argument("--queries", help="Textdatei mit einer Anfrage pro Zeile")
+    parser.add_argument("--noise", type=float, default=0.1, help="Störung synthetischer Anfragen (relativ zur Standardabweichung)")
+    parser.add_argument("--nprobe", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=_int_list, default=[16, 32, 64, 128])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Ergebnisse zusätzlich als JSON speichern")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    index_file = Path(args.index_file)
+    current_index = faiss.read_index(str(index_file))
+    current_params = load_index_params(index_file.parent / "index_config.json")
+    apply_search_params(current_index, current_params)
+
+    ids, vectors = reconstruct_all(current_index)
+    if len(vectors) == 0:
+        logger.error("Index ist leer, keine Auswertung möglich")
+        return
+
+    queries = prepare_vectors(load_queries(args, vectors), current_params)
+
+    # Exakte Referenz (mit denselben Vektor-IDs und demselben Ähnlichkeitsmaß wie der aktuelle Index)
+    baseline_params = dict(default_index_params("flat"), metric=current_params["metric"], storage="float32")
+    baseline = build_index(vectors, baseline_params, ids)
+    _, ground_truth = baseline.search(queries, args.k)
+
+    results = []
+
+    def evaluate(label: str, index: faiss.Index, params: dict):
+        result = compute_recall(index, ground_truth, queries, args.k)
+        result.update({"config": label, "params": params})
+        results.append(result)
+        print(f"{label:<40} recall@{args.k}={result['recall']:.4f}  {result['latency_ms']:.3f} ms/Anfrage")
+
+    evaluate("flat (exakt)", baseline, baseline_params)
+    evaluate(f"aktuell ({current_params['index_type']}, {current_params['storage']})", current_index, current_params)
+
+    for index_type in [t for t in args.index_types.split(",") if t]:
+        params = dict(default_index_params(index_type), metric=current_params["metric"])
+        params = fit_params_to_data(params, len(vectors))
+        index = build_index(vectors, params, ids)
+
+        if index_type in ("ivf_flat", "ivf_pq"):
+            sweep = [("nprobe", value) for value in args.nprobe if value <= params["nlist"]]
+        elif index_type == "hnsw":
+            sweep = [("ef_search", value) for value in args.ef_search]
+        else:
+            sweep = [(None, None)]
+
+        for name, value in sweep:
+            if name:
+                params = dict(params, **{name: value})
+                apply_search_params(index, params)
+            evaluate(f"{index_type}" + (f" {name}={value}" if name else ""), index, params)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
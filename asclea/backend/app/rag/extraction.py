@@ -0,0 +1,375 @@
+# backend/app/rag/extraction.py
+"""
+Textextraktion aus Dokumenten (PDF, HTML, Text/Markdown, CSV/Excel)
+
+Die Extraktion ist CPU-lastig und läuft in einem Prozesspool, damit der
+Event-Loop der API frei bleibt. Große PDFs werden in Seitenbereiche
+aufgeteilt, die parallel extrahiert werden.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.chunking import looks_like_heading
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.html', '.htm', '.txt', '.md', '.csv', '.xlsx', '.xls')
+TABLE_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+
+# HTML: Überschriften, Textelemente und übersprungene Boilerplate
+HTML_HEADING_TAGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+HTML_TEXT_TAGS = frozenset(["p", "li", "dt", "dd", "blockquote", "pre", "caption", "figcaption", "td", "th"])
+HTML_BOILERPLATE_TAGS = frozenset([
+    "nav", "footer", "aside", "script", "style", "noscript", "template", "form", "button", "select",
+    "iframe", "svg", "head"
+])
+# <header> ist nur außerhalb dieser Elemente der Seitenkopf; in einem Artikel enthält er z.B. dessen Titel
+HTML_SECTIONING_TAGS = frozenset(["main", "article", "section"])
+HTML_BOILERPLATE_ROLES = frozenset(["navigation", "banner", "contentinfo", "complementary", "search", "menu"])
+# Seitengerüst und Hauptinhalt: Klassen wie "has-sidebar" oder "menu-open" beschreiben hier nur den Zustand der Seite
+HTML_CONTENT_TAGS = frozenset(["html", "body", "main", "article"])
+HTML_BOILERPLATE_NAMES = re.compile(
+    r"(?:^|[\s_-])(?:nav|navbar|navigation|menu|breadcrumbs?|sidebar|footer|cookies?|share|social|skip-?link)(?:$|[\s_-])",
+    re.IGNORECASE
+)
+HTML_CONTENT_NAMES = re.compile(r"(?:^|\s)(?:main|main-?content|content|article)(?:$|\s)", re.IGNORECASE)
+
+# Textblöcke (für chunk_blocks) und fertige Chunks (Tabellenzeilen)
+Extraction = Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]
+
+def _numbered_heading_level(text: str) -> int:
+    """Ebene einer nummerierten Überschrift ("3.2 Diagnostik" -> 2)"""
+    return text.split(None, 1)[0].rstrip(".").count(".") + 1
+
+def extract_pdf(local_path: str, base_metadata: Dict[str, Any], start_page: int = 0, end_page: Optional[int] = None) -> Extraction:
+    """Extrahiert die Textblöcke eines Seitenbereichs einer PDF-Datei"""
+    import fitz  # PyMuPDF
+
+    blocks = []
+    with fitz.open(local_path) as doc:
+        end_page = len(doc) if end_page is None else min(end_page, len(doc))
+        for page_num in range(start_page, end_page):
+            page = doc.load_page(page_num)
+            for block in page.get_text("blocks"):
+                text = block[4]
+                if block[6] != 0 or not text.strip():  # Bild- und leere Blöcke überspringen
+                    continue
+                heading = looks_like_heading(text)
+                blocks.append({
+                    "text": text,
+                    "heading_level": _numbered_heading_level(text) if heading else None,
+                    "metadata": dict(base_metadata, page=page_num + 1)
+                })
+    return blocks, []
+
+def _is_boilerplate(element, tag: str) -> bool:
+    """
+    Navigation, Kopf-/Fußbereiche, Skripte und ähnliche Elemente ohne Inhalt
+
+    <header> gilt nur als Seitenkopf, wenn er nicht in main, article oder
+    section liegt (wie die Rolle "banner" in HTML-AAM).
+
+    Die Namensheuristik (id/class) gilt nicht für Seitengerüst und
+    Hauptinhalt (main, article, class="main"/"content"), sonst würde z.B.
+    <body class="has-sidebar"> die ganze Seite verwerfen.
+    """
+    if tag in HTML_BOILERPLATE_TAGS or element.get("role") in HTML_BOILERPLATE_ROLES:
+        return True
+    if tag == "header" and not any(
+        isinstance(parent.tag, str) and parent.tag.lower() in HTML_SECTIONING_TAGS for parent in element.iterancestors()
+    ):
+        return True
+    if element.get("aria-hidden") == "true" or element.get("hidden") is not None:
+        return True
+    names = f"{element.get('id', '')} {element.get('class', '')}"
+    if tag in HTML_CONTENT_TAGS or element.get("role") == "main" or HTML_CONTENT_NAMES.search(names):
+        return False
+    return bool(HTML_BOILERPLATE_NAMES.search(names))
+
+def extract_html(local_path: str, base_metadata: Dict[str, Any]) -> Extraction:
+    """
+    Extrahiert Überschriften und Textelemente einer HTML-Datei (lxml, streamend)
+
+    Die Datei wird mit iterparse gelesen; verarbeitete Elemente werden sofort
+    freigegeben. Navigation und Boilerplate werden übersprungen. Überschriften
+    (h1-h6) erhalten ihre Ebene, sodass chunk_blocks die Hierarchie den Chunks
+    voranstellt und kleine Elemente einer Sektion zusammenfasst. Bei
+    verschachtelten Textelementen (z.B. <p> in <li>) wird jeder Text nur
+    einmal übernommen.
+    """
+    from lxml import etree
+
+    blocks = []
+    skip_depth = 0
+
+    for event, element in etree.iterparse(local_path, events=("start", "end"), html=True, recover=True):
+        if not isinstance(element.tag, str):  # Kommentare und Verarbeitungsanweisungen
+            continue
+        tag = element.tag.lower()
+
+        if event == "start":
+            if skip_depth or _is_boilerplate(element, tag):
+                skip_depth += 1
+            continue
+
+        if skip_depth:
+            skip_depth -= 1
+            if skip_depth == 0:
+                element.clear(keep_tail=True)
+            continue
+
+        if tag not in HTML_TEXT_TAGS and tag not in HTML_HEADING_TAGS:
+            continue
+
+        text = " ".join("".join(element.itertext()).split())
+        if text:
+            blocks.append({
+                "text": text,
+                "heading_level": int(tag[1]) if tag in HTML_HEADING_TAGS else None,
+                "metadata": dict(base_metadata, element=tag)
+            })
+
+        # Verarbeitetes Element freigeben (der nachfolgende Text gehört zum Elternelement)
+        element.clear(keep_tail=True)
+    return blocks, []
+
+def extract_text(local_path: str, base_metadata: Dict[str, Any]) -> Extraction:
+    """Teilt eine Text- oder Markdown-Datei in Absätze und erkennt Überschriften"""
+    with open(local_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    # Text in Absätze aufteilen, Markdown- und nummerierte Überschriften erkennen
+    blocks = []
+    for i, paragraph in enumerate(text.split('\n\n')):
+        if not paragraph.strip():
+            continue
+        metadata = dict(base_metadata, paragraph=i + 1)
+        first_line, _, rest = paragraph.strip().partition('\n')
+        markdown_heading = re.match(r"^(#{1,6})\s+(.*)$", first_line)
+        if markdown_heading:
+            blocks.append({"text": markdown_heading.group(2), "heading_level": len(markdown_heading.group(1)), "metadata": metadata})
+            paragraph = rest
+        elif looks_like_heading(first_line):
+            blocks.append({"text": first_line, "heading_level": _numbered_heading_level(first_line), "metadata": metadata})
+            paragraph = rest
+        if paragraph.strip():
+            blocks.append({"text": paragraph, "metadata": metadata})
+    return blocks, []
+
+def _unique_columns(header) -> List[str]:
+    """Spaltennamen wie bei pandas.read_csv: leere benannt, doppelte nummeriert ("Dosis", "Dosis.1")"""
+    columns: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, col in enumerate(header):
+        name = str(col) if col is not None else f"Unnamed: {i}"
+        while name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen[name] = 0
+        columns.append(name)
+    return columns
+
+def _read_table(local_path: str, read_rows: int) -> Iterator["pd.DataFrame"]:
+    """
+    Liest eine CSV- oder Excel-Datei abschnittsweise (alle Werte als Text)
+
+    CSV-Dateien werden mit chunksize gelesen, .xlsx-Dateien zeilenweise über
+    openpyxl im Read-only-Modus. Alte .xls-Dateien (höchstens 65536 Zeilen)
+    werden vollständig geladen und in Abschnitte geteilt.
+    """
+    import pandas as pd
+
+    if local_path.lower().endswith('.csv'):
+        yield from pd.read_csv(local_path, chunksize=read_rows, dtype=str, keep_default_na=False)
+        return
+
+    if local_path.lower().endswith('.xls'):
+        df = pd.read_excel(local_path, dtype=str, keep_default_na=False)
+        for start in range(0, len(df), read_rows):
+            yield df.iloc[start:start + read_rows]
+        return
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(local_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _unique_columns(header)
+        while True:
+            values = [
+                ["" if value is None else str(value) for value in row]
+                for row in islice(rows, read_rows)
+            ]
+            if not values:
+                break
+            yield pd.DataFrame(values, columns=columns)
+    finally:
+        workbook.close()
+
+def iter_table_chunks(
+    local_path: str,
+    base_metadata: Dict[str, Any],
+    read_rows: int = 10000,
+    rows_per_chunk: int = 1
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Erstellt die Chunks einer CSV- oder Excel-Datei abschnittsweise
+
+    Die Zeilentexte ("Spalte: Wert | Spalte: Wert") werden spaltenweise
+    vektorisiert gebildet; der Speicherbedarf hängt nur von read_rows ab,
+    nicht von der Größe der Datei.
+
+    Args:
+        local_path: Pfad zur Datei
+        base_metadata: Metadaten, die jeder Chunk erhält
+        read_rows: Zeilen je gelesenem Abschnitt
+        rows_per_chunk: Aufeinanderfolgende Zeilen je Chunk
+
+    Yields:
+        Chunks eines Abschnitts (Metadaten "row" und ggf. "row_end", 1-basiert)
+    """
+    rows_per_chunk = max(1, rows_per_chunk)
+    read_rows = max(rows_per_chunk, read_rows - read_rows % rows_per_chunk)  # Gruppen nicht über Abschnitte teilen
+    first_row = 1
+
+    for df in _read_table(local_path, read_rows):
+        if df.empty:
+            continue
+        # Positionsbasiert, damit auch gleichnamige Spalten je eine Serie liefern
+        columns = [f"{col}: " + df.iloc[:, i].astype(str) for i, col in enumerate(df.columns)]
+        row_texts = columns[0].str.cat(columns[1:], sep=" | ") if len(columns) > 1 else columns[0]
+
+        row_numbers = range(first_row, first_row + len(df))
+        if rows_per_chunk == 1:
+            texts = row_texts.tolist()
+        else:
+            groups = np.arange(len(row_texts)) // rows_per_chunk
+            texts = row_texts.groupby(groups).agg("\n".join).tolist()
+
+        chunks = []
+        for i, text in enumerate(texts):
+            start = row_numbers[i * rows_per_chunk]
+            end = min(start + rows_per_chunk, first_row + len(df)) - 1
+            metadata = dict(base_metadata, row=start)
+            if end != start:
+                metadata["row_end"] = end
+            chunks.append({"text": text, "metadata": metadata})
+        first_row += len(df)
+        yield chunks
+
+def extract_document(local_path: str, base_metadata: Dict[str, Any]) -> Extraction:
+    """
+    Extrahiert ein Dokument vollständig (läuft im Worker-Prozess)
+
+    Args:
+        local_path: Pfad zur Datei
+        base_metadata: Metadaten, die jeder Block bzw. Chunk erhält
+
+    Returns:
+        Tupel aus (Textblöcke, fertige Chunks)
+
+    Raises:
+        ValueError: Bei Tabellen und nicht unterstützten Formaten
+    """
+    file_extension = os.path.splitext(local_path)[1].lower()
+    if file_extension == '.pdf':
+        return extract_pdf(local_path, base_metadata)
+    if file_extension in ['.html', '.htm']:
+        return extract_html(local_path, base_metadata)
+    if file_extension in ['.txt', '.md']:
+        return extract_text(local_path, base_metadata)
+    if file_extension in TABLE_EXTENSIONS:
+        # Nicht vollständig laden: Tabellen werden mit iter_table_chunks abschnittsweise verarbeitet
+        raise ValueError(f"Tabellen ({file_extension}) werden über iter_table_chunks gelesen")
+    raise ValueError(f"Nicht unterstütztes Dateiformat: {file_extension}")
+
+def pdf_page_count(local_path: str) -> int:
+    """Anzahl der Seiten einer PDF-Datei"""
+    import fitz  # PyMuPDF
+
+    with fitz.open(local_path) as doc:
+        return len(doc)
+
+def page_ranges(num_pages: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """Teilt die Seiten eines Dokuments in aufeinanderfolgende Bereiche [start, end)"""
+    pages_per_task = max(1, pages_per_task)
+    return [(start, min(start + pages_per_task, num_pages)) for start in range(0, num_pages, pages_per_task)]
+
+class DocumentExtractor:
+    """
+    Führt die Extraktion in einem Prozesspool aus
+
+    Große PDFs werden seitenweise auf mehrere Prozesse verteilt; mehrere
+    Dokumente, die gleichzeitig extrahiert werden, teilen sich den Pool.
+    Die Worker-Prozesse werden per "spawn" gestartet, damit sie keine
+    Threads oder Modelle des API-Prozesses erben.
+
+    Args:
+        workers: Anzahl der Worker-Prozesse (0 = Threads im API-Prozess)
+        pdf_pages_per_task: Seiten je Extraktionsauftrag bei PDFs
+    """
+
+    def __init__(self, workers: int, pdf_pages_per_task: int = 16):
+        self.workers = workers
+        self.pdf_pages_per_task = pdf_pages_per_task
+        self._executor: Executor
+        if workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="extraction")
+        self.documents = 0
+        self.tasks = 0
+
+    async def _submit(self, func, *args) -> Any:
+        self.tasks += 1
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args))
+
+    async def extract(self, local_path: str, base_metadata: Dict[str, Any]) -> Extraction:
+        """
+        Extrahiert ein Dokument, ohne den Event-Loop zu blockieren
+
+        Returns:
+            Tupel aus (Textblöcke in Dokumentreihenfolge, fertige Chunks)
+        """
+        self.documents += 1
+        if not local_path.lower().endswith('.pdf') or self.workers <= 1:
+            return await self._submit(extract_document, local_path, base_metadata)
+
+        num_pages = await self._submit(pdf_page_count, local_path)
+        ranges = page_ranges(num_pages, self.pdf_pages_per_task)
+        if len(ranges) <= 1:
+            return await self._submit(extract_document, local_path, base_metadata)
+
+        # Seitenbereiche parallel extrahieren, Reihenfolge bleibt erhalten
+        parts = await asyncio.gather(*[
+            self._submit(extract_pdf, local_path, base_metadata, start, end)
+            for start, end in ranges
+        ])
+        return [block for blocks, _ in parts for block in blocks], []
+
+    def shutdown(self):
+        """Beendet die Worker-Prozesse"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Kennzahlen der Extraktion"""
+        return {
+            "workers": self.workers,
+            "documents": self.documents,
+            "tasks": self.tasks
+        }
@@ -0,0 +1,220 @@
+# backend/app/rag/filters.py
+import json
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Set
+
+import numpy as np
+
+from app.rag.cache import LRUCache
+
+# Unterstützte Filter (siehe FilterIndex.resolve)
+FILTER_KEYS = ("source_types", "source_ids", "publishers", "published_from", "published_to")
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Entfernt leere Filter und bringt die Werte in eine kanonische Form
+
+    Returns:
+        Die normalisierten Filter oder None, wenn kein Filter gesetzt ist
+    """
+    if not filters:
+        return None
+
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unbekannte Filter: {', '.join(sorted(unknown))}")
+
+    normalized: Dict[str, Any] = {}
+    for key in ("source_types", "publishers"):
+        if filters.get(key):
+            normalized[key] = sorted({str(value) for value in filters[key]})
+    if filters.get("source_ids"):
+        normalized["source_ids"] = sorted({int(value) for value in filters["source_ids"]})
+    for key in ("published_from", "published_to"):
+        if filters.get(key):
+            normalized[key] = _as_date(filters[key]).isoformat()
+
+    return normalized or None
+
+def filter_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Stabiler Schlüssel normalisierter Filter (z.B. für Caches)"""
+    return json.dumps(filters, sort_keys=True) if filters else ""
+
+class IdFilter:
+    """
+    Menge erlaubter Vektor-IDs als Bitmap (Bit i = Vektor-ID i)
+
+    Die Bitmap kann direkt als faiss.IDSelectorBitmap verwendet werden.
+    """
+
+    def __init__(self, mask: np.ndarray):
+        self.bitmap = np.packbits(mask, bitorder="little")
+        self.count = int(np.count_nonzero(mask))
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """Prüft für jede Vektor-ID, ob sie erlaubt ist"""
+        ids = np.asarray(ids, dtype=np.int64)
+        result = np.zeros(len(ids), dtype=bool)
+        in_range = (ids >= 0) & ((ids >> 3) < len(self.bitmap))
+        valid = ids[in_range]
+        result[in_range] = ((self.bitmap[valid >> 3] >> (valid & 7)) & 1).astype(bool)
+        return result
+
+    def ids(self) -> np.ndarray:
+        """Alle erlaubten Vektor-IDs, aufsteigend sortiert"""
+        return np.flatnonzero(np.unpackbits(self.bitmap, bitorder="little")).astype(np.int64)
+
+class FilterIndex:
+    """
+    Vorberechnete Zuordnung von Vektor-IDs zu Quellen für gefilterte Suchen
+
+    Für jede Vektor-ID wird die Quellen-ID in einem dichten Array gehalten,
+    für jede Quelle die filterbaren Attribute (Typ, Herausgeber,
+    Veröffentlichungsdatum). Ein Filter wird so in eine ID-Bitmap übersetzt,
+    die bei der FAISS-Suche als ID-Selektor dient. Die Bitmaps häufig
+    verwendeter Filter werden zwischengespeichert.
+
+    Chunks mit identischem Inhalt gehören nur einer Quelle; weitere Quellen
+    referenzieren sie (chunk_refs im Chunk-Speicher). Ein Filter auf eine
+    referenzierende Quelle schließt diese Chunks ebenfalls ein.
+
+    Args:
+        cache_size: Anzahl zwischengespeicherter Filter-Bitmaps
+    """
+
+    def __init__(self, cache_size: int = 128):
+        self.source_of = np.full(0, -1, dtype=np.int64)  # Vektor-ID -> Quellen-ID (-1 = frei)
+        self.sources: Dict[int, Dict[str, Any]] = {}
+        self.refs: Dict[int, Set[int]] = {}  # Quellen-ID -> Vektor-IDs referenzierter Chunks
+        self._cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+
+    def set_source(self, source_id: int, source_type: Optional[str], publisher: Optional[str], publication_date=None):
+        """Hinterlegt die filterbaren Attribute einer Quelle"""
+        with self._lock:
+            self.sources[int(source_id)] = {
+                "source_type": source_type,
+                "publisher": publisher,
+                "publication_date": _as_date(publication_date)
+            }
+            self._cache.clear()
+
+    def remove_source(self, source_id: int):
+        with self._lock:
+            self.sources.pop(int(source_id), None)
+            self.refs.pop(int(source_id), None)
+            self._cache.clear()
+
+    def add_refs(self, source_id: int, ids: Iterable[int]):
+        """Erfasst Chunks anderer Quellen, die eine Quelle referenziert"""
+        ids = {int(chunk_id) for chunk_id in ids}
+        if not ids:
+            return
+        with self._lock:
+            self.refs.setdefault(int(source_id), set()).update(ids)
+            self._cache.clear()
+
+    def remove_refs(self, source_id: int, ids: Optional[Iterable[int]] = None):
+        """Entfernt die Referenzen einer Quelle (alle oder nur auf die angegebenen Chunks)"""
+        with self._lock:
+            refs = self.refs.get(int(source_id))
+            if refs is None:
+                return
+            if ids is not None:
+                refs.difference_update(int(chunk_id) for chunk_id in ids)
+            if ids is None or not refs:
+                del self.refs[int(source_id)]
+            self._cache.clear()
+
+    def assign(self, ids: Iterable[int], source_ids: Iterable[Optional[int]]):
+        """Ordnet Vektor-IDs ihren Quellen zu"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        source_ids = np.asarray([-1 if s is None else int(s) for s in source_ids], dtype=np.int64)
+        if len(ids) == 0:
+            return
+
+        with self._lock:
+            needed = int(ids.max()) + 1
+            if needed > len(self.source_of):
+                # Array geometrisch vergrößern, da IDs fortlaufend vergeben werden
+                grown = np.full(max(needed, 2 * len(self.source_of)), -1, dtype=np.int64)
+                grown[:len(self.source_of)] = self.source_of
+                self.source_of = grown
+            self.source_of[ids] = source_ids
+            self._cache.clear()
+
+    def unassign(self, ids: Iterable[int]):
+        """Gibt entfernte Vektor-IDs frei"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        with self._lock:
+            if self.refs:
+                removed = set(ids.tolist())
+                for source_id, refs in list(self.refs.items()):
+                    refs.difference_update(removed)
+                    if not refs:
+                        del self.refs[source_id]
+            ids = ids[ids < len(self.source_of)]
+            self.source_of[ids] = -1
+            self._cache.clear()
+
+    def _matching_sources(self, filters: Dict[str, Any]) -> np.ndarray:
+        published_from = _as_date(filters.get("published_from"))
+        published_to = _as_date(filters.get("published_to"))
+
+        matching = []
+        for source_id, attributes in self.sources.items():
+            if "source_ids" in filters and source_id not in filters["source_ids"]:
+                continue
+            if "source_types" in filters and attributes["source_type"] not in filters["source_types"]:
+                continue
+            if "publishers" in filters and attributes["publisher"] not in filters["publishers"]:
+                continue
+            if published_from or published_to:
+                published = attributes["publication_date"]
+                if published is None:
+                    continue
+                if published_from and published < published_from:
+                    continue
+                if published_to and published > published_to:
+                    continue
+            matching.append(source_id)
+
+        return np.asarray(matching, dtype=np.int64)
+
+    def resolve(self, filters: Optional[Dict[str, Any]]) -> Optional[IdFilter]:
+        """
+        Übersetzt Filter in eine Bitmap der erlaubten Vektor-IDs
+
+        Args:
+            filters: Normalisierte Filter (siehe normalize_filters)
+
+        Returns:
+            IdFilter oder None, wenn kein Filter gesetzt ist
+        """
+        if not filters:
+            return None
+
+        key = filter_key(filters)
+        id_filter = self._cache.get(key)
+        if id_filter is None:
+            with self._lock:
+                matching = self._matching_sources(filters)
+                mask = np.isin(self.source_of, matching)
+                for source_id in matching.tolist():
+                    refs = self.refs.get(source_id)
+                    if refs:
+                        ids = np.fromiter(refs, dtype=np.int64, count=len(refs))
+                        mask[ids[ids < len(mask)]] = True
+                id_filter = IdFilter(mask)
+                self._cache.set(key, id_filter)
+        return id_filter
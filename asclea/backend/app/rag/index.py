@@ -0,0 +1,435 @@
+# backend/app/rag/index.py
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.core.config import settings
+from app.rag.filters import IdFilter
+
+logger = logging.getLogger(__name__)
+
+# Unterstützte Indextypen
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Ähnlichkeitsmaße: l2 (euklidischer Abstand) oder ip (Skalarprodukt normierter Vektoren = Kosinus)
+METRICS = ("l2", "ip")
+
+# Speicherformat der Vektoren (FAISS-Factory-Kürzel); ivf_pq komprimiert unabhängig davon per PQ
+STORAGE_CODES = {"float32": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+
+# Mindestanzahl Trainingsvektoren pro IVF-Liste (Empfehlung von FAISS)
+MIN_POINTS_PER_CENTROID = 39
+
+def default_index_params(index_type: Optional[str] = None) -> Dict[str, Any]:
+    """Liefert die Indexparameter aus den Einstellungen"""
+    index_type = index_type or settings.VECTOR_INDEX_TYPE
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unbekannter Indextyp: {index_type} (erlaubt: {', '.join(INDEX_TYPES)})")
+    if settings.VECTOR_METRIC not in METRICS:
+        raise ValueError(f"Unbekanntes Ähnlichkeitsmaß: {settings.VECTOR_METRIC} (erlaubt: {', '.join(METRICS)})")
+    if settings.VECTOR_STORAGE not in STORAGE_CODES:
+        raise ValueError(
+            f"Unbekanntes Speicherformat: {settings.VECTOR_STORAGE} (erlaubt: {', '.join(STORAGE_CODES)})"
+        )
+
+    return {
+        "index_type": index_type,
+        "metric": settings.VECTOR_METRIC,
+        "storage": settings.VECTOR_STORAGE,
+        "nlist": settings.IVF_NLIST,
+        "nprobe": settings.IVF_NPROBE,
+        "pq_m": settings.PQ_M,
+        "pq_nbits": settings.PQ_NBITS,
+        "hnsw_m": settings.HNSW_M,
+        "ef_construction": settings.HNSW_EF_CONSTRUCTION,
+        "ef_search": settings.HNSW_EF_SEARCH
+    }
+
+def factory_string(params: Dict[str, Any]) -> str:
+    """
+    Erzeugt die FAISS-Factory-Beschreibung für die Indexparameter
+
+    IVF-Indizes speichern frei wählbare Vektor-IDs selbst, flache und HNSW-Indizes
+    werden dafür in eine IDMap2 eingebettet. Mit storage "fp16" bzw. "sq8" werden
+    die Vektoren skalarquantisiert mit 2 bzw. 1 Byte pro Dimension gespeichert.
+    """
+    index_type = params["index_type"]
+    storage = STORAGE_CODES[params.get("storage", "float32")]
+    if index_type == "flat":
+        return f"IDMap2,{storage}"
+    if index_type == "ivf_flat":
+        return f"IVF{params['nlist']},{storage}"
+    if index_type == "ivf_pq":
+        return f"IVF{params['nlist']},PQ{params['pq_m']}x{params['pq_nbits']}"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{params['hnsw_m']},{storage}"
+    raise ValueError(f"Unbekannter Indextyp: {index_type}")
+
+def _inner_index(index: faiss.Index) -> faiss.Index:
+    """Liefert den eigentlichen Index unterhalb einer IDMap"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+def _extract_ivf(index: faiss.Index) -> Optional[faiss.IndexIVF]:
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None  # Kein IVF-Index
+
+def create_index(dimension: int, params: Dict[str, Any]) -> faiss.Index:
+    """
+    Erstellt einen leeren FAISS-Index
+
+    Args:
+        dimension: Dimension der Embeddings
+        params: Indexparameter (siehe default_index_params)
+
+    Returns:
+        Der (ggf. noch untrainierte) Index
+    """
+    metric = faiss.METRIC_INNER_PRODUCT if params.get("metric") == "ip" else faiss.METRIC_L2
+    index = faiss.index_factory(dimension, factory_string(params), metric)
+
+    if params["index_type"] == "hnsw":
+        _inner_index(index).hnsw.efConstruction = params["ef_construction"]
+
+    enable_reconstruction(index)
+    apply_search_params(index, params)
+    return index
+
+def prepare_vectors(vectors: np.ndarray, params: Dict[str, Any]) -> np.ndarray:
+    """
+    Bringt Embeddings in die Form, in der sie im Index gespeichert bzw. gesucht werden
+
+    Beim Ähnlichkeitsmaß "ip" werden die Vektoren auf Länge 1 normiert, sodass
+    das Skalarprodukt der Kosinus-Ähnlichkeit entspricht.
+
+    Returns:
+        Zusammenhängende float32-Kopie der Vektoren
+    """
+    vectors = np.array(vectors, dtype=np.float32, order="C", ndmin=2)
+    if params.get("metric") == "ip":
+        faiss.normalize_L2(vectors)
+    return vectors
+
+def distances_to_scores(distances: np.ndarray, params: Dict[str, Any]) -> np.ndarray:
+    """
+    Rechnet Suchergebnisse von FAISS in Scores zwischen 0 und 1 um
+
+    Bei "ip" ist der Score die Kosinus-Ähnlichkeit (negative Werte als 0),
+    bei "l2" 1 / (1 + quadrierter Abstand).
+    """
+    distances = np.asarray(distances, dtype=np.float32)
+    if params.get("metric") == "ip":
+        return np.clip(distances, 0.0, 1.0)
+    return 1.0 / (1.0 + np.maximum(distances, 0.0))
+
+def exact_search(
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    params: Dict[str, Any]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exakte Suche über eine kleine Vektormenge mit demselben Ergebnisformat wie index.search
+
+    Returns:
+        Tupel aus (Distanzen bzw. Ähnlichkeiten, IDs), je Anfrage eine Zeile
+    """
+    products = queries @ vectors.T
+    if params.get("metric") == "ip":
+        order = np.argsort(-products, axis=1)[:, :k]
+        return np.take_along_axis(products, order, axis=1), ids[order]
+
+    # Quadrierte L2-Distanzen wie bei FAISS: |q|² - 2 q·v + |v|²
+    distances = (queries ** 2).sum(axis=1)[:, np.newaxis] - 2.0 * products + (vectors ** 2).sum(axis=1)[np.newaxis, :]
+    order = np.argsort(distances, axis=1)[:, :k]
+    return np.take_along_axis(distances, order, axis=1), ids[order]
+
+def enable_reconstruction(index: faiss.Index):
+    """Ermöglicht bei IVF-Indizes die Rekonstruktion einzelner Vektoren über ihre ID"""
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]):
+    """Setzt die Suchparameter (nprobe, efSearch) passend zum Indextyp"""
+    parameter_space = faiss.ParameterSpace()
+    index_type = params.get("index_type", "flat")
+    index = _inner_index(index)
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        parameter_space.set_index_parameter(index, "nprobe", int(params["nprobe"]))
+    elif index_type == "hnsw":
+        parameter_space.set_index_parameter(index, "efSearch", int(params["ef_search"]))
+
+def search_parameters(params: Dict[str, Any], selector: Optional[faiss.IDSelector] = None) -> faiss.SearchParameters:
+    """
+    Suchparameter für eine einzelne Suche, z.B. mit ID-Selektor für gefilterte Suchen
+
+    nprobe und efSearch werden mitgegeben, da Suchparameter die am Index
+    gesetzten Werte ersetzen.
+    """
+    index_type = params.get("index_type", "flat")
+    if index_type in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(params["nprobe"]))
+    if index_type == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(params["ef_search"]))
+    return faiss.SearchParameters(sel=selector)
+
+def filtered_search(
+    index: faiss.Index,
+    queries: np.ndarray,
+    k: int,
+    params: Dict[str, Any],
+    id_filter: IdFilter
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Suche, die nur die vom Filter erlaubten Vektor-IDs berücksichtigt
+
+    IVF-Indizes speichern die Vektor-IDs selbst und erhalten die Bitmap
+    direkt als ID-Selektor. IndexIDMap2 (flat, hnsw) nimmt in faiss 1.7.4
+    keine Suchparameter an; dort wird der Filter auf die internen Positionen
+    übersetzt und der innere Index durchsucht.
+
+    Returns:
+        Tupel aus (Distanzen, IDs) wie bei index.search
+    """
+    if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        selector = faiss.IDSelectorBitmap(id_filter.bitmap)
+        return index.search(queries, k, params=search_parameters(params, selector))
+
+    id_map = faiss.vector_to_array(index.id_map).astype(np.int64)
+    positions = np.packbits(id_filter.contains(id_map), bitorder="little")
+    selector = faiss.IDSelectorBitmap(positions)
+    D, I = _inner_index(index).search(queries, k, params=search_parameters(params, selector))
+    return D, np.where(I >= 0, id_map[np.maximum(I, 0)], -1)
+
+def needs_training(params: Dict[str, Any]) -> bool:
+    """Prüft, ob ein Index mit diesen Parametern vor dem Befüllen trainiert werden muss"""
+    return params["index_type"] in ("ivf_flat", "ivf_pq") or params.get("storage", "float32") == "sq8"
+
+def untrained_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parameter eines flachen Index ohne Training mit demselben Ähnlichkeitsmaß
+
+    Wird für leere Indizes verwendet, wenn der gewünschte Typ (IVF, sq8) ohne
+    Vektoren nicht trainiert werden kann; sq8 wird dabei durch fp16 ersetzt.
+    """
+    storage = "float32" if params.get("storage", "float32") == "float32" else "fp16"
+    return dict(params, index_type="flat", storage=storage)
+
+def fit_params_to_data(params: Dict[str, Any], num_vectors: int) -> Dict[str, Any]:
+    """
+    Passt nlist an die verfügbare Datenmenge an
+
+    IVF-Indizes benötigen für ein stabiles k-means-Training mindestens
+    MIN_POINTS_PER_CENTROID Vektoren pro Liste. Ohne Vektoren wird für
+    trainierbare Typen ein flacher Index verwendet (siehe untrained_params).
+    """
+    params = dict(params)
+    if num_vectors == 0 and needs_training(params):
+        logger.info(f"Keine Vektoren zum Training von {params['index_type']} ({params['storage']}), verwende flachen Index")
+        return untrained_params(params)
+    if params["index_type"] in ("ivf_flat", "ivf_pq"):
+        max_nlist = max(1, num_vectors // MIN_POINTS_PER_CENTROID)
+        if params["nlist"] > max_nlist:
+            logger.warning(
+                f"nlist={params['nlist']} zu groß für {num_vectors} Vektoren, verwende nlist={max_nlist}"
+            )
+            params["nlist"] = max_nlist
+            params["nprobe"] = min(params["nprobe"], max_nlist)
+    return params
+
+def get_ids(index: faiss.Index) -> np.ndarray:
+    """Liefert die Vektor-IDs aller im Index gespeicherten Vektoren"""
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        invlists = ivf.invlists
+        ids = [
+            faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+            for list_no in range(ivf.nlist)
+            if invlists.list_size(list_no) > 0
+        ]
+        return np.concatenate(ids).astype(np.int64) if ids else np.zeros(0, dtype=np.int64)
+
+    # Index ohne ID-Zuordnung: IDs entsprechen der Einfügereihenfolge
+    return np.arange(index.ntotal, dtype=np.int64)
+
+def reconstruct_all(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Liest alle gespeicherten Vektoren samt ihrer IDs aus einem Index zurück
+
+    Bei PQ-Indizes sind die rekonstruierten Vektoren nur Näherungen.
+
+    Returns:
+        Tupel aus (IDs, Vektoren)
+    """
+    if index.ntotal == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, index.d), dtype=np.float32)
+
+    ids = get_ids(index)
+
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return ids, index.index.reconstruct_n(0, index.ntotal)
+
+    if _extract_ivf(index) is not None:
+        enable_reconstruction(index)
+        return ids, index.reconstruct_batch(ids)
+
+    return ids, index.reconstruct_n(0, index.ntotal)
+
+def reconstruct_ids(index: faiss.Index, ids: List[int]) -> np.ndarray:
+    """
+    Liest die gespeicherten Vektoren zu einzelnen Vektor-IDs zurück
+
+    Setzt einen Index mit ID-Zuordnung voraus (IDMap2 oder IVF mit
+    aktivierter Rekonstruktion). Bei PQ-Indizes sind die Vektoren nur Näherungen.
+    """
+    if len(ids) == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+def is_id_mapped(index: faiss.Index) -> bool:
+    """Prüft, ob der Index frei wählbare Vektor-IDs unterstützt"""
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) or _extract_ivf(index) is not None
+
+def build_index(
+    vectors: np.ndarray,
+    params: Dict[str, Any],
+    ids: Optional[np.ndarray] = None
+) -> faiss.Index:
+    """
+    Erstellt, trainiert und befüllt einen Index mit den gegebenen Vektoren
+
+    Args:
+        vectors: Matrix der Embeddings (n x d)
+        params: Indexparameter
+        ids: Vektor-IDs (Standard: 0..n-1)
+
+    Returns:
+        Der befüllte Index
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if ids is None:
+        ids = np.arange(len(vectors), dtype=np.int64)
+    index = create_index(vectors.shape[1], params)
+
+    if not index.is_trained:
+        if len(vectors) == 0:
+            raise ValueError(f"Indextyp {params['index_type']} kann ohne Vektoren nicht trainiert werden")
+
+        # Stichprobe für das Training ziehen
+        sample_size = min(len(vectors), settings.INDEX_TRAIN_SAMPLE)
+        rng = np.random.default_rng(42)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+
+        start = time.perf_counter()
+        index.train(sample)
+        logger.info(f"Index trainiert mit {sample_size} Vektoren in {time.perf_counter() - start:.1f}s")
+
+    if len(vectors):
+        index.add_with_ids(vectors, np.ascontiguousarray(ids, dtype=np.int64))
+    return index
+
+def remove_ids(index: faiss.Index, ids: np.ndarray, params: Dict[str, Any]) -> faiss.Index:
+    """
+    Entfernt Vektoren anhand ihrer IDs
+
+    HNSW-Graphen unterstützen kein Löschen; in diesem Fall wird der Index aus den
+    verbleibenden Vektoren neu aufgebaut.
+
+    Returns:
+        Der Index ohne die entfernten Vektoren (bei HNSW ein neues Objekt)
+    """
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    if len(ids) == 0 or index.ntotal == 0:
+        return index
+
+    if params["index_type"] == "hnsw":
+        all_ids, vectors = reconstruct_all(index)
+        keep = ~np.isin(all_ids, ids)
+        logger.info(f"HNSW-Index wird ohne {int((~keep).sum())} Vektoren neu aufgebaut")
+        return build_index(vectors[keep], params, all_ids[keep])
+
+    index.remove_ids(ids)
+    return index
+
+def _fsync_replace(tmp_path: Path, path: Path):
+    """Ersetzt path atomar durch tmp_path, nachdem dessen Inhalt auf die Platte geschrieben wurde"""
+    with open(tmp_path, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Verzeichniseintrag sichern (unter Windows nicht möglich)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(str(path.parent), os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def write_index_atomic(index: faiss.Index, path: Path):
+    """Schreibt einen Index-Snapshot über eine temporäre Datei und atomares Umbenennen"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    _fsync_replace(tmp_path, path)
+
+def save_index_params(path: Path, params: Dict[str, Any]):
+    """Speichert die Indexparameter atomar als JSON"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(params, f, indent=2)
+    _fsync_replace(tmp_path, path)
+
+def load_index_params(path: Path) -> Dict[str, Any]:
+    """Lädt die Indexparameter; ältere Indizes ohne Parameterdatei sind flach (L2, float32)"""
+    params = dict(default_index_params("flat"), metric="l2", storage="float32")
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            params.update(json.load(f))
+    return params
+
+def compute_recall(
+    index: faiss.Index,
+    ground_truth: np.ndarray,
+    queries: np.ndarray,
+    k: int
+) -> Dict[str, float]:
+    """
+    Misst recall@k eines Index gegenüber einem exakten Referenzergebnis
+
+    Args:
+        index: Der zu prüfende Index
+        ground_truth: IDs der exakten Nachbarn (n_queries x k)
+        queries: Anfragevektoren (n_queries x d)
+        k: Anzahl der Nachbarn
+
+    Returns:
+        Dict mit recall@k und mittlerer Latenz pro Anfrage in Millisekunden
+    """
+    start = time.perf_counter()
+    _, I = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+
+    hits = sum(
+        len(set(found[found != -1]) & set(expected[expected != -1]))
+        for found, expected in zip(I, ground_truth)
+    )
+    total = int((ground_truth != -1).sum())
+
+    return {
+        "recall": hits / total if total else 0.0,
+        "latency_ms": 1000.0 * elapsed / len(queries)
+    }
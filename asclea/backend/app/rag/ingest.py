@@ -0,0 +1,162 @@
+# backend/app/rag/ingest.py
+"""
+Indiziert alle Dokumente eines Verzeichnisbaums (z.B. data/sources/leitlinien_awmf)
+
+Neue Dateien werden gesammelt als MedicalSource registriert, anschließend
+werden die Dokumente batchweise extrahiert (parallel im Prozesspool) und
+eingebettet. Fortschritt wird über das Feld "indexed" der Quellen und das
+Vektor-Log gesichert: ein abgebrochener Lauf setzt beim nächsten Aufruf mit
+den noch nicht indizierten Dokumenten fort.
+
+Die Ingestion sperrt das Vektorverzeichnis für ihren gesamten Lauf
+(Sperrdatei .lock), da sie dasselbe Vektor-Log und dieselben Snapshots wie die
+API schreibt. Die API kann weiterlaufen: Suchen arbeiten auf ihrem bisherigen
+Stand, Änderungen über die API (Indizieren, Entfernen, Neuaufbau) schlagen
+währenddessen mit einer Meldung fehl. Danach übernimmt die API den neuen Stand
+mit POST /api/admin/index/reload, spätestens vor ihrem nächsten Schreibvorgang.
+Schreibt die API gerade, bricht die Ingestion mit einer Meldung ab.
+
+Das Veröffentlichungsdatum neuer Quellen bleibt leer, da es sich nicht
+zuverlässig aus der Datei ablesen lässt; Suchen mit Datumsfilter schließen
+diese Quellen aus.
+
+Aufruf:
+    python -m app.rag.ingest data/sources/leitlinien_awmf --source-type guideline
+"""
+import argparse
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.db.models import MedicalSource
+from app.db.session import SessionLocal
+from app.rag import service
+from app.rag.extraction import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+def find_documents(root: Path) -> List[Path]:
+    """Alle unterstützten Dateien unterhalb von root, sortiert"""
+    return sorted(
+        path for path in root.rglob("*")
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
+def register_sources(db, root: Path, paths: List[Path], source_type: str, publisher: Optional[str]) -> int:
+    """
+    Legt für noch nicht registrierte Dateien MedicalSource-Einträge an (ein Commit)
+
+    Ohne publisher wird der Name des Verzeichnisses unterhalb von root als
+    Herausgeber verwendet (bei AWMF-Leitlinien die Fachgesellschaft).
+
+    Returns:
+        Anzahl der neu registrierten Quellen
+    """
+    known = {local_path for (local_path,) in db.query(MedicalSource.local_path).all()}
+    new_sources = []
+
+    for path in paths:
+        if str(path) in known:
+            continue
+        relative = path.relative_to(root)
+        new_sources.append(MedicalSource(
+            title=path.stem.replace("_", " "),
+            source_type=source_type,
+            publisher=publisher or (relative.parts[0] if len(relative.parts) > 1 else None),
+            publication_date=None,  # Änderungszeit der Datei ist nicht das Veröffentlichungsdatum
+            local_path=str(path),
+            indexed=False
+        ))
+
+    if new_sources:
+        db.add_all(new_sources)
+        db.commit()
+    return len(new_sources)
+
+async def ingest(
+    root: Path,
+    source_type: str,
+    publisher: Optional[str] = None,
+    batch_size: int = 32,
+    force: bool = False
+):
+    """
+    Registriert und indiziert alle Dokumente unterhalb von root
+
+    Args:
+        root: Wurzelverzeichnis der Dokumente
+        source_type: Quellentyp neuer Quellen (z.B. "guideline")
+        publisher: Herausgeber neuer Quellen (Standard: Verzeichnisname)
+        batch_size: Dokumente je Batch (zwischen den Batches wird der Fortschritt ausgegeben)
+        force: Bereits indizierte Dokumente neu indizieren
+    """
+    service.lock_vector_db()
+    db = SessionLocal()
+    try:
+        paths = find_documents(root)
+        registered = register_sources(db, root, paths, source_type, publisher)
+        logger.info(f"{len(paths)} Dokumente gefunden, {registered} neu registriert")
+
+        path_names = {str(path) for path in paths}
+        query = db.query(MedicalSource.id, MedicalSource.local_path)
+        if not force:
+            query = query.filter(MedicalSource.indexed.is_(False))
+        pending = sorted(source_id for source_id, local_path in query.all() if local_path in path_names)
+        logger.info(f"{len(pending)} Dokumente zu indizieren ({len(paths) - len(pending)} bereits indiziert)")
+        if not pending:
+            return
+
+        await service.initialize_rag_service()
+        try:
+            start = time.perf_counter()
+            chunks_before = service.chunk_store.count()
+            done = 0
+            failed = {}
+
+            for batch_start in range(0, len(pending), batch_size):
+                batch = pending[batch_start:batch_start + batch_size]
+                results = await service.process_documents(batch, db, force=force)
+                failed.update({source_id: error for source_id, error in results.items() if error})
+                done += len(batch)
+
+                elapsed = time.perf_counter() - start
+                chunks = service.chunk_store.count() - chunks_before
+                logger.info(
+                    f"{done}/{len(pending)} Dokumente, {chunks} Chunks, "
+                    f"{done / elapsed:.2f} Dokumente/s, {chunks / elapsed:.1f} Chunks/s"
+                )
+
+            await service.save_index()
+        finally:
+            await service.shutdown_rag_service()
+
+        elapsed = time.perf_counter() - start
+        chunks = service.chunk_store.count() - chunks_before
+        indexed = len(pending) - len(failed)
+        print(
+            f"{indexed} Dokumente indiziert, {len(failed)} fehlgeschlagen, {chunks} Chunks in {elapsed:.0f} s: "
+            f"{indexed / elapsed:.2f} Dokumente/s, {chunks / elapsed:.1f} Chunks/s"
+        )
+        for source_id, error in sorted(failed.items()):
+            print(f"  Quelle {source_id}: {error}")
+    finally:
+        db.close()
+        service.unlock_vector_db()
+
+def main():
+    parser = argparse.ArgumentParser(description="Dokumente eines Verzeichnisbaums gesammelt indizieren")
+    parser.add_argument("root", help="Wurzelverzeichnis, z.B. data/sources/leitlinien_awmf")
+    parser.add_argument("--source-type", default="guideline")
+    parser.add_argument("--publisher", help="Herausgeber neuer Quellen (Standard: Verzeichnisname)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Dokumente je Batch")
+    parser.add_argument("--force", action="store_true", help="Bereits indizierte Dokumente neu indizieren")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    asyncio.run(ingest(Path(args.root), args.source_type, args.publisher, args.batch_size, args.force))
+
+if __name__ == "__main__":
+    main()
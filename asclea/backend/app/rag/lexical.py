@@ -0,0 +1,196 @@
+# backend/app/rag/lexical.py
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Zahlen mit Trennzeichen (AWMF-Registernummern wie 013-001, Dosierungen wie 2,5) bleiben ein Token
+TOKEN_PATTERN = re.compile(r"\d+(?:[-./,]\d+)+|\w+", re.UNICODE)
+
+# Häufige deutsche Funktionswörter ohne Aussagekraft für die Suche
+STOPWORDS = frozenset("""
+aber alle allem allen aller alles als also am an ander andere anderem anderen anderer anderes auch auf aus
+bei bin bis bist da damit dann das dass dem den denn der des dessen die dies diese diesem diesen dieser dieses
+doch dort du durch ein eine einem einen einer eines er es etwas für hat hatte hier ich ihr im in ist ja jede
+jedem jeden jeder jedes kann kein keine mit nach nicht noch nun nur ob oder ohne sehr sich sie sind so soll
+sollte sondern um und uns unter vom von vor war waren was weil welche welchem welchen welcher welches wenn
+wer wie wird wir wo zu zum zur über
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Zerlegt einen Text in kleingeschriebene Suchbegriffe ohne Stoppwörter"""
+    return [
+        token for token in (match.group(0).lower() for match in TOKEN_PATTERN.finditer(text))
+        if token not in STOPWORDS
+    ]
+
+class BM25Index:
+    """
+    Invertierter Index mit BM25-Bewertung für die lexikalische Suche
+
+    Die Dokument-IDs entsprechen den Vektor-IDs des FAISS-Index, sodass die
+    Treffer beider Suchverfahren direkt zusammengeführt werden können.
+
+    Args:
+        k1: Sättigung der Termfrequenz
+        b: Stärke der Längennormalisierung
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def add_many(self, entries: Iterable[Tuple[int, str]]):
+        """Fügt Dokumente (ID, Text) zum Index hinzu"""
+        with self._lock:
+            for doc_id, text in entries:
+                doc_id = int(doc_id)
+                if doc_id in self.doc_lengths:
+                    self.remove_many([doc_id])
+
+                tokens = tokenize(text)
+                self.doc_lengths[doc_id] = len(tokens)
+                self.total_length += len(tokens)
+                for term, tf in Counter(tokens).items():
+                    self.postings.setdefault(term, {})[doc_id] = tf
+
+    def remove_many(self, ids: Iterable[int], texts: Optional[Iterable[str]] = None):
+        """
+        Entfernt Dokumente aus dem Index
+
+        Mit den Texten werden nur die betroffenen Posting-Listen angepasst,
+        ohne Texte müssen alle Posting-Listen durchsucht werden.
+        """
+        ids = [int(doc_id) for doc_id in ids]
+        with self._lock:
+            if texts is not None:
+                for doc_id, text in zip(ids, texts):
+                    for term in set(tokenize(text)):
+                        postings = self.postings.get(term)
+                        if postings is not None:
+                            postings.pop(doc_id, None)
+                            if not postings:
+                                del self.postings[term]
+            else:
+                removed = set(ids)
+                for term in list(self.postings):
+                    postings = self.postings[term]
+                    for doc_id in removed.intersection(postings):
+                        del postings[doc_id]
+                    if not postings:
+                        del self.postings[term]
+
+            for doc_id in ids:
+                self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(self, query: str, top_k: int, id_filter=None) -> List[Tuple[int, float]]:
+        """
+        Sucht die Dokumente mit der höchsten BM25-Bewertung
+
+        Args:
+            query: Suchanfrage
+            top_k: Anzahl der Treffer
+            id_filter: Optionaler app.rag.filters.IdFilter, beschränkt die erlaubten Dokument-IDs
+
+        Returns:
+            Liste von (Dokument-ID, Score), absteigend sortiert
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            num_docs = len(self.doc_lengths)
+            if not terms or num_docs == 0:
+                return []
+            avg_length = self.total_length / num_docs
+
+            all_ids, all_scores = [], []
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+
+                df = len(postings)
+                idf = math.log(1.0 + (num_docs - df + 0.5) / (df + 0.5))
+                ids = np.fromiter(postings.keys(), dtype=np.int64, count=df)
+                tfs = np.fromiter(postings.values(), dtype=np.float32, count=df)
+                lengths = np.fromiter((self.doc_lengths[doc_id] for doc_id in postings), dtype=np.float32, count=df)
+
+                norm = self.k1 * (1.0 - self.b + self.b * lengths / avg_length)
+                all_ids.append(ids)
+                all_scores.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+
+        if not all_ids:
+            return []
+
+        # Beiträge der einzelnen Terme je Dokument aufsummieren
+        unique_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+
+        if id_filter is not None:
+            allowed = id_filter.contains(unique_ids)
+            unique_ids, scores = unique_ids[allowed], scores[allowed]
+
+        top = np.argsort(-scores)[:top_k]
+        return [(int(unique_ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path: Path):
+        """Speichert den Index atomar (temporäre Datei und Umbenennen)"""
+        tmp_path = path.with_name(path.name + ".tmp")
+        with self._lock:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+def reciprocal_rank_fusion(
+    rankings: List[List[int]],
+    weights: List[float],
+    k: int = 60
+) -> List[Tuple[int, float]]:
+    """
+    Führt mehrere Trefferlisten per Reciprocal Rank Fusion zusammen
+
+    Args:
+        rankings: Trefferlisten (Dokument-IDs in Rangfolge)
+        weights: Gewicht je Trefferliste
+        k: Dämpfungskonstante der RRF-Formel
+
+    Returns:
+        Liste von (Dokument-ID, fusionierter Score), absteigend sortiert
+    """
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,103 @@
+# backend/app/rag/lock.py
+import fcntl
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class DirectoryLock:
+    """
+    Sperre eines Vektorverzeichnisses gegen andere Prozesse (Sperrdatei mit flock)
+
+    Vektor-Log, Snapshots und Chunk-Speicher dürfen nur von einem Prozess
+    gleichzeitig geschrieben werden. Die API hält die Sperre nur während eines
+    Schreibvorgangs, Ingestion und Umwandlung für ihren gesamten Lauf. Die
+    Sperre gilt bis zum letzten release() oder bis zum Ende des Prozesses,
+    auch nach einem Absturz. acquire() und release() werden im selben Prozess
+    gezählt, verschachtelte und gleichzeitige Schreibvorgänge teilen sich die Sperre.
+
+    Die Sperrdatei enthält die PID des Halters und einen Änderungszähler, der
+    beim endgültigen Freigeben nach Änderungen erhöht wird. Ein Prozess mit
+    einem Stand im Speicher erkennt daran Änderungen anderer Prozesse.
+
+    Args:
+        path: Pfad der Sperrdatei (z.B. vector_db/.lock)
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.generation = 0  # Änderungszähler beim letzten acquire() bzw. release()
+        self._fd: Optional[int] = None
+        self._depth = 0
+        self._changed = False
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self):
+        """
+        Sperrt das Verzeichnis ohne zu warten (im selben Prozess gezählt)
+
+        Raises:
+            RuntimeError: Wenn ein anderer Prozess die Sperre hält
+        """
+        if self._fd is not None:
+            self._depth += 1
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            owner, _ = self._read(fd)
+            os.close(fd)
+            raise RuntimeError(
+                f"{self.path.parent} wird gerade von einem anderen Prozess geschrieben (PID {owner or 'unbekannt'}). "
+                f"Ende der Ingestion bzw. Umwandlung abwarten."
+            )
+
+        _, self.generation = self._read(fd)
+        self._write(fd)
+        self._fd = fd
+        self._depth = 1
+        self._changed = False
+        logger.debug(f"Sperre {self.path} gesetzt (Änderungszähler {self.generation})")
+
+    def release(self, changed: bool = False):
+        """
+        Gibt die Sperre frei (nach dem letzten acquire() im Prozess)
+
+        Args:
+            changed: Das Verzeichnis wurde geändert; erhöht beim endgültigen
+                Freigeben den Änderungszähler
+        """
+        if self._fd is None:
+            return
+        self._changed = self._changed or changed
+        self._depth -= 1
+        if self._depth > 0:
+            return
+
+        if self._changed:
+            self.generation += 1
+            self._write(self._fd)
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def _read(self, fd: int) -> Tuple[str, int]:
+        """PID des (letzten) Halters und Änderungszähler aus der Sperrdatei"""
+        os.lseek(fd, 0, os.SEEK_SET)
+        parts = os.read(fd, 64).decode(errors="replace").split()
+        owner = parts[0] if parts else ""
+        generation = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        return owner, generation
+
+    def _write(self, fd: int):
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, f"{os.getpid()} {self.generation}".encode())
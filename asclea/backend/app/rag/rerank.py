@@ -0,0 +1,60 @@
+# backend/app/rag/rerank.py
+import logging
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+def rerank(
+    model,
+    query: str,
+    candidates: List[Dict[str, Any]],
+    top_n: int,
+    batch_size: int = 16,
+    budget_seconds: float = 0.3
+) -> List[Dict[str, Any]]:
+    """
+    Sortiert Suchtreffer mit einem Cross-Encoder neu
+
+    Die Kandidaten werden in ihrer bisherigen Reihenfolge batchweise bewertet.
+    Reicht das Zeitbudget nicht für alle Batches, werden die bewerteten
+    Kandidaten nach Cross-Encoder-Score sortiert und die übrigen in der
+    ursprünglichen Reihenfolge dahinter angehängt.
+
+    Args:
+        model: sentence_transformers.CrossEncoder
+        query: Suchanfrage
+        candidates: Suchtreffer in Reihenfolge der Vektor-/Hybridsuche
+        top_n: Anzahl der zurückzugebenden Treffer
+        batch_size: Anzahl der Paare pro Forward-Pass
+        budget_seconds: Zeitbudget für die Bewertung
+
+    Returns:
+        Die top_n Treffer, bewertete Treffer mit zusätzlichem "rerank_score"
+    """
+    start = time.perf_counter()
+    deadline = start + budget_seconds
+    scored = []
+    last_batch_seconds = 0.0
+
+    for batch_start in range(0, len(candidates), batch_size):
+        # Abbrechen, wenn der nächste Batch das Budget voraussichtlich überschreitet
+        if time.perf_counter() + last_batch_seconds > deadline:
+            logger.info(
+                f"Reranking-Budget erschöpft nach {len(scored)}/{len(candidates)} Kandidaten, "
+                f"Rest in ursprünglicher Reihenfolge"
+            )
+            break
+
+        batch_started = time.perf_counter()
+        batch = candidates[batch_start:batch_start + batch_size]
+        scores = model.predict(
+            [(query, candidate["text"]) for candidate in batch],
+            batch_size=len(batch),
+            show_progress_bar=False
+        )
+        scored.extend(dict(candidate, rerank_score=float(score)) for candidate, score in zip(batch, scores))
+        last_batch_seconds = time.perf_counter() - batch_started
+
+    scored.sort(key=lambda candidate: candidate["rerank_score"], reverse=True)
+    return (scored + candidates[len(scored):])[:top_n]
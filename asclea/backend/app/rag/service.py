@@ -1,91 +1,691 @@
 import os
 from pathlib import Path
 import asyncio
+from contextlib import asynccontextmanager
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import Dict, List, Any, Optional, Tuple
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-import json
 import logging
 from datetime import datetime
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import SessionLocal
 from app.db.models import MedicalSource
-import fitz  # PyMuPDF
-from bs4 import BeautifulSoup
-import pandas as pd
+from app.rag.batching import EmbeddingBatcher
+from app.rag.cache import EmbeddingCache, LRUCache, SemanticAnswerCache, normalize_query
+from app.rag.chunk_store import ChunkStore, content_hash, file_content_hash
+from app.rag.chunking import chunk_blocks, make_token_counter, resolve_chunk_tokens
+from app.rag.context import pack_context
+from app.rag.embedder import create_embedder
+from app.rag.extraction import SUPPORTED_EXTENSIONS, TABLE_EXTENSIONS, DocumentExtractor, iter_table_chunks
+from app.rag.filters import FilterIndex, IdFilter, filter_key, normalize_filters
+from app.rag.index import (
+    build_index, create_index, default_index_params, distances_to_scores, exact_search, fit_params_to_data,
+    is_id_mapped, load_index_params, needs_training, prepare_vectors, reconstruct_all, save_index_params,
+    untrained_params, write_index_atomic
+)
+from app.rag.lexical import BM25Index, reciprocal_rank_fusion
+from app.rag.lock import DirectoryLock
+from app.rag.rerank import rerank
+from app.rag.shards import DEFAULT_SHARD, ShardedIndex, shard_key
+from app.rag.snapshot import IndexSnapshot
+from app.rag.wal import VectorLog
 
 logger = logging.getLogger(__name__)
 
 # Globale Variablen
 embedding_model = None
+embedding_batcher = None  # Bündelt gleichzeitige Query-Embeddings zu einem Forward-Pass
+document_extractor = None  # Prozesspool für die Textextraktion
+token_counter = make_token_counter()  # Zählt Tokens mit dem Tokenizer des Embedding-Modells
+reranker_model = None  # Optionaler Cross-Encoder für das Reranking
 vector_index = None
-document_lookup = {}  # Speichert Dokument-IDs und ihre Metadaten
+chunk_store = None  # Speichert Text und Metadaten je Vektor-ID (SQLite)
+index_params = {}  # Parameter des aktuellen Index (Typ, nprobe, efSearch, ...)
+vector_log = None  # Write-Ahead-Log für Vektoränderungen seit dem letzten Snapshot
+index_write_lock = None  # Serialisiert Änderungen am Index mit Snapshots und Neuaufbau
+next_vector_id = 0  # Nächste freie Vektor-ID
+query_embedding_cache = LRUCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL)
+answer_cache = None  # Semantischer Antwort-Cache, wird in initialize_rag_service erstellt
+embedding_cache = None  # Persistenter Cache der Chunk-Embeddings (Modell, Text-Hash)
+lexical_index = BM25Index(settings.BM25_K1, settings.BM25_B)  # Invertierter Index für die Hybridsuche
+filter_index = FilterIndex(settings.FILTER_CACHE_SIZE)  # Vektor-ID -> Quelle für gefilterte Suchen
+index_snapshot = None  # Veröffentlichter Stand für Suchen (siehe _publish_snapshot)
+lexical_search_executor = ThreadPoolExecutor(thread_name_prefix="bm25-search")  # BM25-Suche parallel zur Vektorsuche
+dedup_stats = {"files": 0, "chunks": 0}  # Nicht erneut eingebettete Dateien und Chunks
+vector_db_lock = None  # Sperre des Vektorverzeichnisses gegen andere schreibende Prozesse
+loaded_generation = None  # Änderungszähler des Vektorverzeichnisses, dem der Stand im Speicher entspricht
+
+def lock_vector_db():
+    """
+    Sperrt das Vektorverzeichnis gegen andere Prozesse (verschachtelbar, siehe DirectoryLock)
+    
+    Raises:
+        RuntimeError: Wenn Ingestion, Umwandlung oder ein anderer API-Prozess gerade schreiben
+    """
+    global vector_db_lock
+    if vector_db_lock is None:
+        vector_db_lock = DirectoryLock(Path(settings.VECTOR_DB_PATH) / ".lock")
+    vector_db_lock.acquire()
+
+def unlock_vector_db(changed: bool = False):
+    """
+    Gibt die Sperre des Vektorverzeichnisses frei
+    
+    Args:
+        changed: Das Verzeichnis wurde geändert (andere Prozesse laden vor ihrem
+            nächsten Schreibvorgang neu)
+    """
+    global loaded_generation
+    if vector_db_lock is None:
+        return
+    in_sync = loaded_generation == vector_db_lock.generation
+    vector_db_lock.release(changed)
+    if in_sync:
+        loaded_generation = vector_db_lock.generation
+
+@asynccontextmanager
+async def _vector_db_writer():
+    """
+    Sperrt das Vektorverzeichnis für einen Schreibvorgang gegen andere Prozesse
+    
+    Hat ein anderer Prozess (z.B. die Ingestion) das Verzeichnis seit dem
+    Laden geändert, wird der Stand vorher neu geladen; sonst würde der
+    nächste Snapshot dessen Änderungen überschreiben. Suchen brauchen die
+    Sperre nicht und laufen während einer Ingestion auf dem bisherigen Stand.
+    
+    Raises:
+        RuntimeError: Wenn ein anderer Prozess gerade schreibt
+    """
+    lock_vector_db()
+    try:
+        async with index_write_lock:
+            if loaded_generation != vector_db_lock.generation:
+                logger.info("Vektorverzeichnis wurde von einem anderen Prozess geändert, lade neu")
+                await _load_state()
+        yield
+    finally:
+        unlock_vector_db(changed=True)
 
 async def initialize_rag_service():
-    """Initialisiert den RAG-Service"""
-    global embedding_model, vector_index, document_lookup
+    """
+    Initialisiert den RAG-Service
+    
+    Das Vektorverzeichnis ist nur während der Initialisierung gesperrt, danach
+    nur während einzelner Schreibvorgänge (siehe _vector_db_writer).
+    """
+    # Vor dem Laden der Modelle, damit ein zweiter Prozess sofort abbricht
+    lock_vector_db()
+    try:
+        await _initialize_rag_service()
+    finally:
+        unlock_vector_db(changed=True)
+
+async def _initialize_rag_service():
+    """Lädt die Modelle und den Stand des Vektorverzeichnisses (siehe initialize_rag_service)"""
+    global embedding_model, vector_index, chunk_store, index_params, vector_log, index_write_lock, next_vector_id
+    global answer_cache, lexical_index, reranker_model, token_counter, embedding_batcher, document_extractor
+    global embedding_cache, loaded_generation
+    
+    index_write_lock = asyncio.Lock()
+    answer_cache = SemanticAnswerCache(
+        settings.ANSWER_CACHE_SIZE,
+        settings.ANSWER_CACHE_TTL,
+        settings.ANSWER_CACHE_THRESHOLD,
+        settings.ANSWER_CACHE_DIR or None
+    )
+    if settings.EMBEDDING_CACHE_DIR:
+        embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_DIR, settings.EMBEDDING_CACHE_SIZE_LIMIT)
     
     # Embedding-Modell laden
     try:
         loop = asyncio.get_event_loop()
         embedding_model = await loop.run_in_executor(
             None,
-            lambda: SentenceTransformer(settings.EMBEDDING_MODEL)
+            create_embedder
+        )
+        token_counter = make_token_counter(getattr(embedding_model, "tokenizer", None))
+        embedding_batcher = EmbeddingBatcher(
+            embedding_model,
+            settings.QUERY_BATCH_MAX_SIZE,
+            settings.QUERY_BATCH_WAIT_MS
         )
-        logger.info(f"Embedding-Modell geladen: {settings.EMBEDDING_MODEL}")
+        logger.info(f"Embedding-Modell geladen: {embedding_model.name}")
+        if embedding_model.max_seq_length and settings.CHUNK_TOKENS > embedding_model.max_seq_length:
+            logger.warning(
+                f"CHUNK_TOKENS={settings.CHUNK_TOKENS} übersteigt die maximale Sequenzlänge "
+                f"des Embedding-Modells ({embedding_model.max_seq_length}), Chunks werden beim Embedding abgeschnitten"
+            )
     except Exception as e:
         logger.error(f"Fehler beim Laden des Embedding-Modells: {str(e)}")
         raise
     
+    document_extractor = DocumentExtractor(settings.EXTRACTION_WORKERS, settings.EXTRACTION_PDF_PAGES_PER_TASK)
+    
+    # Reranking-Modell laden (optional)
+    if settings.RERANKER_MODEL:
+        try:
+            from sentence_transformers import CrossEncoder
+            
+            reranker_model = await loop.run_in_executor(
+                None,
+                lambda: CrossEncoder(settings.RERANKER_MODEL, device="cpu")
+            )
+            logger.info(f"Reranking-Modell geladen: {settings.RERANKER_MODEL}")
+        except Exception as e:
+            logger.error(f"Fehler beim Laden des Reranking-Modells, Reranking deaktiviert: {str(e)}")
+            reranker_model = None
+    
     # Vektorindex laden oder erstellen
     vector_db_path = Path(settings.VECTOR_DB_PATH)
+    vector_db_path.mkdir(parents=True, exist_ok=True)
     index_file = vector_db_path / "faiss_index.bin"
     lookup_file = vector_db_path / "document_lookup.json"
+    log_file = vector_db_path / "faiss_index.wal"
+    
+    # Chunk-Speicher öffnen und ggf. altes JSON-Lookup übernehmen
+    chunk_store = ChunkStore(vector_db_path / "chunks.sqlite3")
+    if lookup_file.exists():
+        chunk_store.import_lookup(lookup_file)
+    
+    dimension = embedding_model.get_sentence_embedding_dimension()
+    created = False
     
-    if index_file.exists() and lookup_file.exists():
+    if index_file.exists():
         try:
-            # Vorhandenen Index laden
-            vector_index = faiss.read_index(str(index_file))
+            # Vorhandenen Index (alle Shards) laden
+            vector_index, index_params = _open_vector_index(vector_db_path, dimension)
             
-            # Dokument-Lookup laden
-            with open(lookup_file, 'r', encoding='utf-8') as f:
-                document_lookup = json.load(f)
-                
-            logger.info(f"Vektorindex geladen: {len(document_lookup)} Dokumente")
+            logger.info(
+                f"Vektorindex geladen ({index_params['index_type']}): {vector_index.ntotal} Dokumente "
+                f"in {len(vector_index.shards)} Shards"
+            )
+            
+            if index_params["index_type"] != settings.VECTOR_INDEX_TYPE:
+                logger.warning(
+                    f"Gespeicherter Indextyp {index_params['index_type']} weicht von "
+                    f"VECTOR_INDEX_TYPE={settings.VECTOR_INDEX_TYPE} ab, Neuaufbau mit rebuild_index() erforderlich"
+                )
+            if (index_params["metric"], index_params["storage"]) != (settings.VECTOR_METRIC, settings.VECTOR_STORAGE):
+                logger.warning(
+                    f"Gespeicherter Index ({index_params['metric']}, {index_params['storage']}) weicht von "
+                    f"VECTOR_METRIC={settings.VECTOR_METRIC}, VECTOR_STORAGE={settings.VECTOR_STORAGE} ab, "
+                    f"Umwandlung mit rebuild_index() oder python -m app.rag.convert_index erforderlich"
+                )
         except Exception as e:
             logger.error(f"Fehler beim Laden des Vektorindex: {str(e)}")
-            # Fallback: Erstelle einen neuen Index wenn der Ladevorgang fehlschlägt
-            dimension = embedding_model.get_sentence_embedding_dimension()
-            vector_index = faiss.IndexFlatL2(dimension)
-            document_lookup = {}
-            logger.warning(f"Fallback: Neuer Vektorindex erstellt mit Dimension {dimension}")
+            # Fallback: Neuen Standard-Shard anlegen, lesbare Shards behalten
+            vector_index, index_params = _new_vector_index(vector_db_path, dimension)
+            created = True
+            logger.warning(f"Fallback: Neuer Standard-Shard erstellt mit Dimension {dimension}")
     else:
-        # Verzeichnis erstellen, falls es nicht existiert
-        vector_db_path.mkdir(parents=True, exist_ok=True)
-        
         # Neuen Index erstellen (leer)
-        dimension = embedding_model.get_sentence_embedding_dimension()
-        vector_index = faiss.IndexFlatL2(dimension)
-        document_lookup = {}
+        vector_index, index_params = _new_vector_index(vector_db_path, dimension)
+        created = True
+        
+        # Index speichern
+        vector_index.save_shard(DEFAULT_SHARD)
         
-        # Index und Lookup speichern
-        faiss.write_index(vector_index, str(index_file))
-        with open(lookup_file, 'w', encoding='utf-8') as f:
-            json.dump(document_lookup, f)
-            
         logger.info(f"Neuer Vektorindex erstellt mit Dimension {dimension}")
+    
+    # Änderungen seit dem letzten Snapshot aus dem Log wiederherstellen
+    vector_log = VectorLog(log_file, fsync=settings.WAL_FSYNC)
+    replayed = _replay_vector_log(vector_index, index_params, vector_log, chunk_store)
+    if created:
+        _drop_chunks_without_vectors()
+    next_vector_id = _next_free_id(vector_index)
+    
+    # Invertierten Index laden und mit dem Chunk-Speicher abgleichen
+    lexical_index = _load_lexical_index(vector_db_path / "bm25_index.pkl", chunk_store)
+    _load_filter_index(filter_index, chunk_store)
+    _publish_snapshot(vector_index, index_params, lexical_index, filter_index, chunk_store)
+    loaded_generation = vector_db_lock.generation
+    
+    if replayed:
+        logger.info(f"{replayed} Log-Einträge wiederhergestellt")
+        await save_index()
+
+def _open_vector_index(vector_db_path: Path, dimension: int) -> Tuple[ShardedIndex, Dict[str, Any]]:
+    """
+    Lädt den gespeicherten Vektorindex (Standard-Shard und alle weiteren Shards)
+    
+    Returns:
+        Tupel aus (Index, Parameter des Standard-Shards)
+    """
+    index_file = vector_db_path / "faiss_index.bin"
+    params_file = vector_db_path / "index_config.json"
+    
+    default_index = faiss.read_index(str(index_file))
+    params = load_index_params(params_file)
+    
+    if not is_id_mapped(default_index):
+        # Alte Indizes ohne ID-Zuordnung übernehmen (IDs = Einfügereihenfolge)
+        ids, vectors = reconstruct_all(default_index)
+        default_index = build_index(vectors, params, ids)
+        write_index_atomic(default_index, index_file)
+        logger.info(f"Vektorindex auf ID-Zuordnung umgestellt: {default_index.ntotal} Vektoren")
+    
+    index = ShardedIndex(vector_db_path, dimension, partial(_create_empty_shard, dimension), settings.SHARD_SEARCH_THREADS)
+    index.attach(DEFAULT_SHARD, default_index, params)
+    
+    # Weitere Shards laden; ein defekter Shard legt den Dienst nicht lahm
+    for key in index.available_keys():
+        if key == DEFAULT_SHARD:
+            continue
+        try:
+            index.load(key, create=False)
+        except Exception as e:
+            logger.error(f"Fehler beim Laden von Shard {key}: {str(e)}")
+    
+    return index, params
+
+def _new_vector_index(vector_db_path: Path, dimension: int) -> Tuple[ShardedIndex, Dict[str, Any]]:
+    """
+    Erstellt einen leeren Standard-Shard; vorhandene, lesbare Shards bleiben erhalten
+    
+    Chunks, deren Vektoren dabei verloren gehen, entfernt _drop_chunks_without_vectors
+    nach der Wiedergabe des Vektor-Logs.
+    """
+    default_index, params = _create_empty_index(dimension)
+    index = ShardedIndex(vector_db_path, dimension, partial(_create_empty_shard, dimension), settings.SHARD_SEARCH_THREADS)
+    index.attach(DEFAULT_SHARD, default_index, params)
+    
+    for key in index.available_keys():
+        if key == DEFAULT_SHARD:
+            continue
+        try:
+            index.load(key, create=False)
+        except Exception as e:
+            logger.error(f"Fehler beim Laden von Shard {key}: {str(e)}")
+    
+    return index, params
+
+def _drop_chunks_without_vectors() -> int:
+    """
+    Entfernt Chunks, deren Vektoren in keinem Shard mehr vorhanden sind
+    
+    Das ist nach der Neuanlage eines fehlenden oder defekten Standard-Shards
+    der Fall. Die betroffenen Quellen werden als nicht indiziert markiert und
+    ihre Datei-Hashes vergessen, sodass die nächste Ingestion sie neu indiziert.
+    
+    Returns:
+        Anzahl der entfernten Chunks
+    """
+    ids = np.asarray(chunk_store.all_ids(), dtype=np.int64)
+    lost = ids[~vector_index.contains(ids)]
+    if len(lost) == 0:
+        return 0
+    
+    lost_ids = set(lost.tolist())
+    sources = {
+        source_id for chunk_id, source_id in chunk_store.source_assignments()
+        if chunk_id in lost_ids and source_id is not None
+    }
+    chunk_store.delete_many(lost_ids)
+    for source_id in sources:
+        chunk_store.remove_files(source_id)
+    
+    db = SessionLocal()
+    try:
+        db.query(MedicalSource).filter(MedicalSource.id.in_(sources)).update(
+            {"indexed": False}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    
+    logger.warning(f"{len(lost)} Chunks ohne Vektor entfernt, {len(sources)} Quellen zur Neuindizierung markiert")
+    return len(lost)
+
+def _next_free_id(index: ShardedIndex) -> int:
+    """Nächste freie Vektor-ID (auch IDs nicht geladener Shards und des Chunk-Speichers zählen)"""
+    ids = index.get_ids()
+    max_id = max(int(ids.max()) if len(ids) else -1, chunk_store.max_id() or -1)
+    return max(max_id + 1, next_vector_id)
+
+def _publish_snapshot(
+    index: ShardedIndex,
+    params: Dict[str, Any],
+    lexical: BM25Index,
+    filters: FilterIndex,
+    chunks: ChunkStore
+):
+    """
+    Veröffentlicht einen neuen Stand der Suchstrukturen
+    
+    Alle globalen Referenzen werden ohne Unterbrechung durch den Event-Loop
+    ersetzt; Suchen, die den alten Snapshot bereits halten, laufen darauf zu Ende.
+    Spätere Schreibvorgänge werden unter index_snapshot.publishing() auf die
+    veröffentlichten Objekte angewendet (siehe IndexSnapshot).
+    """
+    global vector_index, index_params, lexical_index, filter_index, chunk_store, index_snapshot
+    
+    generation = index_snapshot.generation + 1 if index_snapshot is not None else 0
+    vector_index, index_params, lexical_index, filter_index, chunk_store = index, params, lexical, filters, chunks
+    index_snapshot = IndexSnapshot(index, params, lexical, filters, chunks, generation)
+
+async def reload_index() -> Dict[str, Any]:
+    """
+    Lädt Vektorindex, Chunk-Speicher, BM25-Index und Filter-Zuordnung neu von der Festplatte
+    
+    Übernimmt z.B. den Stand einer Ingestion oder Umwandlung, die neben der
+    laufenden API ausgeführt wurde (vor dem nächsten Schreibvorgang geschieht
+    das ohnehin automatisch). Suchen laufen währenddessen auf dem bisherigen
+    Stand weiter; Änderungen am Index warten, bis der Austausch abgeschlossen ist.
+    
+    Returns:
+        Kennzahlen des neuen Snapshots
+    
+    Raises:
+        RuntimeError: Wenn ein anderer Prozess gerade schreibt
+    """
+    lock_vector_db()
+    try:
+        async with index_write_lock:
+            await _load_state()
+    finally:
+        unlock_vector_db()
+    
+    return index_snapshot.stats()
 
-async def process_document(source_id: int, db_session):
+async def _load_state():
+    """
+    Baut den Stand des Vektorverzeichnisses neben dem laufenden auf und veröffentlicht ihn
+    
+    Chunk-Speicher und Vektor-Log werden neu geöffnet, damit auch ausgetauschte
+    Dateien übernommen werden. Noch nicht gespeicherte Änderungen aus dem Log
+    werden ergänzt. Der Aufrufer hält index_write_lock und die Verzeichnissperre.
+    """
+    global next_vector_id, vector_log, loaded_generation
+    
+    vector_db_path = Path(settings.VECTOR_DB_PATH)
+    dimension = embedding_model.get_sentence_embedding_dimension()
+    
+    def load():
+        chunks = ChunkStore(vector_db_path / "chunks.sqlite3")
+        log = VectorLog(vector_db_path / "faiss_index.wal", fsync=settings.WAL_FSYNC)
+        index, params = _open_vector_index(vector_db_path, dimension)
+        # Die Version darf nicht sinken, sonst träfen alte Cache-Einträge wieder
+        params["version"] = max(params.get("version", 0), index_params.get("version", 0))
+        _replay_vector_log(index, params, log, chunks)
+        lexical = _load_lexical_index(vector_db_path / "bm25_index.pkl", chunks)
+        filters = FilterIndex(settings.FILTER_CACHE_SIZE)
+        _load_filter_index(filters, chunks)
+        return index, params, lexical, filters, chunks, log
+    
+    loop = asyncio.get_event_loop()
+    index, params, lexical, filters, chunks, log = await loop.run_in_executor(None, load)
+    
+    old_log, vector_log = vector_log, log
+    _publish_snapshot(index, params, lexical, filters, chunks)
+    old_log.close()
+    next_vector_id = _next_free_id(index)
+    _mark_index_changed()
+    loaded_generation = vector_db_lock.generation
+    
+    logger.info(
+        f"Vektorindex neu geladen (Snapshot {index_snapshot.generation}): "
+        f"{index.ntotal} Dokumente in {len(index.shards)} Shards"
+    )
+
+async def shutdown_rag_service():
+    """Schreibt ausstehende Änderungen in einen Snapshot und schließt das Log"""
+    if embedding_batcher is not None:
+        await embedding_batcher.stop()
+    if document_extractor is not None:
+        document_extractor.shutdown()
+    lexical_search_executor.shutdown(wait=False)
+    if embedding_cache is not None:
+        embedding_cache.close()
+    
+    if vector_log is not None:
+        if vector_log.size() > 0:
+            await save_index()
+        vector_log.close()
+    
+def _replay_vector_log(index: ShardedIndex, params: Dict[str, Any], log: VectorLog, chunks: ChunkStore) -> int:
+    """
+    Wendet die Einträge des Vektor-Logs auf den geladenen Snapshot an
+    
+    Hinzufügen wird als Upsert, Entfernen nur für vorhandene IDs ausgeführt.
+    Damit ist die Wiedergabe auch dann korrekt, wenn der Snapshot die Einträge
+    bereits enthält (z.B. nach einem Absturz zwischen Snapshot und Leeren des Logs).
+    Vektoren ohne gespeicherten Chunk werden nicht übernommen: Das Log wird vor
+    dem Chunk-Speicher geschrieben, nach einem Absturz dazwischen fehlen die Chunks.
+    Umgekehrt werden Chunks entfernter Vektoren gelöscht, da remove_vectors sie
+    erst nach dem Entfernen aus dem Index löscht.
+    
+    Die Einträge werden zunächst zum Endstand zusammengefasst und dann mit
+    einem einzigen Entfernen und einem Hinzufügen je Shard angewendet, sodass
+    HNSW-Shards höchstens einmal neu aufgebaut werden.
+    
+    Args:
+        index: Vektorindex, auf den das Log angewendet wird
+        params: Zugehörige Indexparameter (Version wird je Eintrag erhöht)
+        log: Wiederzugebendes Vektor-Log
+        chunks: Zugehöriger Chunk-Speicher
+    
+    Returns:
+        Anzahl der angewendeten Log-Einträge
+    """
+    replayed = 0
+    touched = []
+    pending = {}  # Vektor-ID -> (Shard, Vektor) der im Log zuletzt hinzugefügten Vektoren
+    removed = set()  # Im Log entfernte und danach nicht wieder hinzugefügte Vektor-IDs
+    
+    for op, ids, vectors, shard in log.replay():
+        if op not in ("add", "remove"):
+            logger.warning(f"Unbekannte Operation im Vektor-Log: {op}")
+            continue
+        
+        touched.append(ids)
+        for position, vector_id in enumerate(ids.tolist()):
+            if op == "add":
+                pending[vector_id] = (shard or DEFAULT_SHARD, vectors[position])
+                removed.discard(vector_id)
+            else:
+                pending.pop(vector_id, None)
+                removed.add(vector_id)
+        replayed += 1
+    
+    if not replayed:
+        return 0
+    
+    # Alle vom Log betroffenen IDs des Snapshots in einem Durchgang entfernen
+    touched = np.unique(np.concatenate(touched))
+    existing = touched[index.contains(touched)]
+    if len(existing):
+        index.remove(existing)
+    if removed:
+        chunks.delete_many(removed)
+    
+    stored = chunks.existing_ids(list(pending))
+    dropped = len(pending) - len(stored)
+    shards = {}
+    for vector_id, (shard, vector) in pending.items():
+        if vector_id in stored:
+            shards.setdefault(shard, []).append((vector_id, vector))
+    for shard, entries in shards.items():
+        ids = np.array([vector_id for vector_id, _ in entries], dtype=np.int64)
+        vectors = np.stack([vector for _, vector in entries])
+        index.add(shard, prepare_vectors(vectors, params), ids)
+    
+    _mark_index_changed(params, replayed)
+    
+    if dropped:
+        logger.warning(f"{dropped} Vektoren aus dem Log ohne gespeicherten Chunk verworfen")
+    return replayed
+
+def _load_lexical_index(path: Path, chunks: ChunkStore) -> BM25Index:
+    """
+    Lädt den BM25-Index und gleicht ihn mit dem Chunk-Speicher ab
+    
+    Der BM25-Index wird nur mit dem Snapshot gespeichert. Chunks, die seitdem
+    hinzugekommen oder entfernt worden sind, werden hier nachgezogen.
+    """
+    lexical = BM25Index(settings.BM25_K1, settings.BM25_B)
+    if path.exists():
+        try:
+            lexical = BM25Index.load(path)
+        except Exception as e:
+            logger.error(f"Fehler beim Laden des BM25-Index, wird neu aufgebaut: {str(e)}")
+    
+    stored_ids = set(chunks.all_ids())
+    indexed_ids = set(lexical.doc_lengths)
+    
+    stale = indexed_ids - stored_ids
+    if stale:
+        lexical.remove_many(stale)
+    
+    missing = sorted(stored_ids - indexed_ids)
+    for start in range(0, len(missing), 1000):
+        docs = chunks.get_many(missing[start:start + 1000])
+        lexical.add_many((doc_id, doc["text"]) for doc_id, doc in docs.items())
+    
+    if stale or missing:
+        logger.info(f"BM25-Index abgeglichen: {len(missing)} ergänzt, {len(stale)} entfernt")
+    
+    return lexical
+
+def _load_filter_index(filters: FilterIndex, chunks: ChunkStore):
+    """Baut die Filter-Zuordnung aus Chunk-Speicher und Quellen-Tabelle auf"""
+    pairs = list(chunks.source_assignments())
+    filters.assign((chunk_id for chunk_id, _ in pairs), (source_id for _, source_id in pairs))
+    
+    refs = {}
+    for chunk_id, source_id in chunks.ref_assignments():
+        refs.setdefault(source_id, []).append(chunk_id)
+    for source_id, ids in refs.items():
+        filters.add_refs(source_id, ids)
+    
+    db = SessionLocal()
+    try:
+        for source in db.query(MedicalSource).all():
+            filters.set_source(source.id, source.source_type, source.publisher, source.publication_date)
+    finally:
+        db.close()
+    
+    logger.info(f"Filter-Index aufgebaut: {len(pairs)} Vektoren, {len(filters.sources)} Quellen")
+
+def _create_empty_shard(dimension: int) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """Erstellt einen leeren Shard mit Ähnlichkeitsmaß und Speicherformat des Standard-Shards"""
+    params = dict(default_index_params(), metric=index_params["metric"], storage=index_params["storage"])
+    params = fit_params_to_data(params, 0)
+    return create_index(dimension, params), params
+
+def _create_empty_index(dimension: int) -> Tuple[faiss.Index, Dict[str, Any]]:
+    """
+    Erstellt einen leeren Index gemäß VECTOR_INDEX_TYPE
+    
+    Trainierbare Indextypen (IVF, sq8) können ohne Daten nicht trainiert werden.
+    In diesem Fall wird zunächst ein flacher Index (float32 bzw. fp16) mit
+    demselben Ähnlichkeitsmaß angelegt, der nach der Ingestion mit
+    rebuild_index() umgebaut wird.
+    """
+    params = default_index_params()
+    
+    if needs_training(params):
+        logger.warning(
+            f"Indextyp {params['index_type']} ({params['storage']}) benötigt Trainingsdaten, "
+            f"lege flachen Index an (Neuaufbau mit rebuild_index() nach der Ingestion)"
+        )
+        params = untrained_params(params)
+    
+    return create_index(dimension, params), params
+
+async def rebuild_index(index_type: Optional[str] = None, shard: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Baut den Vektorindex mit einem anderen Indextyp neu auf
+
+    Die gespeicherten Vektoren werden aus dem aktuellen Index rekonstruiert
+    (bei quantisierten Indizes nach Möglichkeit aus dem Embedding-Cache),
+    der neue Index wird trainiert, befüllt und anschließend gespeichert.
+    Die Vektor-IDs bleiben dabei unverändert. Ohne Angabe eines Shards werden
+    alle Shards nacheinander neu aufgebaut (nicht geladene Shards werden dafür
+    geladen).
+
+    Args:
+        index_type: Ziel-Indextyp (Standard: settings.VECTOR_INDEX_TYPE)
+        shard: Nur diesen Shard neu aufbauen
+
+    Returns:
+        Die Parameter des neuen Index (bzw. des neu aufgebauten Shards)
+    """
+    keys = vector_index.available_keys()
+    if shard:
+        if shard not in keys:
+            raise KeyError(f"Shard nicht gefunden: {shard}")
+        keys = [shard]
+
+    loop = asyncio.get_event_loop()
+    async with _vector_db_writer(), index_write_lock:
+        for key in keys:
+            params = await loop.run_in_executor(
+                None, vector_index.rebuild, key, default_index_params(index_type), _cached_vectors
+            )
+            logger.info(f"Shard {key} neu aufgebaut ({params['index_type']}): {vector_index.shards[key].ntotal} Vektoren")
+        _mark_index_changed()
+
+    await save_index()
+
+    return params
+
+def get_shard_stats() -> List[Dict[str, Any]]:
+    """Kennzahlen aller Shards des Vektorindex"""
+    return vector_index.stats()
+
+async def load_shard(key: str) -> Dict[str, Any]:
+    """
+    Lädt einen gespeicherten Shard, sodass er wieder durchsucht wird
+
+    Args:
+        key: Shard-Schlüssel
+
+    Returns:
+        Kennzahlen des Shards
+    """
+    loop = asyncio.get_event_loop()
+    async with index_write_lock:
+        await loop.run_in_executor(None, partial(vector_index.load, key, create=False))
+        _mark_index_changed()
+    return next(stats for stats in vector_index.stats() if stats["shard"] == key)
+
+async def unload_shard(key: str):
+    """
+    Entlädt einen Shard (er wird vorher gespeichert und nicht mehr durchsucht)
+
+    Der Standard-Shard kann nicht entladen werden.
+    """
+    if key == DEFAULT_SHARD:
+        raise ValueError("Der Standard-Shard kann nicht entladen werden")
+    if key not in vector_index.shards:
+        raise KeyError(f"Shard nicht geladen: {key}")
+
+    loop = asyncio.get_event_loop()
+    async with _vector_db_writer(), index_write_lock:
+        await loop.run_in_executor(None, vector_index.unload, key)
+        _mark_index_changed()
+
+async def process_document(source_id: int, db_session, force: bool = False):
     """
     Verarbeitet ein medizinisches Dokument und fügt es zum Vektorindex hinzu
     
+    Vorhandene Vektoren der Quelle (aus einer früheren oder abgebrochenen
+    Indizierung) werden erst entfernt, nachdem die neuen Vektoren eingefügt
+    wurden, sodass die Quelle während der Neuindizierung auffindbar bleibt.
+    
+    Dateien und Chunks, deren Inhalts-Hash bereits indiziert ist (z.B. Lang-
+    und Kurzfassung derselben Leitlinie), werden nicht erneut eingebettet,
+    sondern als weitere Quelle des vorhandenen Chunks erfasst.
+    
     Args:
         source_id: ID des Dokuments in der Datenbank
         db_session: Datenbankverbindung
+        force: Auch bereits indizierte Dokumente neu verarbeiten
     """
-    global embedding_model, vector_index, document_lookup
-    
     # Dokument aus der Datenbank laden
     source = db_session.query(MedicalSource).filter(MedicalSource.id == source_id).first()
     if not source:
@@ -93,107 +693,456 @@ async def process_document(source_id: int, db_session):
         return
     
     # Überprüfen, ob das Dokument bereits indiziert wurde
-    if source.indexed:
+    if source.indexed and not force:
         logger.info(f"Dokument {source.title} bereits indiziert")
         return
     
-    # Text aus dem Dokument extrahieren
-    try:
-        from datetime import datetime
+    async with _vector_db_writer():
+        old_ids = chunk_store.ids_for_source(source_id)
+        old_ref_ids = set(chunk_store.ref_ids_for_source(source_id))
+        filter_index.set_source(source.id, source.source_type, source.publisher, source.publication_date)
+        
+        # Text aus dem Dokument extrahieren
+        try:
+            local_path = source.local_path
+            file_extension = os.path.splitext(local_path)[1].lower()
+            if file_extension not in SUPPORTED_EXTENSIONS:
+                logger.warning(f"Nicht unterstütztes Dateiformat: {file_extension}")
+                return
         
-        text_chunks = []
-        local_path = source.local_path
-        file_extension = os.path.splitext(local_path)[1].lower()
+            base_metadata = {
+                "source_id": source_id,
+                "source_title": source.title,
+                "source_type": source.source_type,
+                "shard": _shard_for_source(source)
+            }
         
-        if file_extension == '.pdf':
-            # PDF-Dokument verarbeiten
-            doc = fitz.open(local_path)
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                if text.strip():  # Leere Seiten überspringen
-                    text_chunks.append({
-                        "text": text,
-                        "metadata": {
-                            "source_id": source_id,
-                            "source_title": source.title,
-                            "source_type": source.source_type,
-                            "page": page_num + 1
-                        }
-                    })
-        elif file_extension in ['.html', '.htm']:
-            # HTML-Dokument verarbeiten
-            with open(local_path, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            soup = BeautifulSoup(html_content, 'html.parser')
+            loop = asyncio.get_event_loop()
+            file_hash = await loop.run_in_executor(None, file_content_hash, local_path)
+            duplicate_of = chunk_store.source_for_file(file_hash)
+        
+            if duplicate_of is not None and duplicate_of != source_id:
+                # Identische Datei bereits indiziert: nur deren Chunks referenzieren
+                shared = {
+                    chunk_id: dict(metadata, **base_metadata)
+                    for chunk_id, metadata in chunk_store.metadata_for_source(duplicate_of).items()
+                }
+                owned = set(old_ids)
+                refs = {chunk_id: metadata for chunk_id, metadata in shared.items() if chunk_id not in owned}
+                retained = {chunk_id: metadata for chunk_id, metadata in shared.items() if chunk_id in owned}
+                num_chunks, num_new = len(shared), 0
+                dedup_stats["files"] += 1
+                logger.info(f"Dokument {source.title} ist identisch mit Quelle {duplicate_of}, keine erneute Extraktion")
+            elif file_extension in TABLE_EXTENSIONS:
+                # Tabellen abschnittsweise lesen und einbetten (Speicherbedarf unabhängig von der Dateigröße)
+                num_chunks, num_new, refs, retained = await _index_table(source_id, local_path, base_metadata, set(old_ids))
+            else:
+                # Extraktion im Prozesspool, Textblöcke (PDF, HTML, Text)
+                blocks, text_chunks = await document_extractor.extract(local_path, base_metadata)
             
-            # Text aus verschiedenen relevanten Tags extrahieren
-            for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'li']):
-                text = element.get_text(strip=True)
-                if text:
-                    text_chunks.append({
-                        "text": text,
-                        "metadata": {
-                            "source_id": source_id,
-                            "source_title": source.title,
-                            "source_type": source.source_type,
-                            "element": element.name
-                        }
-                    })
-        elif file_extension in ['.txt', '.md']:
-            # Textdokument verarbeiten
-            with open(local_path, 'r', encoding='utf-8') as f:
-                text = f.read()
+                # Textblöcke zu Chunks mit einheitlicher Tokenzahl zusammenfassen
+                if blocks:
+                    text_chunks = await loop.run_in_executor(None, partial(
+                        chunk_blocks,
+                        blocks,
+                        token_counter,
+                        chunk_tokens=resolve_chunk_tokens(settings.CHUNK_TOKENS, embedding_model.max_seq_length),
+                        overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+                        min_tokens=settings.CHUNK_MIN_TOKENS
+                    ))
             
-            # Text in Absätze aufteilen
-            paragraphs = text.split('\n\n')
-            for i, paragraph in enumerate(paragraphs):
-                if paragraph.strip():
-                    text_chunks.append({
-                        "text": paragraph,
-                        "metadata": {
-                            "source_id": source_id,
-                            "source_title": source.title,
-                            "source_type": source.source_type,
-                            "paragraph": i + 1
-                        }
-                    })
-        elif file_extension in ['.csv', '.xlsx', '.xls']:
-            # Tabellendokument verarbeiten
-            if file_extension == '.csv':
-                df = pd.read_csv(local_path)
-            else:
-                df = pd.read_excel(local_path)
+                new_chunks, refs, retained = _deduplicate_chunks(source_id, text_chunks)
             
-            # Für jede Zeile einen Chunk erstellen
-            for i, row in df.iterrows():
-                row_text = " | ".join([f"{col}: {val}" for col, val in row.items()])
-                text_chunks.append({
-                    "text": row_text,
-                    "metadata": {
-                        "source_id": source_id,
-                        "source_title": source.title,
-                        "source_type": source.source_type,
-                        "row": i + 1
-                    }
-                })
+                # Embeddings gebündelt erzeugen und zum Index hinzufügen (nur neue Inhalte)
+                num_chunks, num_new = len(text_chunks), await add_texts_to_index(new_chunks)
+        
+            stale_refs = old_ref_ids - set(refs)
+            chunk_store.add_refs((chunk_id, source_id, metadata) for chunk_id, metadata in refs.items())
+            chunk_store.update_metadata(retained)
+            chunk_store.remove_refs(source_id, stale_refs)
+            chunk_store.set_file(file_hash, source_id)
+            filter_index.add_refs(source_id, refs)
+            filter_index.remove_refs(source_id, stale_refs)
+            if refs or stale_refs:
+                _mark_index_changed()
+        
+            # Veraltete Vektoren der Quelle ersetzen (unverändert gebliebene Chunks behalten)
+            stale_ids = [chunk_id for chunk_id in old_ids if chunk_id not in retained]
+            if stale_ids:
+                await _remove_owned_chunks(stale_ids)
+        
+            # Dokument als indiziert markieren
+            source.indexed = True
+            source.index_date = datetime.utcnow()
+            db_session.commit()
+        
+            logger.info(
+                f"Dokument {source.title} erfolgreich indiziert: {num_chunks} Chunks "
+                f"({num_new} neu eingebettet, {len(refs)} referenziert, {len(retained)} unverändert)"
+            )
+        except Exception as e:
+            logger.error(f"Fehler beim Verarbeiten des Dokuments {source.title}: {str(e)}")
+            raise
+
+async def _index_table(
+    source_id: int,
+    local_path: str,
+    base_metadata: Dict[str, Any],
+    owned_ids: set
+) -> Tuple[int, int, Dict[int, Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Liest eine CSV- oder Excel-Datei abschnittsweise und bettet jeden Abschnitt sofort ein
+    
+    Es liegt immer nur ein Abschnitt (settings.TABLE_READ_ROWS Zeilen) im
+    Speicher. Das Lesen läuft in einem Thread, damit der Event-Loop frei bleibt.
+    
+    Args:
+        source_id: ID der Quelle
+        local_path: Pfad zur Datei
+        base_metadata: Metadaten, die jeder Chunk erhält
+        owned_ids: Vektor-IDs, die der Quelle vor der Indizierung gehörten
+        
+    Returns:
+        Tupel aus (Anzahl Chunks, Anzahl neu eingebetteter Chunks, Referenzen,
+        unveränderte eigene Chunks) wie bei _deduplicate_chunks
+    """
+    loop = asyncio.get_event_loop()
+    batches = iter_table_chunks(local_path, base_metadata, settings.TABLE_READ_ROWS, settings.TABLE_ROWS_PER_CHUNK)
+    num_chunks, num_new, refs, retained = 0, 0, {}, {}
+    
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, next, batches, None)
+            if batch is None:
+                break
+            new_chunks, batch_refs, batch_retained = _deduplicate_chunks(source_id, batch)
+            num_new += await add_texts_to_index(new_chunks)
+            num_chunks += len(batch)
+            refs.update(batch_refs)
+            # Wiederholungen von Zeilen früherer Abschnitte behalten ihre ersten Metadaten
+            retained.update((chunk_id, metadata) for chunk_id, metadata in batch_retained.items() if chunk_id in owned_ids)
+    finally:
+        batches.close()
+    
+    return num_chunks, num_new, refs, retained
+
+async def process_documents(source_ids: List[int], db_session, force: bool = False) -> Dict[int, Optional[str]]:
+    """
+    Verarbeitet mehrere Dokumente, deren Extraktion parallel im Prozesspool läuft
+    
+    Sobald ein Dokument extrahiert ist, wird es eingebettet und indiziert,
+    während die übrigen Dokumente noch extrahiert werden.
+    
+    Args:
+        source_ids: IDs der Dokumente in der Datenbank
+        db_session: Datenbankverbindung
+        force: Auch bereits indizierte Dokumente neu verarbeiten
+        
+    Returns:
+        Fehlermeldung je Dokument (None bei Erfolg)
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.EXTRACTION_WORKERS))
+    
+    async def run(source_id: int) -> Optional[str]:
+        async with semaphore:
+            try:
+                await process_document(source_id, db_session, force=force)
+                return None
+            except Exception as e:
+                return str(e)
+    
+    results = await asyncio.gather(*(run(source_id) for source_id in source_ids))
+    return dict(zip(source_ids, results))
+
+def _shard_for_source(source: MedicalSource) -> str:
+    """
+    Bestimmt den Shard einer Quelle gemäß SHARD_BY
+
+    "directory" verwendet den Namen des Verzeichnisses der Datei, z.B. die
+    Fachgesellschaft bei data/sources/leitlinien_awmf/<fachgesellschaft>/...
+    """
+    if settings.SHARD_BY == "source_type":
+        return shard_key(source.source_type)
+    if settings.SHARD_BY == "publisher":
+        return shard_key(source.publisher)
+    if settings.SHARD_BY == "directory":
+        return shard_key(Path(source.local_path).parent.name)
+    return DEFAULT_SHARD
+
+async def reindex_source(source_id: int, db_session):
+    """
+    Indiziert eine Quelle neu und ersetzt ihre Vektoren, ohne den übrigen Index neu aufzubauen
+    
+    Args:
+        source_id: ID des Dokuments in der Datenbank
+        db_session: Datenbankverbindung
+    """
+    await process_document(source_id, db_session, force=True)
+
+async def remove_source_vectors(source_id: int) -> int:
+    """
+    Entfernt alle Vektoren und Chunks einer Quelle aus dem Index
+    
+    Args:
+        source_id: ID des Dokuments in der Datenbank
+        
+    Returns:
+        Anzahl der entfernten Vektoren
+    """
+    async with _vector_db_writer():
+        ref_ids = chunk_store.ref_ids_for_source(source_id)
+        chunk_store.remove_refs(source_id)
+        chunk_store.remove_files(source_id)
+        
+        ids = chunk_store.ids_for_source(source_id)
+        removed = await _remove_owned_chunks(ids) if ids else 0
+        if ids:
+            logger.info(f"{removed} Vektoren der Quelle {source_id} entfernt, {len(ids) - removed} an andere Quellen übergeben")
+        filter_index.remove_source(source_id)
+        
+        # Nur referenzierte oder übergebene Chunks ändern keine Vektoren, wohl aber Filter und Quellenangaben
+        if ref_ids or len(ids) > removed:
+            _mark_index_changed()
+    return removed
+
+async def _remove_owned_chunks(ids: List[int]) -> int:
+    """
+    Entfernt Chunks einer Quelle; von anderen Quellen referenzierte Chunks
+    gehen stattdessen an eine dieser Quellen über
+    
+    Returns:
+        Anzahl der tatsächlich entfernten Vektoren
+    """
+    transferred = chunk_store.transfer_referenced(ids)
+    if transferred:
+        def reassign():
+            with index_snapshot.publishing():
+                filter_index.assign([chunk_id for chunk_id, _ in transferred], [owner for _, owner in transferred])
+                for chunk_id, owner in transferred:
+                    filter_index.remove_refs(owner, [chunk_id])
+        
+        loop = asyncio.get_event_loop()
+        async with _vector_db_writer(), index_write_lock:
+            await loop.run_in_executor(None, reassign)
+    
+    kept = {chunk_id for chunk_id, _ in transferred}
+    remaining = [chunk_id for chunk_id in ids if chunk_id not in kept]
+    if remaining:
+        await remove_vectors(remaining)
+    return len(remaining)
+
+def _deduplicate_chunks(
+    source_id: int,
+    chunks: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], Dict[int, Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Teilt die Chunks einer Quelle anhand ihres Inhalts-Hashes auf
+    
+    Returns:
+        Tupel aus (neu einzubettende Chunks, Referenzen auf Chunks anderer
+        Quellen, unveränderte eigene Chunks), Referenzen und eigene Chunks als
+        Vektor-ID -> neue Metadaten. Wiederholungen innerhalb der Quelle
+        werden nur einmal übernommen.
+    """
+    hashes = [content_hash(chunk["text"]) for chunk in chunks]
+    existing = chunk_store.find_hashes(hashes)
+    
+    new_chunks, refs, retained = [], {}, {}
+    seen = set()
+    for chunk, digest in zip(chunks, hashes):
+        if digest in seen or not chunk["text"].strip():
+            continue
+        seen.add(digest)
+        
+        if digest not in existing:
+            new_chunks.append(chunk)
+            continue
+        chunk_id, owner = existing[digest]
+        if owner == source_id:
+            retained[chunk_id] = chunk["metadata"]
         else:
-            logger.warning(f"Nicht unterstütztes Dateiformat: {file_extension}")
-            return
+            refs[chunk_id] = chunk["metadata"]
+    
+    dedup_stats["chunks"] += len(chunks) - len(new_chunks)
+    return new_chunks, refs, retained
+
+async def remove_vectors(ids: List[int]):
+    """
+    Entfernt Vektoren über das Log abgesichert aus Index und Chunk-Speicher
+    
+    Log, Neuaufbau betroffener HNSW-Shards und Lesen der Texte (für den
+    BM25-Index) laufen vor, das Löschen der Chunks nach der Veröffentlichung,
+    damit laufende Suchen zu jedem gefundenen Vektor noch den Chunk lesen.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    loop = asyncio.get_event_loop()
+
+    def remove():
+        vector_log.append("remove", ids)
+        replacements = vector_index.prepare_remove(ids)
+        docs = chunk_store.get_many(ids.tolist())
+        with index_snapshot.publishing():
+            vector_index.remove(ids, replacements)
+            lexical_index.remove_many(docs.keys(), [doc["text"] for doc in docs.values()])
+            filter_index.unassign(ids)
+        chunk_store.delete_many(ids.tolist())
+
+    async with _vector_db_writer(), index_write_lock:
+        await loop.run_in_executor(None, remove)
+        _mark_index_changed()
+    
+    await compact_index_if_needed()
+
+async def add_texts_to_index(
+    chunks: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    save: bool = True
+) -> int:
+    """
+    Fügt mehrere Textabschnitte gebündelt zum Vektorindex hinzu
+    
+    Pro Batch wird ein einziger Forward-Pass des Embedding-Modells und ein
+    einziger Aufruf von vector_index.add ausgeführt.
+    
+    Args:
+        chunks: Liste von Dicts mit "text" und "metadata"
+        batch_size: Anzahl der Chunks pro Batch (Standard: settings.EMBEDDING_BATCH_SIZE)
+        save: Nach dem Hinzufügen einen Snapshot schreiben, falls das Log groß genug ist
         
-        # Embeddings für jeden Chunk erzeugen und zum Index hinzufügen
-        for chunk in text_chunks:
-            await add_text_to_index(chunk["text"], chunk["metadata"])
+    Returns:
+        Anzahl der hinzugefügten Chunks
+    """
+    chunks = [chunk for chunk in chunks if chunk["text"].strip()]
+    if not chunks:
+        return 0
+    
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    loop = asyncio.get_event_loop()
+    
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        texts = [chunk["text"] for chunk in batch]
         
-        # Dokument als indiziert markieren
-        source.indexed = True
-        source.index_date = datetime.utcnow()
-        db_session.commit()
+        # Embeddings für den gesamten Batch erzeugen (bereits bekannte aus dem Cache)
+        embeddings = await loop.run_in_executor(None, _encode_texts, texts)
         
-        logger.info(f"Dokument {source.title} erfolgreich indiziert: {len(text_chunks)} Chunks")
-    except Exception as e:
-        logger.error(f"Fehler beim Verarbeiten des Dokuments {source.title}: {str(e)}")
-        raise
+        # Batch über das Log abgesichert zum Index hinzufügen
+        async with _vector_db_writer(), index_write_lock:
+            await _append_vectors(np.asarray(embeddings, dtype=np.float32), batch)
+    
+    if save:
+        await compact_index_if_needed()
+    
+    return len(chunks)
+
+def _encode_texts(texts: List[str]) -> np.ndarray:
+    """
+    Erzeugt die Embeddings mehrerer Texte in einem Forward-Pass
+
+    Texte, deren Embedding für das aktuelle Modell bereits im Embedding-Cache
+    liegt, werden nicht erneut eingebettet; neu berechnete Embeddings werden
+    im Cache abgelegt.
+
+    Returns:
+        Matrix der unveränderten Modellausgaben (n x d, float32)
+    """
+    if embedding_cache is None:
+        return np.asarray(embedding_model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+    cached = embedding_cache.get_many(embedding_model.name, texts)
+    missing = [position for position, embedding in enumerate(cached) if embedding is None]
+    if missing:
+        missing_texts = [texts[position] for position in missing]
+        encoded = np.asarray(embedding_model.encode(missing_texts, batch_size=len(missing_texts)), dtype=np.float32)
+        embedding_cache.set_many(embedding_model.name, missing_texts, encoded)
+        for position, embedding in zip(missing, encoded):
+            cached[position] = embedding
+    return np.stack(cached)
+
+def _cached_vectors(ids: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Liest die unquantisierten Embeddings zu Vektor-IDs aus dem Embedding-Cache
+
+    Returns:
+        Matrix der Embeddings in der Reihenfolge der IDs oder None, falls der
+        Cache deaktiviert ist oder nicht alle Embeddings enthält
+    """
+    if embedding_cache is None or len(ids) == 0:
+        return None
+
+    docs = chunk_store.get_many(ids.tolist())
+    if len(docs) < len(ids):
+        return None
+    embeddings = embedding_cache.get_many(embedding_model.name, [docs[int(chunk_id)]["text"] for chunk_id in ids])
+    missing = sum(embedding is None for embedding in embeddings)
+    if missing:
+        logger.info(f"Embedding-Cache unvollständig ({missing} von {len(ids)} fehlen), verwende rekonstruierte Vektoren")
+        return None
+    return np.stack(embeddings)
+
+async def _append_vectors(embeddings: np.ndarray, chunks: List[Dict[str, Any]]):
+    """
+    Schreibt einen Batch ins Log und in den Chunk-Speicher und veröffentlicht
+    ihn dann in Vektor-, BM25- und Filter-Index (ein Aufruf je Shard)
+
+    Alles läuft in einem Executor-Thread, nicht im Event-Loop. Der Aufrufer
+    hält index_write_lock.
+    """
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(None, _write_vectors, embeddings, chunks)
+    # Auch ein Batch, der nur Referenzen ergibt, ändert die Treffer gefilterter Suchen
+    _mark_index_changed()
+
+def _write_vectors(embeddings: np.ndarray, chunks: List[Dict[str, Any]]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    """
+    Persistiert und veröffentlicht einen Batch (läuft im Executor, siehe _append_vectors)
+
+    Returns:
+        Tupel aus (vergebene Vektor-IDs, tatsächlich eingefügte Chunks)
+    """
+    global next_vector_id
+
+    # Inhalte, die seit der Prüfung in _deduplicate_chunks von einer parallel
+    # indizierten Quelle eingefügt wurden, nur referenzieren
+    existing = chunk_store.find_hashes(content_hash(chunk["text"]) for chunk in chunks)
+    if existing:
+        keep = []
+        for position, chunk in enumerate(chunks):
+            source_id = chunk["metadata"].get("source_id")
+            match = existing.get(content_hash(chunk["text"]))
+            if source_id is not None and match is not None and match[1] != source_id:
+                chunk_store.add_refs([(match[0], source_id, chunk["metadata"])])
+                filter_index.add_refs(source_id, [match[0]])
+                dedup_stats["chunks"] += 1
+            else:
+                keep.append(position)
+        embeddings, chunks = embeddings[keep], [chunks[position] for position in keep]
+        if not chunks:
+            return np.zeros(0, dtype=np.int64), []
+
+    ids = np.arange(next_vector_id, next_vector_id + len(chunks), dtype=np.int64)
+    next_vector_id += len(chunks)
+    embeddings = prepare_vectors(embeddings, index_params)
+
+    # Reihenfolge: Log, Chunk-Speicher, Index. Fehlen nach einem Absturz die
+    # Chunks, verwirft _replay_vector_log die zugehörigen Vektoren; Suchen
+    # finden zu jedem veröffentlichten Vektor bereits seinen Chunk.
+    shards = np.array([shard_key(chunk["metadata"].get("shard")) for chunk in chunks])
+    for key in dict.fromkeys(shards):
+        mask = shards == key
+        vector_log.append("add", ids[mask], embeddings[mask], shard=None if key == DEFAULT_SHARD else key)
+    chunk_store.add_many(
+        (int(chunk_id), chunk["text"], chunk["metadata"])
+        for chunk_id, chunk in zip(ids, chunks)
+    )
+    
+    with index_snapshot.publishing():
+        for key in dict.fromkeys(shards):
+            mask = shards == key
+            vector_index.add(key, embeddings[mask], ids[mask])
+        lexical_index.add_many((int(chunk_id), chunk["text"]) for chunk_id, chunk in zip(ids, chunks))
+        filter_index.assign(ids, [chunk["metadata"].get("source_id") for chunk in chunks])
+    return ids, chunks
 
 async def add_text_to_index(text: str, metadata: Dict[str, Any]):
     """
@@ -203,8 +1152,6 @@ async def add_text_to_index(text: str, metadata: Dict[str, Any]):
         text: Der zu indizierende Text
         metadata: Metadaten zum Text (Quelle, Seitenzahl, etc.)
     """
-    global embedding_model, vector_index, document_lookup
-    
     if not text.strip():
         return
     
@@ -213,96 +1160,312 @@ async def add_text_to_index(text: str, metadata: Dict[str, Any]):
         loop = asyncio.get_event_loop()
         embedding = await loop.run_in_executor(
             None,
-            lambda: embedding_model.encode([text])[0]
+            lambda: _encode_texts([text])[0]
         )
     except Exception as e:
         logger.error(f"Fehler beim Erzeugen des Embeddings: {str(e)}")
         return
     
-    # Zum Index hinzufügen
-    vector_index.add(np.array([embedding], dtype=np.float32))
+    # Zum Index hinzufügen (über das Log abgesichert)
+    async with _vector_db_writer(), index_write_lock:
+        await _append_vectors(np.array([embedding], dtype=np.float32), [{"text": text, "metadata": metadata}])
     
-    # Dokument-ID ist der Index des hinzugefügten Vektors
-    doc_id = vector_index.ntotal - 1
+    await compact_index_if_needed()
+
+def _mark_index_changed(params: Optional[Dict[str, Any]] = None, changes: int = 1):
+    """
+    Erhöht die Indexversion, damit zwischengespeicherte Antworten nicht mehr treffen
     
-    # Metadaten speichern
-    document_lookup[str(doc_id)] = {
-        "text": text,
-        "metadata": metadata
-    }
+    Die Version wird mit dem Snapshot gespeichert; nach einem Absturz ergibt
+    die Wiedergabe des Logs mindestens dieselbe Version.
     
-    # Index und Lookup speichern
-    if doc_id % 100 == 0:  # Regelmäßig speichern, um Datenverlust zu vermeiden
+    Args:
+        params: Indexparameter (Standard: die des aktuellen Index)
+        changes: Anzahl der Änderungen, um die die Version erhöht wird
+    """
+    params = index_params if params is None else params
+    params["version"] = params.get("version", 0) + changes
+
+async def compact_index_if_needed():
+    """Schreibt einen neuen Snapshot, sobald das Log WAL_COMPACT_BYTES überschreitet"""
+    if vector_log.size() >= settings.WAL_COMPACT_BYTES:
         await save_index()
 
 async def save_index():
-    """Speichert den Vektorindex und das Dokument-Lookup"""
+    """
+    Schreibt einen Snapshot des Vektorindex und leert anschließend das Log
+    
+    Shards und Parameter werden über temporäre Dateien und atomares Umbenennen
+    ersetzt, sodass ein Absturz während des Schreibens den letzten Snapshot nicht
+    beschädigt. Das Schreiben läuft in einem Executor-Thread, nicht im Event-Loop.
+    (Chunks werden direkt im Chunk-Speicher abgelegt.)
+    """
     vector_db_path = Path(settings.VECTOR_DB_PATH)
-    index_file = vector_db_path / "faiss_index.bin"
-    lookup_file = vector_db_path / "document_lookup.json"
+    params_file = vector_db_path / "index_config.json"
+    lexical_file = vector_db_path / "bm25_index.pkl"
+    
+    def write_snapshot():
+        # Nur geänderte Shards schreiben; die Parameter enthalten die Indexversion
+        vector_index.save()
+        save_index_params(params_file, index_params)
+        lexical_index.save(lexical_file)
+        vector_log.reset()
     
     try:
-        # Index speichern
-        faiss.write_index(vector_index, str(index_file))
-        
-        # Lookup speichern
-        with open(lookup_file, 'w', encoding='utf-8') as f:
-            json.dump(document_lookup, f)
+        async with _vector_db_writer(), index_write_lock:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, write_snapshot)
             
         logger.info(f"Vektorindex gespeichert: {vector_index.ntotal} Dokumente")
     except Exception as e:
         logger.error(f"Fehler beim Speichern des Vektorindex: {str(e)}")
 
-async def semantic_search(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+async def embed_query(query: str) -> np.ndarray:
+    """
+    Erzeugt das Embedding einer Suchanfrage
+    
+    Wiederholte Anfragen werden aus dem Query-Embedding-Cache bedient und
+    sparen so den Forward-Pass des Embedding-Modells. Gleichzeitige Anfragen
+    werden vom Embedding-Batcher zu einem Forward-Pass gebündelt.
+    """
+    normalized = normalize_query(query)
+    key = (embedding_model.name, normalized)
+    
+    embedding = query_embedding_cache.get(key)
+    if embedding is None:
+        embedding = await embedding_batcher.encode(normalized)
+        query_embedding_cache.set(key, embedding)
+    
+    return embedding
+
+async def embed_queries(queries: List[str]) -> np.ndarray:
+    """
+    Erzeugt die Embeddings mehrerer Suchanfragen
+    
+    Anfragen, die nicht im Query-Embedding-Cache liegen, werden gemeinsam
+    (über den Embedding-Batcher) eingebettet.
+    
+    Returns:
+        Matrix mit einem Embedding pro Anfrage
+    """
+    normalized = [normalize_query(query) for query in queries]
+    keys = [(embedding_model.name, text) for text in normalized]
+    embeddings = [query_embedding_cache.get(key) for key in keys]
+    
+    missing = sorted({text for text, embedding in zip(normalized, embeddings) if embedding is None})
+    if missing:
+        encoded = await embedding_batcher.encode_many(missing)
+        computed = dict(zip(missing, encoded))
+        for text, embedding in computed.items():
+            query_embedding_cache.set((embedding_model.name, text), embedding)
+        embeddings = [
+            computed[text] if embedding is None else embedding
+            for text, embedding in zip(normalized, embeddings)
+        ]
+    
+    return np.asarray(embeddings, dtype=np.float32)
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Kennzahlen der RAG-Caches"""
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "answers": answer_cache.stats() if answer_cache is not None else None,
+        "embeddings": embedding_cache.stats() if embedding_cache is not None else None,
+        "embedding_batcher": embedding_batcher.stats() if embedding_batcher is not None else None,
+        "index_snapshot": index_snapshot.stats() if index_snapshot is not None else None,
+        "extraction": document_extractor.stats() if document_extractor is not None else None,
+        "deduplication": dict(dedup_stats, **chunk_store.dedup_stats()) if chunk_store is not None else None
+    }
+
+async def semantic_search(
+    query: str,
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
     """
     Führt eine semantische Suche durch
     
+    Bei aktivierter Hybridsuche werden Vektorsuche und BM25-Suche parallel
+    ausgeführt und per Reciprocal Rank Fusion zusammengeführt. So werden auch
+    exakte Fachbegriffe, Wirkstoffnamen und AWMF-Registernummern gefunden.
+    
+    Filter werden vor der Suche in eine Bitmap erlaubter Vektor-IDs übersetzt
+    und direkt an FAISS bzw. den BM25-Index übergeben, statt Treffer im
+    Nachhinein auszusortieren.
+    
     Args:
         query: Suchanfrage
         top_k: Anzahl der zurückzugebenden Ergebnisse
+        filters: Optionale Filter (source_types, source_ids, publishers,
+            published_from, published_to)
         
     Returns:
         Liste der relevantesten Dokumente mit Metadaten
     """
-    global embedding_model, vector_index, document_lookup
+    return (await semantic_search_many([query], top_k, filters))[0]
+
+async def semantic_search_many(
+    queries: List[str],
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Führt die semantische Suche für mehrere Anfragen gebündelt durch
     
-    if vector_index.ntotal == 0:
-        logger.warning("Vektorindex ist leer")
+    Alle Anfragen werden in einem Forward-Pass eingebettet und mit einem
+    einzigen FAISS-Aufruf über die gesamte Anfragematrix gesucht. Texte und
+    Metadaten aller Treffer werden mit einer Abfrage aus dem Chunk-Speicher gelesen.
+    
+    Args:
+        queries: Suchanfragen
+        top_k: Anzahl der zurückzugebenden Ergebnisse je Anfrage
+        filters: Optionale Filter, gelten für alle Anfragen (siehe semantic_search)
+        
+    Returns:
+        Je Anfrage eine Liste der relevantesten Dokumente mit Metadaten
+        
+    Raises:
+        ValueError: Bei ungültigen Filtern
+    """
+    if not queries:
         return []
     
+    # Ungültige Filter nicht als leeres Ergebnis verschlucken (ValueError für den Aufrufer)
+    filters = normalize_filters(filters)
+    
+    # Für die gesamte Suche dieselben Strukturen verwenden, auch wenn währenddessen neu geladen wird
+    snapshot = index_snapshot
+    if snapshot.index.ntotal == 0:
+        logger.warning("Vektorindex ist leer")
+        return [[] for _ in queries]
+    
     try:
-        # Embedding für die Anfrage erzeugen
+        # Embeddings für alle Anfragen erzeugen (oder aus dem Cache lesen)
+        query_embeddings = await embed_queries(queries)
+        
         loop = asyncio.get_event_loop()
-        query_embedding = await loop.run_in_executor(
-            None,
-            lambda: embedding_model.encode([query])[0]
-        )
+        return await loop.run_in_executor(None, _retrieve_many, snapshot, queries, query_embeddings, top_k, filters)
+    except Exception as e:
+        logger.error(f"Fehler bei der semantischen Suche: {str(e)}")
+        return [[] for _ in queries]
+
+def _retrieve_many(
+    snapshot: IndexSnapshot,
+    queries: List[str],
+    query_embeddings: np.ndarray,
+    top_k: int,
+    filters: Optional[Dict[str, Any]] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Vektor- und BM25-Suche, Fusion und Lesen der Treffer (läuft im Executor)
+    
+    Alle Schritte laufen unter snapshot.reading() und sehen damit denselben
+    Stand, auch wenn gleichzeitig indiziert oder entfernt wird.
+    
+    Args:
+        snapshot: Gehaltener Snapshot der Suchstrukturen
+        queries: Suchanfragen (für die BM25-Suche)
+        query_embeddings: Embeddings der Anfragen
+        top_k: Anzahl der Ergebnisse je Anfrage
+        filters: Normalisierte Filter (siehe normalize_filters)
+    
+    Returns:
+        Je Anfrage eine Liste der relevantesten Dokumente mit Metadaten
+    """
+    with snapshot.reading():
+        # Filter in eine Bitmap erlaubter Vektor-IDs übersetzen
+        id_filter = snapshot.filters.resolve(filters)
+        if id_filter is not None and id_filter.count == 0:
+            return [[] for _ in queries]
         
-        # Ähnlichkeitssuche durchführen
-        D, I = vector_index.search(np.array([query_embedding], dtype=np.float32), top_k)
+        if not settings.HYBRID_SEARCH:
+            # Reine Ähnlichkeitssuche
+            rankings = _dense_search_many(snapshot, query_embeddings, top_k, id_filter)
+        else:
+            # BM25-Suche parallel zur Vektorsuche (FAISS gibt den GIL frei)
+            candidates = max(top_k, settings.HYBRID_CANDIDATES)
+            lexical_future = lexical_search_executor.submit(
+                lambda: [snapshot.lexical.search(query, candidates, id_filter) for query in queries]
+            )
+            dense = _dense_search_many(snapshot, query_embeddings, candidates, id_filter)
+            lexical = lexical_future.result()
+            
+            # Auf 0-1 normieren (1 = Platz 1 in beiden Trefferlisten)
+            max_score = (settings.HYBRID_DENSE_WEIGHT + settings.HYBRID_LEXICAL_WEIGHT) / (settings.RRF_K + 1)
+            rankings = []
+            for dense_hits, lexical_hits in zip(dense, lexical):
+                fused = reciprocal_rank_fusion(
+                    [[doc_id for doc_id, _ in dense_hits], [doc_id for doc_id, _ in lexical_hits]],
+                    [settings.HYBRID_DENSE_WEIGHT, settings.HYBRID_LEXICAL_WEIGHT],
+                    settings.RRF_K
+                )
+                rankings.append([(doc_id, score / max_score) for doc_id, score in fused[:top_k]])
         
-        # Ergebnisse zusammenstellen
+        # Nur die Texte der gefundenen Treffer lesen
+        docs = snapshot.chunks.get_many({doc_id for ranked in rankings for doc_id, _ in ranked})
+    
+    # Ergebnisse zusammenstellen
+    all_results = []
+    for ranked in rankings:
         results = []
-        for i, (distance, idx) in enumerate(zip(D[0], I[0])):
-            if idx != -1:  # -1 bedeutet, kein Ergebnis gefunden
-                doc_id = str(idx)
-                if doc_id in document_lookup:
-                    doc = document_lookup[doc_id]
-                    results.append({
-                        "text": doc["text"],
-                        "metadata": doc["metadata"],
-                        "score": float(1.0 / (1.0 + distance))  # Ähnlichkeitsscore (0-1)
-                    })
-        
-        return results
-    except Exception as e:
-        logger.error(f"Fehler bei der semantischen Suche: {str(e)}")
-        return []
+        for doc_id, score in ranked:
+            doc = docs.get(doc_id)
+            if doc:
+                results.append({
+                    "id": doc_id,
+                    "text": doc["text"],
+                    "metadata": doc["metadata"],
+                    "references": doc["references"],  # Weitere Quellen mit identischem Inhalt
+                    "score": score  # Ähnlichkeitsscore (0-1)
+                })
+        all_results.append(results)
+    
+    return all_results
+
+def _dense_search_many(
+    snapshot: IndexSnapshot,
+    query_embeddings: np.ndarray,
+    top_k: int,
+    id_filter: Optional[IdFilter] = None
+) -> List[List[Tuple[int, float]]]:
+    """
+    Ähnlichkeitssuche im Vektorindex, liefert je Anfrage (Vektor-ID, Score) in Rangfolge
+    
+    Alle Anfragen werden mit einem Aufruf über die Anfragematrix gesucht.
+    Mit Filter wird die Bitmap als ID-Selektor an FAISS übergeben (siehe
+    filtered_search). Kleine
+    Teilmengen (bis FILTER_EXACT_MAX Vektoren) werden exakt durchsucht, da
+    IVF- und HNSW-Indizes bei sehr selektiven Filtern Treffer verfehlen.
+    """
+    index, params = snapshot.index, snapshot.params
+    queries = prepare_vectors(query_embeddings, params)
+    
+    if id_filter is None:
+        D, I = index.search(queries, top_k)
+    elif id_filter.count <= settings.FILTER_EXACT_MAX:
+        ids = id_filter.ids()
+        ids = ids[index.contains(ids, loaded_only=True)]  # Vektoren entladener Shards auslassen
+        D, I = exact_search(index.reconstruct_batch(ids), ids, queries, top_k, params)
+    else:
+        D, I = index.search(queries, top_k, id_filter)
+    
+    # Treffer unterhalb von DENSE_MIN_SCORE verwerfen (sinnvoll vor allem bei Kosinus-Scores)
+    scores = distances_to_scores(D, params)
+    return [
+        [
+            (int(idx), float(score))
+            for score, idx in zip(scores_row, ids_row)
+            if idx != -1 and score >= settings.DENSE_MIN_SCORE  # -1 bedeutet, kein Ergebnis gefunden
+        ]
+        for scores_row, ids_row in zip(scores, I)
+    ]
 
 async def generate_rag_response(
     query: str,
     patient_info: Optional[Dict[str, Any]] = None,
-    temperature: float = 0.1
+    temperature: float = 0.1,
+    rerank_budget_ms: Optional[float] = None,
+    filters: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Generiert eine RAG-basierte Antwort
@@ -311,45 +1474,109 @@ async def generate_rag_response(
         query: Die Anfrage des Benutzers
         patient_info: Optionale strukturierte Patienteninformationen
         temperature: Kreativität der Antwort
+        rerank_budget_ms: Zeitbudget für das Reranking (Standard: settings.RERANK_BUDGET_MS)
+        filters: Optionale Filter für die Suche (siehe semantic_search)
         
     Returns:
         Dict mit der generierten Antwort und Quellen
     """
-    from app.llm.service import generate_llm_response
+    from app.llm.service import count_tokens, generate_llm_response, get_context_size
+    
+    # Antwort auf eine identische (bzw. nahezu identische) Anfrage aus dem Cache liefern
+    filters = normalize_filters(filters)
+    query_embedding = await embed_query(query)
+    context_key = _answer_context_key(temperature, patient_info, filters)
+    cached = answer_cache.lookup(query, query_embedding, context_key)
+    if cached is not None:
+        logger.info("Antwort aus dem Antwort-Cache geliefert")
+        return dict(cached, tokens_used=0, cached=True)
     
     # Semantische Suche durchführen
-    relevant_docs = await semantic_search(query, top_k=7)
+    if reranker_model is not None:
+        # Größeren Kandidatenpool abrufen und mit dem Cross-Encoder neu sortieren
+        candidates = await semantic_search(query, top_k=settings.RERANK_CANDIDATES, filters=filters)
+        budget_ms = rerank_budget_ms if rerank_budget_ms is not None else settings.RERANK_BUDGET_MS
+        loop = asyncio.get_event_loop()
+        relevant_docs = await loop.run_in_executor(
+            None,
+            partial(
+                rerank, reranker_model, query, candidates, settings.RERANK_TOP_N,
+                batch_size=settings.RERANK_BATCH_SIZE, budget_seconds=budget_ms / 1000.0
+            )
+        )
+    else:
+        relevant_docs = await semantic_search(query, top_k=7, filters=filters)
     
     if not relevant_docs:
         logger.warning("Keine relevanten Dokumente gefunden für die Anfrage")
     
-    # Kontext aus den relevanten Dokumenten erstellen
-    context = ""
-    sources = []
+    # Token-Budget für den Kontext: Kontextfenster abzüglich Prompt ohne Kontext und Antwort
+    max_answer_tokens = settings.RAG_MAX_ANSWER_TOKENS
+    prompt_tokens = count_tokens(create_rag_prompt(query, "", patient_info))
+    budget = get_context_size() - prompt_tokens - max_answer_tokens - settings.CONTEXT_SAFETY_TOKENS
+    if budget < 0:
+        # Sehr lange Anfrage: Antwortlänge kürzen, damit der Prompt ins Kontextfenster passt
+        max_answer_tokens = max(1, max_answer_tokens + budget)
+        budget = 0
+    
+    # Kontext aus den relevanten Dokumenten erstellen (ohne nahezu identische Passagen)
+    packed = pack_context(
+        relevant_docs,
+        count_tokens,
+        budget,
+        query_embedding=query_embedding,
+        doc_embeddings=_stored_embeddings(relevant_docs),
+        lambda_mult=settings.CONTEXT_MMR_LAMBDA,
+        duplicate_threshold=settings.CONTEXT_DUPLICATE_THRESHOLD
+    )
     
-    for doc in relevant_docs:
-        context += f"Information: {doc['text']}\n\n"
-        sources.append({
-            "title": doc["metadata"].get("source_title", "Unbekannte Quelle"),
-            "type": doc["metadata"].get("source_type", "Unbekannt"),
-            "relevance": doc["score"]
-        })
+    sources = []
+    for doc in packed["docs"]:
+        # Identische Chunks weiterer Quellen ebenfalls als Quelle angeben
+        for metadata in [doc["metadata"]] + doc.get("references", []):
+            sources.append({
+                "title": metadata.get("source_title", "Unbekannte Quelle"),
+                "type": metadata.get("source_type", "Unbekannt"),
+                "relevance": doc["score"]
+            })
     
     # Prompt für LLM erstellen
-    prompt = create_rag_prompt(query, context, patient_info)
+    prompt = create_rag_prompt(query, packed["context"], patient_info)
     
     # LLM-Antwort generieren
     llm_response = await generate_llm_response(
         prompt=prompt,
         temperature=temperature,
-        max_tokens=2048
+        max_tokens=max_answer_tokens
     )
     
-    return {
+    response = {
         "answer": llm_response["text"],
         "sources": sources,
         "tokens_used": llm_response["total_tokens"]
     }
+    answer_cache.store(query, query_embedding, context_key, response)
+    
+    return response
+
+def _stored_embeddings(docs: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """Liest die Embeddings der Treffer aus dem Vektorindex, statt sie neu zu berechnen"""
+    try:
+        return vector_index.reconstruct_batch(np.array([doc["id"] for doc in docs], dtype=np.int64))
+    except Exception as e:
+        logger.warning(f"Embeddings der Treffer nicht rekonstruierbar, keine MMR-Deduplizierung: {str(e)}")
+        return None
+
+def _answer_context_key(
+    temperature: float,
+    patient_info: Optional[Dict[str, Any]],
+    filters: Optional[Dict[str, Any]] = None
+) -> str:
+    """Schlüssel aus Temperatur, Patienteninformationen, Filtern und Indexversion für den Antwort-Cache"""
+    patient_hash = hashlib.sha256(
+        json.dumps(patient_info or {}, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{temperature:.3f}:{patient_hash}:{filter_key(filters)}:{index_params.get('version', 0)}"
 
 def create_rag_prompt(
     query: str,
@@ -0,0 +1,430 @@
+# backend/app/rag/shards.py
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from app.rag.index import (
+    apply_search_params, build_index, enable_reconstruction, filtered_search, fit_params_to_data,
+    get_ids, load_index_params, prepare_vectors, reconstruct_all, remove_ids, save_index_params,
+    write_index_atomic
+)
+from app.rag.filters import IdFilter
+from app.rag.snapshot import ReadWriteLock
+
+logger = logging.getLogger(__name__)
+
+# Shard für Vektoren ohne Partitionsschlüssel (und für Indizes vor Einführung der Shards)
+DEFAULT_SHARD = "default"
+
+def shard_key(value: Optional[str]) -> str:
+    """Dateinamentaugliche Form eines Partitionswerts (leer = Standard-Shard)"""
+    if not value:
+        return DEFAULT_SHARD
+    key = re.sub(r"[^a-z0-9_.-]+", "_", str(value).strip().lower()).strip("._")
+    return key or DEFAULT_SHARD
+
+def merge_search_results(
+    results: List[Tuple[np.ndarray, np.ndarray]],
+    k: int,
+    metric: str = "l2"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Führt die Suchergebnisse mehrerer Shards zu den global besten k Treffern zusammen
+
+    Args:
+        results: Je Shard (Distanzen, IDs) im Format von index.search
+        k: Anzahl der Treffer je Anfrage
+        metric: "l2" (kleiner ist besser) oder "ip" (größer ist besser)
+
+    Returns:
+        Tupel aus (Distanzen, IDs), fehlende Treffer mit ID -1
+    """
+    D = np.concatenate([distances for distances, _ in results], axis=1)
+    I = np.concatenate([ids for _, ids in results], axis=1)
+
+    if metric == "ip":
+        D = np.where(I == -1, -np.inf, D)
+        order = np.argsort(-D, axis=1, kind="stable")[:, :k]
+    else:
+        D = np.where(I == -1, np.inf, D)
+        order = np.argsort(D, axis=1, kind="stable")[:, :k]
+
+    return np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+
+class ShardedIndex:
+    """
+    Vektorindex aus mehreren FAISS-Indizes (Shards), einer je Partition
+
+    Jeder Shard hat eine eigene Datei und eigene Indexparameter und kann
+    unabhängig geladen, entladen und neu aufgebaut werden. Vektor-IDs sind
+    shardübergreifend eindeutig; eine Zuordnungstabelle (Vektor-ID -> Shard)
+    leitet Entfernen und Rekonstruktion an den richtigen Shard weiter. Suchen
+    laufen parallel über alle geladenen Shards, die Teilergebnisse werden zu
+    den global besten k Treffern zusammengeführt.
+
+    Suchen und Rekonstruktion teilen sich eine Lesesperre, Änderungen an den
+    Shards (Hinzufügen, Entfernen, Laden, Entladen) sind exklusiv. Neuaufbauten
+    (rebuild, Entfernen aus HNSW-Shards) laufen außerhalb der Schreibsperre und
+    werden nur kurz unter ihr eingetauscht. Schreiber müssen darüber hinaus vom
+    Aufrufer serialisiert werden (index_write_lock).
+
+    Der Standard-Shard liegt wie bisher in faiss_index.bin / index_config.json,
+    weitere Shards in shards/<schlüssel>.bin / shards/<schlüssel>.json.
+
+    Args:
+        directory: Verzeichnis der Vektordatenbank
+        dimension: Dimension der Embeddings
+        create_empty: Erzeugt einen leeren Index samt Parametern für neue Shards
+        search_threads: Threads für die parallele Suche über die Shards
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        dimension: int,
+        create_empty: Callable[[], Tuple[faiss.Index, Dict[str, Any]]],
+        search_threads: int = 4
+    ):
+        self.directory = Path(directory)
+        self.d = dimension
+        self.create_empty = create_empty
+        self.shards: Dict[str, faiss.Index] = {}
+        self.params: Dict[str, Dict[str, Any]] = {}
+        self.dirty = set()
+        self._shard_names: List[str] = []
+        self._owner = np.full(0, -1, dtype=np.int32)  # Vektor-ID -> Nummer in _shard_names
+        self._lock = ReadWriteLock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, search_threads), thread_name_prefix="shard-search")
+
+    def index_path(self, key: str) -> Path:
+        if key == DEFAULT_SHARD:
+            return self.directory / "faiss_index.bin"
+        return self.directory / "shards" / f"{key}.bin"
+
+    def params_path(self, key: str) -> Path:
+        if key == DEFAULT_SHARD:
+            return self.directory / "index_config.json"
+        return self.directory / "shards" / f"{key}.json"
+
+    @property
+    def ntotal(self) -> int:
+        """Anzahl der Vektoren in den geladenen Shards"""
+        return sum(index.ntotal for index in list(self.shards.values()))
+
+    def available_keys(self) -> List[str]:
+        """Schlüssel aller geladenen oder gespeicherten Shards"""
+        keys = set(self.shards)
+        if self.index_path(DEFAULT_SHARD).exists():
+            keys.add(DEFAULT_SHARD)
+        shard_dir = self.directory / "shards"
+        if shard_dir.exists():
+            keys.update(path.stem for path in shard_dir.glob("*.bin"))
+        return sorted(keys)
+
+    def _assign(self, ids: np.ndarray, key: str):
+        """Ordnet Vektor-IDs einem Shard zu"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        if key not in self._shard_names:
+            self._shard_names.append(key)
+
+        needed = int(ids.max()) + 1
+        if needed > len(self._owner):
+            grown = np.full(max(needed, 2 * len(self._owner)), -1, dtype=np.int32)
+            grown[:len(self._owner)] = self._owner
+            self._owner = grown
+        self._owner[ids] = self._shard_names.index(key)
+
+    def _owners(self, ids: np.ndarray) -> np.ndarray:
+        """Nummer des Shards je Vektor-ID (-1 = unbekannt)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = np.full(len(ids), -1, dtype=np.int32)
+        known = (ids >= 0) & (ids < len(self._owner))
+        owners[known] = self._owner[ids[known]]
+        return owners
+
+    def attach(self, key: str, index: faiss.Index, params: Dict[str, Any]):
+        """Übernimmt einen bereits geladenen Index als Shard"""
+        with self._lock.write():
+            enable_reconstruction(index)
+            apply_search_params(index, params)
+            self.shards[key] = index
+            self.params[key] = params
+            self._assign(get_ids(index), key)
+
+    def load(self, key: str, create: bool = True) -> faiss.Index:
+        """
+        Lädt einen Shard (falls nicht bereits geladen)
+
+        Args:
+            key: Shard-Schlüssel
+            create: Nicht vorhandenen Shard leer anlegen statt KeyError auszulösen
+
+        Returns:
+            Der Index des Shards
+        """
+        with self._lock.write():
+            if key in self.shards:
+                return self.shards[key]
+
+            path = self.index_path(key)
+            if path.exists():
+                index = faiss.read_index(str(path))
+                params = load_index_params(self.params_path(key))
+                logger.info(f"Shard {key} geladen ({params['index_type']}): {index.ntotal} Vektoren")
+            elif create:
+                index, params = self.create_empty()
+                self.dirty.add(key)
+                logger.info(f"Shard {key} angelegt ({params['index_type']})")
+            else:
+                raise KeyError(f"Shard nicht gefunden: {key}")
+
+            self.attach(key, index, params)
+            return index
+
+    def unload(self, key: str):
+        """
+        Speichert einen Shard bei Bedarf und gibt seinen Speicher frei
+
+        Die Zuordnung seiner Vektor-IDs bleibt erhalten; Änderungen an diesen
+        Vektoren laden den Shard automatisch nach.
+        """
+        with self._lock.write():
+            if key not in self.shards:
+                return
+            if key in self.dirty:
+                self.save_shard(key)
+            del self.shards[key]
+            del self.params[key]
+            logger.info(f"Shard {key} entladen")
+
+    def add(self, key: str, vectors: np.ndarray, ids: np.ndarray):
+        """Fügt Vektoren zu einem Shard hinzu (lädt bzw. erstellt ihn bei Bedarf)"""
+        with self._lock.write():
+            index = self.load(key)
+            index.add_with_ids(vectors, ids)
+            self._assign(ids, key)
+            self.dirty.add(key)
+
+    def prepare_remove(self, ids: np.ndarray) -> Dict[str, faiss.Index]:
+        """
+        Baut die betroffenen HNSW-Shards ohne die angegebenen Vektoren neu auf
+
+        HNSW-Graphen unterstützen kein Löschen. Die Vektoren werden unter der
+        Lesesperre gelesen, der Neuaufbau selbst läuft ohne Sperre, sodass
+        Suchen währenddessen weiterlaufen. remove() tauscht die Ersatzindizes
+        anschließend unter einer kurzen Schreibsperre ein; dazwischen dürfen
+        die Shards nicht geändert werden (index_write_lock).
+
+        Returns:
+            Ersatzindex je betroffenem HNSW-Shard
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        owners = self._owners(ids)
+        replacements = {}
+        for number in np.unique(owners[owners >= 0]):
+            key = self._shard_names[number]
+            index = self.load(key)
+            with self._lock.read():
+                params = self.params[key]
+                if params["index_type"] != "hnsw" or index.ntotal == 0:
+                    continue
+                all_ids, vectors = reconstruct_all(index)
+
+            keep = ~np.isin(all_ids, ids[owners == number])
+            logger.info(f"HNSW-Shard {key} wird ohne {int((~keep).sum())} Vektoren neu aufgebaut")
+            replacements[key] = build_index(vectors[keep], params, all_ids[keep])
+        return replacements
+
+    def remove(self, ids: np.ndarray, replacements: Optional[Dict[str, faiss.Index]] = None) -> int:
+        """
+        Entfernt Vektoren aus den Shards, denen sie zugeordnet sind
+
+        Args:
+            ids: Vektor-IDs
+            replacements: Ergebnis von prepare_remove() für dieselben IDs; fehlt
+                es, werden HNSW-Shards hier (ebenfalls außerhalb der Sperre) neu aufgebaut
+
+        Returns:
+            Anzahl der Vektoren, die einem Shard zugeordnet waren
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if replacements is None:
+            replacements = self.prepare_remove(ids)
+
+        with self._lock.write():
+            owners = self._owners(ids)
+            for number in np.unique(owners[owners >= 0]):
+                key = self._shard_names[number]
+                if key in replacements:
+                    self.shards[key] = replacements[key]
+                else:
+                    self.shards[key] = remove_ids(self.load(key), ids[owners == number], self.params[key])
+                self.dirty.add(key)
+
+            known = ids[owners >= 0]
+            self._owner[known] = -1
+            return len(known)
+
+    def contains(self, ids: np.ndarray, loaded_only: bool = False) -> np.ndarray:
+        """
+        Prüft für jede Vektor-ID, ob sie einem Shard zugeordnet ist
+
+        Args:
+            ids: Vektor-IDs
+            loaded_only: Nur Vektoren geladener Shards berücksichtigen
+        """
+        owners = self._owners(ids)
+        if not loaded_only:
+            return owners >= 0
+        loaded = [number for number, key in enumerate(self._shard_names) if key in self.shards]
+        return np.isin(owners, loaded)
+
+    def get_ids(self) -> np.ndarray:
+        """Vektor-IDs aller geladenen Shards"""
+        with self._lock.read():
+            ids = [get_ids(index) for index in self.shards.values()]
+        return np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64)
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        """Liest die Vektoren zu Vektor-IDs aus ihren Shards zurück"""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.zeros((len(ids), self.d), dtype=np.float32)
+        owners = self._owners(ids)
+        if (owners < 0).any():
+            raise KeyError(f"{int((owners < 0).sum())} Vektor-IDs keinem Shard zugeordnet")
+
+        with self._lock.read():
+            for number in np.unique(owners):
+                mask = owners == number
+                key = self._shard_names[number]
+                if key not in self.shards:
+                    raise KeyError(f"Shard nicht geladen: {key}")
+                vectors[mask] = self.shards[key].reconstruct_batch(ids[mask])
+        return vectors
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        id_filter: Optional[IdFilter] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sucht parallel in allen geladenen Shards und führt die Treffer zusammen
+
+        Args:
+            queries: Anfragematrix (n x d)
+            k: Anzahl der Treffer je Anfrage
+            id_filter: Optional nur diese Vektor-IDs berücksichtigen (gefilterte Suche)
+
+        Returns:
+            Tupel aus (Distanzen, IDs) wie bei index.search
+        """
+        with self._lock.read():
+            shards = [(key, index, self.params[key]) for key, index in self.shards.items() if index.ntotal > 0]
+            if not shards:
+                return (
+                    np.full((len(queries), k), np.inf, dtype=np.float32),
+                    np.full((len(queries), k), -1, dtype=np.int64)
+                )
+
+            def search_shard(item):
+                _, index, params = item
+                if id_filter is None:
+                    return index.search(queries, k)
+                return filtered_search(index, queries, k, params, id_filter)
+
+            if len(shards) == 1:
+                return search_shard(shards[0])
+
+            # FAISS gibt den GIL während der Suche frei, die Shards laufen daher echt parallel
+            results = list(self._executor.map(search_shard, shards))
+        return merge_search_results(results, k, shards[0][2].get("metric", "l2"))
+
+    def rebuild(
+        self,
+        key: str,
+        params: Dict[str, Any],
+        original_vectors: Optional[Callable[[np.ndarray], Optional[np.ndarray]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Baut einen Shard mit neuen Parametern aus seinen gespeicherten Vektoren neu auf
+
+        Die Parameter des Standard-Shards werden an Ort und Stelle ersetzt, da
+        sie zugleich die globalen Indexparameter sind (inklusive Version).
+
+        Args:
+            key: Shard
+            params: Neue Indexparameter
+            original_vectors: Liefert zu den IDs die unquantisierten Embeddings
+                (oder None); wird bei quantisierten Shards statt der Näherungen verwendet
+
+        Returns:
+            Die Parameter des neuen Shards
+        """
+        index = self.load(key)
+        with self._lock.read():
+            ids, vectors = reconstruct_all(index)
+
+            if self.params[key]["index_type"] == "ivf_pq" or self.params[key].get("storage", "float32") != "float32":
+                originals = original_vectors(ids) if original_vectors is not None else None
+                if originals is not None:
+                    vectors = originals
+                else:
+                    logger.warning(f"Neuaufbau von Shard {key} aus quantisierten Vektoren verwendet nur Näherungen")
+
+            new_params = fit_params_to_data(params, len(vectors))
+            vectors = prepare_vectors(vectors, new_params)  # Bei Wechsel auf "ip" normieren
+
+        new_index = build_index(vectors, new_params, ids)
+
+        with self._lock.write():
+            if key == DEFAULT_SHARD:
+                version = self.params[key].get("version", 0)
+                self.params[key].clear()
+                self.params[key].update(new_params, version=version)
+            else:
+                self.params[key] = new_params
+            self.shards[key] = new_index
+            self.dirty.add(key)
+            return self.params[key]
+
+    def save_shard(self, key: str):
+        """Schreibt einen Shard und seine Parameter atomar (Suchen laufen währenddessen weiter)"""
+        with self._lock.read():
+            path = self.index_path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_index_atomic(self.shards[key], path)
+            save_index_params(self.params_path(key), self.params[key])
+            self.dirty.discard(key)
+
+    def save(self):
+        """Schreibt alle geänderten, geladenen Shards"""
+        for key in sorted(self.dirty & set(self.shards)):
+            self.save_shard(key)
+
+    def close(self):
+        """Beendet die Such-Threads"""
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Kennzahlen je Shard"""
+        stats = []
+        for key in self.available_keys():
+            index = self.shards.get(key)
+            path = self.index_path(key)
+            stats.append({
+                "shard": key,
+                "loaded": index is not None,
+                "vectors": index.ntotal if index is not None else None,
+                "index_type": self.params[key]["index_type"] if index is not None else None,
+                "dirty": key in self.dirty,
+                "file_bytes": path.stat().st_size if path.exists() else 0
+            })
+        return stats
@@ -0,0 +1,127 @@
+# backend/app/rag/snapshot.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+class ReadWriteLock:
+    """
+    Sperre mit geteiltem Lesezugriff und exklusivem Schreibzugriff
+
+    Beliebig viele Leser können gleichzeitig arbeiten, ein Schreiber wartet,
+    bis alle Leser fertig sind. Wartende Schreiber haben Vorrang vor neuen
+    Lesern, damit sie unter Dauerlast nicht verhungern. Ein Schreiber darf
+    die Sperre erneut (lesend oder schreibend) anfordern; Leser dürfen keine
+    weitere Sperre anfordern.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            nested = self._writer == me
+            if not nested:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            if not nested:
+                with self._cond:
+                    self._readers -= 1
+                    if self._readers == 0:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+                self._writer_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    self._writer = None
+                    self._cond.notify_all()
+
+class IndexSnapshot:
+    """
+    Zusammengehörige Suchstrukturen (Vektorindex, Parameter, BM25, Filter, Chunks)
+
+    Der Snapshot bündelt nur die Referenzen, keine Kopie der Daten. Suchen
+    halten ihn für ihre gesamte Dauer, damit sie nach einem Neuladen
+    (reload_index) nicht alten Vektorindex und neuen BM25-Index mischen; ein
+    neu geladener Stand wird als neuer Snapshot veröffentlicht, laufende
+    Suchen beenden ihre Arbeit auf dem alten.
+
+    Innerhalb eines Snapshots werden Schreibvorgänge als Ganzes veröffentlicht
+    (eine Kopie der FAISS-Indizes je Änderung wäre zu teuer): Schreiber
+    erledigen die teure Arbeit (Embeddings, Log, Chunk-Speicher, Neuaufbau von
+    HNSW-Shards) vorab und wenden die Änderungen an Vektor-, BM25- und
+    Filterindex dann gemeinsam unter publishing() an. Suchen führen
+    Vektorsuche, BM25-Suche, Fusion und das Lesen der Chunks unter reading()
+    aus und sehen jeden Schreibvorgang damit ganz oder gar nicht.
+
+    Args:
+        index: Vektorindex (app.rag.shards.ShardedIndex)
+        params: Parameter des Standard-Shards (inklusive Indexversion)
+        lexical: BM25-Index (app.rag.lexical.BM25Index)
+        filters: Filter-Zuordnung (app.rag.filters.FilterIndex)
+        chunks: Chunk-Speicher (app.rag.chunk_store.ChunkStore), wird beim Neuladen neu geöffnet
+        generation: Laufende Nummer des Snapshots (erhöht sich bei jedem Neuladen)
+    """
+
+    def __init__(self, index, params: Dict[str, Any], lexical, filters, chunks, generation: int = 0):
+        self.index = index
+        self.params = params
+        self.lexical = lexical
+        self.filters = filters
+        self.chunks = chunks
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.published = 0  # Anzahl der veröffentlichten Schreibvorgänge
+        self._lock = ReadWriteLock()
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        """Sperrt den Stand für eine Suche (blockiert, nicht im Event-Loop aufrufen)"""
+        with self._lock.read():
+            yield
+
+    @contextmanager
+    def publishing(self) -> Iterator[None]:
+        """Wendet einen Schreibvorgang exklusiv an (wartet auf laufende Suchen)"""
+        with self._lock.write():
+            yield
+            self.published += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Kennzahlen des Snapshots"""
+        return {
+            "generation": self.generation,
+            "version": self.params.get("version", 0),
+            "vectors": self.index.ntotal,
+            "shards": len(self.index.shards),
+            "published": self.published,
+            "loaded_at": self.loaded_at
+        }
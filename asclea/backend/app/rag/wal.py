@@ -0,0 +1,128 @@
+# backend/app/rag/wal.py
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rahmen: Magic | Header-Länge | Nutzdaten-Länge | CRC32 über Header und Nutzdaten
+FRAME_MAGIC = b"AWAL"
+FRAME_HEADER = struct.Struct("<4sIII")
+
+class VectorLog:
+    """
+    Append-only Write-Ahead-Log für Änderungen am Vektorindex
+
+    Jede Änderung wird als eigener Rahmen mit Prüfsumme angehängt, bevor sie im
+    Index im Arbeitsspeicher sichtbar wird. Nach einem Absturz werden beim Start
+    alle Rahmen nach dem letzten Snapshot erneut angewendet. Ein unvollständig
+    geschriebener letzter Rahmen wird dabei verworfen.
+    """
+
+    def __init__(self, path: Path, fsync: bool = True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = open(self.path, "ab")
+
+    def append(
+        self,
+        op: str,
+        ids: np.ndarray,
+        vectors: Optional[np.ndarray] = None,
+        shard: Optional[str] = None
+    ):
+        """
+        Hängt eine Änderung an das Log an
+
+        Args:
+            op: Art der Änderung ("add")
+            ids: Vektor-IDs (int64)
+            vectors: Zugehörige Vektoren (float32, n x d), falls vorhanden
+            shard: Ziel-Shard beim Hinzufügen (None = Standard-Shard)
+        """
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        header: Dict[str, Any] = {"op": op, "n": int(len(ids))}
+        if shard is not None:
+            header["shard"] = shard
+        payload = ids.tobytes()
+
+        if vectors is not None:
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            header["d"] = int(vectors.shape[1])
+            payload += vectors.tobytes()
+
+        header_bytes = json.dumps(header).encode("utf-8")
+        crc = zlib.crc32(header_bytes + payload)
+
+        with self._lock:
+            self._file.write(FRAME_HEADER.pack(FRAME_MAGIC, len(header_bytes), len(payload), crc))
+            self._file.write(header_bytes)
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def replay(self) -> Iterator[Tuple[str, np.ndarray, Optional[np.ndarray], Optional[str]]]:
+        """
+        Liest alle vollständigen Rahmen des Logs
+
+        Ein beschädigter oder abgeschnittener Rahmen beendet die Wiedergabe;
+        das Log wird an dieser Stelle gekürzt, damit neue Rahmen lesbar bleiben.
+
+        Yields:
+            Tupel aus (op, ids, vectors, shard)
+        """
+        valid_until = 0
+
+        with open(self.path, "rb") as f:
+            while True:
+                frame_header = f.read(FRAME_HEADER.size)
+                if not frame_header:
+                    break
+                if len(frame_header) < FRAME_HEADER.size:
+                    logger.warning("Unvollständiger Rahmen am Ende des Vektor-Logs verworfen")
+                    break
+
+                magic, header_len, payload_len, crc = FRAME_HEADER.unpack(frame_header)
+                body = f.read(header_len + payload_len)
+                if magic != FRAME_MAGIC or len(body) < header_len + payload_len or zlib.crc32(body) != crc:
+                    logger.warning("Beschädigter Rahmen im Vektor-Log, Wiedergabe wird hier beendet")
+                    break
+
+                header = json.loads(body[:header_len].decode("utf-8"))
+                payload = body[header_len:]
+                n = header["n"]
+                ids = np.frombuffer(payload[:8 * n], dtype=np.int64)
+                vectors = None
+                if "d" in header:
+                    vectors = np.frombuffer(payload[8 * n:], dtype=np.float32).reshape(n, header["d"])
+
+                valid_until = f.tell()
+                yield header["op"], ids, vectors, header.get("shard")
+
+        if valid_until < self.size():
+            with self._lock:
+                self._file.truncate(valid_until)
+
+    def size(self) -> int:
+        """Aktuelle Größe des Logs in Bytes"""
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def reset(self):
+        """Leert das Log, nachdem ein Snapshot geschrieben wurde"""
+        with self._lock:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
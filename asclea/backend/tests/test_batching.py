@@ -0,0 +1,75 @@
+import asyncio
+
+import numpy as np
+
+from app.rag.batching import EmbeddingBatcher
+
+class FakeEmbedder:
+    """Bettet Texte als [Länge, Index des ersten Zeichens] ein und merkt sich die Forward-Passes"""
+
+    def __init__(self):
+        self.calls = []
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        return np.array([[len(text), ord(text[0])] for text in texts], dtype=np.float32)
+
+def _run(coro):
+    return asyncio.run(coro)
+
+def test_explicit_batch_is_encoded_in_one_pass():
+    embedder = FakeEmbedder()
+    texts = [f"frage {i}" for i in range(100)]
+
+    async def main():
+        batcher = EmbeddingBatcher(embedder, max_batch_size=32, max_wait_ms=1)
+        try:
+            return await batcher.encode_many(texts)
+        finally:
+            await batcher.stop()
+
+    embeddings = _run(main())
+
+    assert len(embedder.calls) == 1
+    assert embedder.calls[0] == texts
+    np.testing.assert_array_equal(embeddings, embedder.encode(texts))
+
+def test_concurrent_requests_share_a_pass_and_deduplicate():
+    embedder = FakeEmbedder()
+
+    async def main():
+        batcher = EmbeddingBatcher(embedder, max_batch_size=32, max_wait_ms=50)
+        try:
+            results = await asyncio.gather(
+                batcher.encode("a"), batcher.encode("bb"), batcher.encode_many(["a", "ccc"])
+            )
+            return results, batcher.stats()
+        finally:
+            await batcher.stop()
+
+    (a, bb, many), stats = _run(main())
+
+    assert embedder.calls == [["a", "bb", "ccc"]]
+    assert stats["batches"] == 1 and stats["texts"] == 3
+    np.testing.assert_array_equal(a, [1, ord("a")])
+    np.testing.assert_array_equal(bb, [2, ord("b")])
+    np.testing.assert_array_equal(many, [[1, ord("a")], [3, ord("c")]])
+
+def test_errors_reach_every_waiting_request():
+    class FailingEmbedder(FakeEmbedder):
+        def encode(self, texts, batch_size=32):
+            raise RuntimeError("Modell nicht geladen")
+
+    async def main():
+        batcher = EmbeddingBatcher(FailingEmbedder(), max_wait_ms=1)
+        try:
+            return await asyncio.gather(batcher.encode("a"), batcher.encode_many(["b"]), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    results = _run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
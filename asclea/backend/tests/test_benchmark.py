@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from app.rag.benchmark import (
+    RssSampler, benchmark_index, compare_to_baseline, exact_neighbors, index_configurations, retrieval_quality,
+    synthetic_corpus, synthetic_vectors
+)
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_benchmark_index_runs_for_all_index_types(index_type):
+    vectors, queries = synthetic_vectors(1000, 16, 20, seed=0)
+    relevant = exact_neighbors(vectors, queries, 5, "l2")
+    params = index_configurations([index_type], ["float32"], ["l2"], [], [], len(vectors))[0]
+
+    result = benchmark_index(index_type, vectors, queries, relevant, params, 5, [1, 2], num_shards=2)
+
+    assert result["recall"] > 0.5
+    assert set(result["latency_ms"]) == {"mean", "p50", "p95", "p99"}
+    assert set(result["qps"]) == {"1", "2"}
+    assert result["index_bytes"] > 0
+    assert result["peak_rss_delta_mb"] is None or result["peak_rss_delta_mb"] >= 0
+
+def test_rss_sampler_measures_growth_per_configuration():
+    with RssSampler() as first:
+        data = np.ones(64 * 2**20 // 8)  # 64 MiB
+    del data
+    with RssSampler() as second:
+        pass
+
+    if first.peak_delta_mb is None:
+        pytest.skip("/proc nicht verfügbar")
+    assert first.peak_delta_mb > 48
+    assert second.peak_delta_mb < 16  # nicht das bisherige Prozessmaximum
+
+def test_retrieval_quality():
+    found = np.array([[3, 1, 2], [5, 6, 7]])
+    quality = retrieval_quality(found, [{1, 2}, {9}], k=3)
+
+    assert quality["recall"] == pytest.approx(0.5)
+    assert quality["mrr"] == pytest.approx(0.25)
+
+def test_synthetic_corpus_labels_point_to_matching_documents():
+    texts, queries, relevant = synthetic_corpus(500, 10, seed=0)
+
+    assert len(texts) == 500 and len(queries) == 10
+    for query, labels in zip(queries, relevant):
+        drug = query.split(" bei ")[0].split()[-1]
+        assert all(drug in texts[position] for position in labels)
+
+def test_compare_to_baseline_reports_regressions():
+    baseline = [{"config": "a", "recall": 0.95, "latency_ms": {"p95": 1.0}}]
+    results = [{"config": "a", "recall": 0.90, "latency_ms": {"p95": 1.5}}]
+
+    assert len(compare_to_baseline(results, baseline, 0.01, 0.2)) == 2
+    assert compare_to_baseline(baseline, baseline, 0.01, 0.2) == []
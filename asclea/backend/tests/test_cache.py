@@ -0,0 +1,78 @@
+import numpy as np
+
+from app.rag.cache import EmbeddingCache, LRUCache, SemanticAnswerCache, normalize_query
+
+def test_normalize_query():
+    assert normalize_query("  U\u0308belkeit  nach \n Metformin ") == "\u00dcbelkeit nach Metformin"
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+
+def test_lru_cache_ttl_and_disabled(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.rag.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(max_size=10, ttl_seconds=5)
+    cache.set("a", 1)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+
+    disabled = LRUCache(max_size=0)
+    disabled.set("a", 1)
+    assert disabled.get("a") is None
+
+def test_answer_cache_matches_identical_queries_only_by_default():
+    cache = SemanticAnswerCache(max_size=10, ttl_seconds=0, threshold=1.0)
+    cache.store("Dosis Ibuprofen 400 mg?", np.array([1.0, 0.0, 0.0]), "v1", {"answer": "A"})
+
+    assert cache.lookup(" Dosis  Ibuprofen 400 mg?", np.array([0.0, 1.0, 0.0]), "v1") == {"answer": "A"}
+    assert cache.lookup("Dosis Ibuprofen 600 mg?", np.array([1.0, 0.0, 0.0]), "v1") is None
+    assert cache.lookup("Dosis Ibuprofen 400 mg?", np.array([1.0, 0.0, 0.0]), "v2") is None  # andere Indexversion
+
+    cache.clear()
+    assert cache.lookup("Dosis Ibuprofen 400 mg?", np.array([1.0, 0.0, 0.0]), "v1") is None
+
+def test_semantic_answer_cache_matches_similar_queries():
+    cache = SemanticAnswerCache(max_size=10, ttl_seconds=0, threshold=0.95)
+    cache.store("a", np.array([1.0, 0.0, 0.0]), "v1", {"answer": "A"})
+    cache.store("b", np.array([0.0, 0.0, 1.0]), "v1", {"answer": "B"})
+
+    assert cache.lookup("x", np.array([2.0, 0.1, 0.0]), "v1") == {"answer": "A"}
+    assert cache.lookup("x", np.array([0.0, 1.0, 0.0]), "v1") is None
+    assert cache.lookup("x", np.array([1.0, 0.0, 0.0]), "v2") is None
+
+    cache.store("c", np.array([0.0, 1.0, 0.0]), "v1", {"answer": "C"})  # Gruppe ändert sich nach dem Stapeln
+    assert cache.lookup("x", np.array([0.0, 1.0, 0.1]), "v1") == {"answer": "C"}
+
+def test_semantic_answer_cache_persists_newest_entries(tmp_path):
+    directory = str(tmp_path / "answers")
+    cache = SemanticAnswerCache(max_size=10, ttl_seconds=0, threshold=1.0, directory=directory)
+    for i in range(3):
+        cache.store(f"Frage {i}", np.array([0.0, 1.0]), "v1", {"answer": i})
+    cache._disk.close()
+
+    reopened = SemanticAnswerCache(max_size=2, ttl_seconds=0, threshold=1.0, directory=directory)
+    assert reopened.stats()["size"] == 2
+    assert len(reopened._disk) == 2
+    assert reopened.lookup("Frage 0", np.array([0.0, 1.0]), "v1") is None
+    assert reopened.lookup("Frage 2", np.array([0.0, 1.0]), "v1") == {"answer": 2}
+
+def test_embedding_cache_is_keyed_by_model(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings"), size_limit=2**20)
+    cache.set_many("model-a", ["Text 1", "Text 2"], np.array([[1, 2], [3, 4]], dtype=np.float32))
+
+    found = cache.get_many("model-a", ["Text 2", "Text 3"])
+    assert found[0].tolist() == [3, 4] and found[1] is None
+    assert cache.get_many("model-b", ["Text 1"]) == [None]
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+    cache.close()
@@ -0,0 +1,51 @@
+from app.rag.chunk_store import MAX_SQL_PARAMS, ChunkStore, content_hash, file_content_hash
+
+def test_existing_ids_reports_stored_chunks(tmp_path):
+    store = ChunkStore(tmp_path / "chunks.sqlite3")
+    count = MAX_SQL_PARAMS + 10  # mehrere SQL-Abfragen
+    store.add_many((i, f"Text {i}", {"source_id": 1}) for i in range(0, 2 * count, 2))
+
+    assert store.existing_ids(range(2 * count)) == set(range(0, 2 * count, 2))
+    assert store.existing_ids([]) == set()
+
+    store.delete_many([0, 2])
+    assert store.existing_ids([0, 2, 4]) == {4}
+
+def test_duplicate_chunks_are_referenced_and_transferred(tmp_path):
+    store = ChunkStore(tmp_path / "chunks.sqlite3")
+    store.add_many([
+        (1, "Gemeinsamer Absatz", {"source_id": 10, "page": 1}),
+        (2, "Eigener Absatz", {"source_id": 10, "page": 2}),
+    ])
+
+    digest = content_hash("Gemeinsamer Absatz")
+    assert store.find_hashes([digest, content_hash("Neu")]) == {digest: (1, 10)}
+
+    store.add_refs([(1, 30, {"source_id": 30, "page": 7}), (1, 20, {"source_id": 20, "page": 4})])
+    assert [ref["source_id"] for ref in store.get_many([1])[1]["references"]] == [20, 30]
+    assert store.ref_ids_for_source(20) == [1]
+    assert sorted(store.ref_assignments()) == [(1, 20), (1, 30)]
+    assert store.metadata_for_source(20) == {1: {"source_id": 20, "page": 4}}
+
+    # Quelle 10 wird entfernt: der referenzierte Chunk geht an die kleinste referenzierende Quelle
+    assert store.transfer_referenced(store.ids_for_source(10)) == [(1, 20)]
+    store.delete_many([2])
+
+    assert store.ids_for_source(10) == []
+    chunk = store.get_many([1])[1]
+    assert chunk["metadata"] == {"source_id": 20, "page": 4}
+    assert [ref["source_id"] for ref in chunk["references"]] == [30]
+    assert store.dedup_stats() == {"chunks": 1, "references": 1, "files": 0}
+
+def test_file_hashes_belong_to_first_source(tmp_path):
+    store = ChunkStore(tmp_path / "chunks.sqlite3")
+    path = tmp_path / "leitlinie.txt"
+    path.write_text("Inhalt", encoding="utf-8")
+    digest = file_content_hash(str(path))
+
+    store.set_file(digest, 1)
+    store.set_file(digest, 2)
+    assert store.source_for_file(digest) == 1
+
+    store.remove_files(1)
+    assert store.source_for_file(digest) is None
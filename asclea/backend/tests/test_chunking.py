@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from app.rag.chunking import chunk_blocks, looks_like_heading, make_token_counter, resolve_chunk_tokens, split_sentences
+
+class BorrowCheckingTokenizer:
+    """Verhält sich wie ein schneller HF-Tokenizer: gleichzeitige Aufrufe schlagen fehl"""
+
+    def __init__(self):
+        self.borrowed = False
+        self.calls = 0
+
+    def encode(self, text, add_special_tokens=True):
+        if self.borrowed:
+            raise RuntimeError("Already borrowed")
+        self.borrowed = True
+        try:
+            self.calls += 1
+            time.sleep(0.001)
+            return text.split()
+        finally:
+            self.borrowed = False
+
+def count_words(text):
+    return len(text.split())
+
+@pytest.mark.parametrize("text,expected", [
+    ("Dann 5 mg. Danach weiter.", ["Dann 5 mg.", "Danach weiter."]),
+    ("Gabe von 5 mg. 2 Stunden später erneut.", ["Gabe von 5 mg. 2 Stunden später erneut."]),
+    ("Siehe z.B. Abb. 3. Danach ggf. Kontrolle.", ["Siehe z.B. Abb. 3.", "Danach ggf. Kontrolle."]),
+    ("Therapie nach 30 min. Kontrolle am Folgetag!", ["Therapie nach 30 min.", "Kontrolle am Folgetag!"]),
+    ("Beginn am 12. März 2020. Ende v.a. im Mai.", ["Beginn am 12. März 2020.", "Ende v.a. im Mai."]),
+    ("Der Wert lag bei 12. Danach sank er.", ["Der Wert lag bei 12.", "Danach sank er."]),
+    ("Ein Satz ohne Ende", ["Ein Satz ohne Ende"]),
+])
+def test_split_sentences(text, expected):
+    assert split_sentences(text) == expected
+
+def test_heading_detection():
+    assert looks_like_heading("3.2 Diagnostik")
+    assert not looks_like_heading("3.2 Diagnostik wird beschrieben.")
+    assert not looks_like_heading("Diagnostik")
+
+def test_chunks_respect_budget_and_sections():
+    blocks = [
+        {"text": "Therapie", "heading_level": 1, "metadata": {"page": 1}},
+        {"text": "Eins zwei drei. Vier fünf sechs. Sieben acht neun.", "metadata": {"page": 1}},
+        {"text": "Zehn elf zwölf.", "metadata": {"page": 2}},
+    ]
+
+    chunks = chunk_blocks(blocks, count_words, chunk_tokens=7)
+
+    assert [c["text"] for c in chunks] == [
+        "Therapie\nEins zwei drei. Vier fünf sechs.",
+        "Therapie\nSieben acht neun. Zehn elf zwölf.",
+    ]
+    assert chunks[1]["metadata"] == {"page": 1, "page_end": 2, "section": "Therapie", "chunk": 2}
+
+def test_overlap_uses_whole_sentences():
+    blocks = [{"text": "Aa bb cc. Dd ee. Ff gg hh. Ii jj.", "metadata": {}}]
+
+    chunks = chunk_blocks(blocks, count_words, chunk_tokens=5, overlap_tokens=3)
+
+    assert [c["text"] for c in chunks] == ["Aa bb cc. Dd ee.", "Dd ee. Ff gg hh.", "Ff gg hh. Ii jj."]
+
+def test_overlap_never_starts_inside_a_long_sentence():
+    long_sentence = " ".join(f"w{i}" for i in range(12)) + "."
+    blocks = [{"text": f"{long_sentence} Kurz danach.", "metadata": {}}]
+
+    chunks = chunk_blocks(blocks, count_words, chunk_tokens=5, overlap_tokens=3)
+
+    # Die Teile des überlangen Satzes werden nicht als Überlappung wiederholt
+    assert [c["text"] for c in chunks] == ["w0 w1 w2 w3 w4", "w5 w6 w7 w8 w9", "w10 w11. Kurz danach."]
+
+def test_small_rest_is_merged_into_previous_chunk():
+    blocks = [{"text": "Aa bb cc dd. Ee ff gg hh. Ii.", "metadata": {}}]
+
+    chunks = chunk_blocks(blocks, count_words, chunk_tokens=8, min_tokens=2)
+
+    assert [c["text"] for c in chunks] == ["Aa bb cc dd. Ee ff gg hh. Ii."]
+
+def test_resolve_chunk_tokens():
+    assert resolve_chunk_tokens(200, 512) == 200
+    assert resolve_chunk_tokens(0, 512) == 510
+    assert resolve_chunk_tokens(0, None) == 256
+
+def test_token_counter_does_not_share_tokenizer():
+    tokenizer = BorrowCheckingTokenizer()
+    count_tokens = make_token_counter(tokenizer)
+    errors = []
+
+    def run():
+        try:
+            for _ in range(20):
+                assert count_tokens("ein zwei drei") == 3
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert tokenizer.calls == 0  # Das Embedding-Modell behält seinen Tokenizer für sich
@@ -0,0 +1,104 @@
+import pytest
+
+from app.rag.extraction import extract_document, extract_html, extract_text, iter_table_chunks, page_ranges
+
+def _html(tmp_path, body):
+    path = tmp_path / "page.html"
+    path.write_text(f"<html><head><title>Titel</title></head>{body}</html>", encoding="utf-8")
+    return extract_html(str(path), {"source": "page.html"})[0]
+
+def _texts(blocks):
+    return [block["text"] for block in blocks]
+
+@pytest.mark.parametrize("body", [
+    '<body class="page has-sidebar"><h1>Therapie</h1><p>Dosierung nach Gewicht.</p></body>',
+    '<body><div class="main menu-open"><h1>Therapie</h1><p>Dosierung nach Gewicht.</p></div></body>',
+    '<body><main class="with-sidebar"><h1>Therapie</h1><p>Dosierung nach Gewicht.</p></main></body>',
+])
+def test_html_keeps_content_despite_state_classes(tmp_path, body):
+    blocks = _html(tmp_path, body)
+
+    assert _texts(blocks) == ["Therapie", "Dosierung nach Gewicht."]
+    assert blocks[0]["heading_level"] == 1
+
+def test_html_skips_boilerplate(tmp_path):
+    blocks = _html(tmp_path, """
+        <body>
+          <header><p>Logo und Suche</p></header>
+          <nav><ul><li>Start</li></ul></nav>
+          <div class="sidebar"><p>Weitere Themen</p></div>
+          <div role="contentinfo"><p>Impressum</p></div>
+          <script>var x = 1;</script>
+          <h2>Diagnostik</h2>
+          <ul><li><p>Labor</p></li></ul>
+          <footer><p>Kontakt</p></footer>
+        </body>
+    """)
+
+    assert _texts(blocks) == ["Diagnostik", "Labor"]
+    assert blocks[0]["heading_level"] == 2
+    assert blocks[1]["metadata"] == {"source": "page.html", "element": "p"}
+
+def test_html_keeps_article_header(tmp_path):
+    blocks = _html(tmp_path, """
+        <body>
+          <header><h1>Portal</h1></header>
+          <main><article>
+            <header><h1>Ambulant erworbene Pneumonie</h1><p>Stand: 2024</p></header>
+            <p>Amoxicillin ist Mittel der Wahl.</p>
+          </article></main>
+        </body>
+    """)
+
+    assert _texts(blocks) == ["Ambulant erworbene Pneumonie", "Stand: 2024", "Amoxicillin ist Mittel der Wahl."]
+    assert blocks[0]["heading_level"] == 1
+
+def test_text_detects_headings(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("# Leitlinie\n\nErster Absatz.\n\n## Therapie\nZweiter Absatz.", encoding="utf-8")
+
+    blocks, chunks = extract_text(str(path), {})
+
+    assert chunks == []
+    assert [(b["text"], b.get("heading_level")) for b in blocks] == [
+        ("Leitlinie", 1), ("Erster Absatz.", None), ("Therapie", 2), ("Zweiter Absatz.", None)
+    ]
+
+def test_table_rows_become_chunks(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("Wirkstoff,Dosis\nIbuprofen,400 mg\nParacetamol,500 mg\nASS,100 mg\n", encoding="utf-8")
+
+    chunks = [c for batch in iter_table_chunks(str(path), {"source": "table.csv"}, rows_per_chunk=2) for c in batch]
+
+    assert [c["text"] for c in chunks] == [
+        "Wirkstoff: Ibuprofen | Dosis: 400 mg\nWirkstoff: Paracetamol | Dosis: 500 mg",
+        "Wirkstoff: ASS | Dosis: 100 mg",
+    ]
+    assert chunks[0]["metadata"] == {"source": "table.csv", "row": 1, "row_end": 2}
+    assert chunks[1]["metadata"] == {"source": "table.csv", "row": 3}
+
+def test_xlsx_duplicate_headers_are_numbered(tmp_path):
+    from openpyxl import Workbook
+
+    path = tmp_path / "table.xlsx"
+    workbook = Workbook()
+    workbook.active.append(["Wirkstoff", "Dosis", "Dosis", None])
+    workbook.active.append(["Ibuprofen", "400 mg", "3x täglich", "oral"])
+    workbook.save(path)
+
+    chunks = [c for batch in iter_table_chunks(str(path), {}) for c in batch]
+
+    assert [c["text"] for c in chunks] == [
+        "Wirkstoff: Ibuprofen | Dosis: 400 mg | Dosis.1: 3x täglich | Unnamed: 3: oral"
+    ]
+
+def test_tables_are_not_loaded_completely(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text("Wirkstoff,Dosis\nIbuprofen,400 mg\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        extract_document(str(path), {})
+
+def test_page_ranges():
+    assert page_ranges(7, 3) == [(0, 3), (3, 6), (6, 7)]
+    assert page_ranges(0, 3) == []
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from app.rag.filters import FilterIndex, IdFilter, filter_key, normalize_filters
+
+def test_id_filter_bitmap():
+    mask = np.zeros(20, dtype=bool)
+    mask[[0, 7, 8, 19]] = True
+    id_filter = IdFilter(mask)
+
+    assert id_filter.count == 4
+    assert id_filter.ids().tolist() == [0, 7, 8, 19]
+    assert id_filter.contains(np.array([0, 1, 7, 8, 19, 24, 1000, -1])).tolist() == [
+        True, False, True, True, True, False, False, False
+    ]
+
+def test_normalize_filters():
+    filters = normalize_filters({
+        "source_types": ["guideline", "guideline"], "source_ids": ["3", 1], "publishers": [],
+        "published_from": "2020-01-31T00:00:00"
+    })
+
+    assert filters == {"source_types": ["guideline"], "source_ids": [1, 3], "published_from": "2020-01-31"}
+    assert normalize_filters({"publishers": []}) is None
+    assert filter_key(filters) == filter_key(dict(reversed(list(filters.items()))))
+    with pytest.raises(ValueError):
+        normalize_filters({"language": ["de"]})
+
+def _filter_index():
+    index = FilterIndex()
+    index.set_source(1, "guideline", "DGIM", "2021-05-01")
+    index.set_source(2, "textbook", "Thieme", None)
+    index.set_source(3, "guideline", "DEGAM", "2015-01-01")
+    index.assign(range(9), [1, 1, 2, 2, 3, 3, None, 1, 3])
+    return index
+
+def test_resolve_combines_filters():
+    index = _filter_index()
+
+    def allowed(filters):
+        return index.resolve(normalize_filters(filters)).ids().tolist()
+
+    assert index.resolve(None) is None
+    assert allowed({"source_types": ["guideline"]}) == [0, 1, 4, 5, 7, 8]
+    assert allowed({"source_types": ["guideline"], "published_from": "2020-01-01"}) == [0, 1, 7]
+    assert allowed({"published_to": "2030-01-01"}) == [0, 1, 4, 5, 7, 8]  # Quellen ohne Datum fallen heraus
+    assert allowed({"publishers": ["Thieme"], "source_ids": [2, 3]}) == [2, 3]
+
+def test_changes_invalidate_cached_bitmaps():
+    index = _filter_index()
+    filters = normalize_filters({"source_ids": [2]})
+    assert index.resolve(filters).ids().tolist() == [2, 3]
+
+    index.unassign([2])
+    assert index.resolve(filters).ids().tolist() == [3]
+
+    index.assign([20], [2])
+    assert index.resolve(filters).ids().tolist() == [3, 20]
+
+    index.remove_source(2)
+    assert index.resolve(filters).count == 0
+
+def test_filter_includes_referenced_chunks():
+    index = _filter_index()
+    index.set_source(4, "guideline", "DGIM", "2022-01-01")
+    filters = normalize_filters({"source_ids": [4]})
+    assert index.resolve(filters).count == 0
+
+    # Quelle 4 enthält dieselben Absätze wie die Chunks 4 und 5 von Quelle 3
+    index.add_refs(4, [4, 5])
+    assert index.resolve(filters).ids().tolist() == [4, 5]
+    assert index.resolve(normalize_filters({"publishers": ["DGIM"]})).ids().tolist() == [0, 1, 4, 5, 7]
+
+    index.remove_refs(4, [4])
+    assert index.resolve(filters).ids().tolist() == [5]
+    index.unassign([5])
+    assert index.resolve(filters).count == 0
+    assert 4 not in index.refs
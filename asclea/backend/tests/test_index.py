@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from app.rag.index import (
+    build_index, default_index_params, distances_to_scores, exact_search, fit_params_to_data, get_ids,
+    prepare_vectors, reconstruct_all, remove_ids
+)
+
+def _params(index_type, storage="float32", metric="l2"):
+    return dict(default_index_params(index_type), metric=metric, storage=storage)
+
+@pytest.mark.parametrize("index_type,storage", [("ivf_flat", "float32"), ("ivf_pq", "float32"), ("flat", "sq8")])
+def test_fit_params_without_vectors_falls_back_to_flat(index_type, storage):
+    params = fit_params_to_data(_params(index_type, storage), 0)
+
+    assert params["index_type"] == "flat"
+    assert params["storage"] in ("float32", "fp16")
+    assert build_index(np.zeros((0, 8), dtype=np.float32), params).ntotal == 0
+
+def test_fit_params_limits_nlist():
+    params = fit_params_to_data(dict(_params("ivf_flat"), nlist=1024), 390)
+
+    assert params["nlist"] == 10
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_build_reconstruct_and_remove_keep_ids(index_type):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 8)).astype(np.float32)
+    ids = np.arange(1000, 1500, dtype=np.int64)
+    params = fit_params_to_data(_params(index_type), len(vectors))
+
+    index = build_index(vectors, params, ids)
+    found_ids, found_vectors = reconstruct_all(index)
+    order = np.argsort(found_ids)
+    np.testing.assert_array_equal(found_ids[order], ids)
+    np.testing.assert_allclose(found_vectors[order], vectors, rtol=1e-5)
+
+    index = remove_ids(index, ids[:100], params)
+    assert sorted(get_ids(index).tolist()) == ids[100:].tolist()
+
+def test_exact_search_matches_faiss_and_scores():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    for metric in ("l2", "ip"):
+        params = _params("flat", metric=metric)
+        prepared = prepare_vectors(vectors, params)
+        index = build_index(prepared, params)
+        D, I = index.search(prepared[:5], 3)
+        D_exact, I_exact = exact_search(prepared, np.arange(100), prepared[:5], 3, params)
+
+        np.testing.assert_array_equal(I, I_exact)
+        np.testing.assert_allclose(D, D_exact, rtol=1e-4, atol=1e-4)
+        scores = distances_to_scores(D, params)
+        assert ((scores >= 0) & (scores <= 1)).all()
@@ -0,0 +1,51 @@
+import numpy as np
+
+from app.rag.filters import IdFilter
+from app.rag.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+def test_tokenize_keeps_numbers_and_drops_stopwords():
+    assert tokenize("Die Leitlinie 013-001 empfiehlt 2,5 mg und mehr") == ["leitlinie", "013-001", "empfiehlt", "2,5", "mg", "mehr"]
+
+def _index():
+    index = BM25Index()
+    index.add_many([
+        (1, "Metformin ist Mittel der ersten Wahl bei Diabetes"),
+        (2, "Insulin bei Diabetes Typ 1"),
+        (3, "Hypertonie wird mit ACE-Hemmern behandelt"),
+        (4, "Diabetes Diabetes Diabetes Schulung"),
+    ])
+    return index
+
+def test_search_ranks_by_bm25():
+    index = _index()
+
+    results = index.search("Metformin Diabetes", top_k=3)
+
+    assert results[0][0] == 1
+    assert {doc_id for doc_id, _ in results} == {1, 2, 4}
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert index.search("Leber", top_k=3) == []
+
+def test_search_with_filter_and_removal(tmp_path):
+    index = _index()
+    mask = np.zeros(5, dtype=bool)
+    mask[[2, 3]] = True
+
+    assert [doc_id for doc_id, _ in index.search("Diabetes", 5, IdFilter(mask))] == [2]
+
+    index.remove_many([2, 4])
+    assert [doc_id for doc_id, _ in index.search("Diabetes", 5)] == [1]
+    assert len(index) == 2
+
+    index.save(tmp_path / "bm25_index.pkl")
+    loaded = BM25Index.load(tmp_path / "bm25_index.pkl")
+    assert loaded.search("Diabetes", 5) == index.search("Diabetes", 5)
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], weights=[1.0, 1.0], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == 1 / 61 + 1 / 62
+
+    weighted = reciprocal_rank_fusion([[1, 2], [2, 1]], weights=[1.0, 3.0], k=0)
+    assert weighted[0][0] == 2
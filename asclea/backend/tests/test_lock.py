@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+import pytest
+
+from app.rag.lock import DirectoryLock
+
+def _lock_in_other_process(path):
+    code = (
+        "import sys; from app.rag.lock import DirectoryLock\n"
+        "try:\n"
+        f"    DirectoryLock({str(path)!r}).acquire()\n"
+        "except RuntimeError:\n"
+        "    sys.exit(3)\n"
+    )
+    return subprocess.run([sys.executable, "-c", code]).returncode
+
+def test_lock_excludes_other_processes(tmp_path):
+    path = tmp_path / "vector_db" / ".lock"
+    lock = DirectoryLock(path)
+    lock.acquire()
+    lock.acquire()  # im selben Prozess gezählt
+
+    assert lock.locked
+    assert _lock_in_other_process(path) == 3
+
+    lock.release()
+    assert lock.locked
+    assert _lock_in_other_process(path) == 3
+
+    lock.release()
+    assert not lock.locked
+    assert _lock_in_other_process(path) == 0
+
+def test_lock_error_names_owner(tmp_path):
+    path = tmp_path / ".lock"
+    DirectoryLock(path).acquire()
+
+    with pytest.raises(RuntimeError, match=r"PID \d+"):
+        DirectoryLock(path).acquire()
+
+def test_generation_counts_changes_across_processes(tmp_path):
+    path = tmp_path / ".lock"
+    writer = DirectoryLock(path)
+    writer.acquire()
+    writer.acquire()
+    writer.release(changed=True)
+    writer.release()  # erst das endgültige Freigeben zählt die Änderung
+    writer.acquire()
+    writer.release()  # ohne Änderung bleibt der Zähler
+
+    reader = DirectoryLock(path)
+    reader.acquire()
+    reader.release()
+
+    assert writer.generation == 1
+    assert reader.generation == 1
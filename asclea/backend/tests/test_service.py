@@ -0,0 +1,273 @@
+import asyncio
+import sys
+import types
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.models import Base, MedicalSource
+from app.rag import service
+from app.rag.cache import LRUCache
+from app.rag.chunk_store import ChunkStore
+from app.rag.filters import FilterIndex
+from app.rag.wal import VectorLog
+
+DIMENSION = 64
+
+METFORMIN = """# Metformin
+
+Metformin ist Mittel der ersten Wahl bei Typ-2-Diabetes und wird einschleichend dosiert.
+
+# Kontraindikationen
+
+Bei schwerer Niereninsuffizienz darf Metformin nicht gegeben werden.
+"""
+
+INSULIN = """# Insulin
+
+Insulin glargin wird einmal täglich zur gleichen Uhrzeit injiziert.
+
+# Kontraindikationen
+
+Bei schwerer Niereninsuffizienz darf Metformin nicht gegeben werden.
+"""
+
+class FakeEmbedder:
+    """Bag-of-Words-Embeddings: Texte mit gemeinsamen Wörtern liegen nahe beieinander"""
+
+    name = "fake"
+    max_seq_length = 256
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, batch_size=32):
+        embeddings = np.zeros((len(texts), DIMENSION), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[row, zlib.crc32(word.strip(".,?!").encode("utf-8")) % DIMENSION] += 1.0
+        return embeddings
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    """RAG-Service mit Fake-Embedder, eigenem Vektorverzeichnis und eigener Datenbank"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    for name, value in {
+        "VECTOR_DB_PATH": str(tmp_path / "vector_db"),
+        "VECTOR_INDEX_TYPE": "flat",
+        "VECTOR_METRIC": "l2",
+        "VECTOR_STORAGE": "float32",
+        "SHARD_BY": "",
+        "EMBEDDING_CACHE_DIR": "",
+        "ANSWER_CACHE_SIZE": 0,
+        "ANSWER_CACHE_DIR": "",
+        "RERANKER_MODEL": "",
+        "EXTRACTION_WORKERS": 0,
+        "CHUNK_TOKENS": 0,
+        "CHUNK_OVERLAP_TOKENS": 0,
+        "WAL_FSYNC": False,
+        "HYBRID_SEARCH": True,
+        "DENSE_MIN_SCORE": 0.0,
+    }.items():
+        monkeypatch.setattr(service.settings, name, value)
+
+    monkeypatch.setattr(service, "create_embedder", FakeEmbedder)
+    monkeypatch.setattr(service, "SessionLocal", session_factory)
+    for name, value in {
+        "vector_db_lock": None,
+        "loaded_generation": None,
+        "index_snapshot": None,
+        "vector_log": None,
+        "embedding_cache": None,
+        "next_vector_id": 0,
+        "filter_index": FilterIndex(),
+        "query_embedding_cache": LRUCache(128),
+        "lexical_search_executor": ThreadPoolExecutor(thread_name_prefix="bm25-search"),
+        "dedup_stats": {"files": 0, "chunks": 0},
+    }.items():
+        monkeypatch.setattr(service, name, value)
+
+    rag = types.SimpleNamespace(session=session_factory(), path=tmp_path)
+    yield rag
+    rag.session.close()
+
+def _run(rag, test):
+    async def main():
+        await service.initialize_rag_service()
+        try:
+            return await test()
+        finally:
+            await service.shutdown_rag_service()
+
+    return asyncio.run(main())
+
+def _add_source(rag, title, text, **attributes):
+    path = rag.path / f"{title}.md"
+    path.write_text(text, encoding="utf-8")
+    source = MedicalSource(title=title, source_type="guideline", local_path=str(path), **attributes)
+    rag.session.add(source)
+    rag.session.commit()
+    return source.id
+
+def test_identical_files_and_chunks_are_referenced_not_embedded(rag):
+    first = _add_source(rag, "metformin", METFORMIN)
+    copy = _add_source(rag, "metformin_kurz", METFORMIN)
+    insulin = _add_source(rag, "insulin", INSULIN)
+
+    async def test():
+        await service.process_document(first, rag.session)
+        assert service.vector_index.ntotal == 2
+
+        await service.process_document(copy, rag.session)
+        assert service.vector_index.ntotal == 2  # Identische Datei: nur Referenzen
+        assert service.dedup_stats["files"] == 1
+
+        await service.process_document(insulin, rag.session)
+        assert service.vector_index.ntotal == 3  # Nur der neue Abschnitt wird eingebettet
+        shared = service.chunk_store.ref_ids_for_source(insulin)
+        assert len(shared) == 1
+
+        # Der geteilte Chunk wird auch mit dem Filter der referenzierenden Quelle gefunden
+        hits = await service.semantic_search("Niereninsuffizienz", top_k=5, filters={"source_ids": [insulin]})
+        assert shared[0] in [hit["id"] for hit in hits]
+        hit = next(hit for hit in hits if hit["id"] == shared[0])
+        assert {ref["source_id"] for ref in hit["references"]} == {copy, insulin}
+
+    _run(rag, test)
+
+def test_removing_a_source_transfers_referenced_chunks(rag):
+    first = _add_source(rag, "metformin", METFORMIN)
+    copy = _add_source(rag, "metformin_kurz", METFORMIN)
+
+    async def test():
+        await service.process_document(first, rag.session)
+        await service.process_document(copy, rag.session)
+        ids = service.chunk_store.ids_for_source(first)
+        version = service.index_params["version"]
+
+        removed = await service.remove_source_vectors(first)
+
+        assert removed == 0  # Alle Chunks gehen an die Kopie über
+        assert service.vector_index.ntotal == 2
+        assert sorted(service.chunk_store.ids_for_source(copy)) == sorted(ids)
+        assert service.chunk_store.ref_ids_for_source(copy) == []
+        assert service.index_params["version"] > version
+        hits = await service.semantic_search("Metformin", top_k=5, filters={"source_ids": [copy]})
+        assert sorted(hit["id"] for hit in hits) == sorted(ids)
+        assert await service.semantic_search("Metformin", top_k=5, filters={"source_ids": [first]}) == []
+
+        removed = await service.remove_source_vectors(copy)
+
+        assert removed == 2
+        assert service.vector_index.ntotal == 0
+        assert service.chunk_store.count() == 0
+
+    _run(rag, test)
+
+def test_remove_source_with_only_references_changes_version(rag):
+    first = _add_source(rag, "metformin", METFORMIN)
+    copy = _add_source(rag, "metformin_kurz", METFORMIN)
+
+    async def test():
+        await service.process_document(first, rag.session)
+        await service.process_document(copy, rag.session)
+        version = service.index_params["version"]
+
+        assert await service.remove_source_vectors(copy) == 0
+        assert service.index_params["version"] > version
+        assert service.chunk_store.ref_ids_for_source(copy) == []
+        assert service.vector_index.ntotal == 2
+
+    _run(rag, test)
+
+def test_replay_drops_vectors_without_chunks_and_deletes_removed_chunks(rag, tmp_path):
+    vector_db_path = tmp_path / "replay"
+    vector_db_path.mkdir()
+    chunks = ChunkStore(vector_db_path / "chunks.sqlite3")
+    chunks.add_many([(1, "Metformin", {}), (2, "Insulin", {})])
+    log = VectorLog(vector_db_path / "faiss_index.wal", fsync=False)
+    vectors = FakeEmbedder().encode(["Metformin", "Insulin", "Ramipril"])
+    log.append("add", np.array([1, 2, 3], dtype=np.int64), vectors)  # Chunk 3 wurde nie gespeichert
+    log.append("remove", np.array([2], dtype=np.int64))
+
+    index, params = service._new_vector_index(vector_db_path, DIMENSION)
+    replayed = service._replay_vector_log(index, params, log, chunks)
+
+    assert replayed == 2
+    assert index.get_ids().tolist() == [1]
+    assert chunks.existing_ids([1, 2, 3]) == {1}
+    assert params["version"] == 2
+    log.close()
+
+def test_hybrid_search_finds_exact_terms(rag, monkeypatch):
+    async def test():
+        await service.add_texts_to_index([
+            {"text": "Registernummer 053-001 Leitlinie Husten", "metadata": {"source_id": 1}},
+            {"text": "Husten bei Erwachsenen Therapie Husten Husten", "metadata": {"source_id": 2}},
+            {"text": "Herzinsuffizienz Therapie mit Ramipril", "metadata": {"source_id": 3}},
+        ])
+
+        hits = await service.semantic_search("053-001", top_k=3)
+
+        assert hits[0]["text"].startswith("Registernummer 053-001")
+        assert 0 < hits[-1]["score"] <= hits[0]["score"] <= 1
+
+        monkeypatch.setattr(service.settings, "HYBRID_SEARCH", False)
+        dense = await service.semantic_search("053-001", top_k=3)
+        assert len(dense) == 3
+
+    _run(rag, test)
+
+def test_invalid_filters_raise_instead_of_empty_results(rag):
+    async def test():
+        await service.add_texts_to_index([{"text": "Metformin bei Diabetes", "metadata": {"source_id": 1}}])
+        with pytest.raises(ValueError):
+            await service.semantic_search_many(["Metformin"], filters={"unbekannt": [1]})
+
+    _run(rag, test)
+
+def test_rag_response_packs_context_within_budget(rag, monkeypatch):
+    prompts = []
+
+    async def generate_llm_response(prompt, temperature, max_tokens):
+        prompts.append(prompt)
+        return {"text": "Antwort", "total_tokens": 42}
+
+    def count_tokens(text):
+        return len(text.split())
+
+    query = "Metformin Dosierung"
+    empty_prompt_tokens = count_tokens(service.create_rag_prompt(query, "", None))
+    llm = types.ModuleType("app.llm.service")
+    llm.count_tokens = count_tokens
+    llm.generate_llm_response = generate_llm_response
+    llm.get_context_size = lambda: empty_prompt_tokens + 10 + 16  # Platz für zwei Treffer
+    monkeypatch.setitem(sys.modules, "app.llm.service", llm)
+    monkeypatch.setattr(service.settings, "RAG_MAX_ANSWER_TOKENS", 10)
+    monkeypatch.setattr(service.settings, "CONTEXT_SAFETY_TOKENS", 0)
+
+    async def test():
+        await service.add_texts_to_index([
+            {"text": "Metformin Dosierung einschleichend mit 500 mg", "metadata": {"source_id": 1, "source_title": "A"}},
+            {"text": "Dosierung Metformin einschleichend mit 500 mg", "metadata": {"source_id": 2, "source_title": "B"}},
+            {"text": "Metformin Dosierung bei Niereninsuffizienz reduzieren", "metadata": {"source_id": 3, "source_title": "C"}},
+            {"text": "Metformin Dosierung maximal 3000 mg täglich", "metadata": {"source_id": 4, "source_title": "D"}},
+        ])
+        return await service.generate_rag_response(query)
+
+    response = _run(rag, test)
+
+    assert response["answer"] == "Antwort"
+    assert response["tokens_used"] == 42
+    context = prompts[0]
+    # Inhaltsgleiche Treffer (gleiches Embedding) nur einmal, höchstens zwei Treffer im Budget
+    assert context.count("einschleichend mit 500 mg") <= 1
+    assert context.count("Information:") == 2
+    assert len(response["sources"]) == 2
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from app.rag.filters import IdFilter
+from app.rag.index import create_index, default_index_params, exact_search, fit_params_to_data
+from app.rag.shards import DEFAULT_SHARD, ShardedIndex
+
+DIMENSION = 16
+
+def _sharded_index(tmp_path, index_type, num_vectors):
+    params = fit_params_to_data(dict(default_index_params(index_type), metric="l2", storage="float32"), num_vectors)
+    index = ShardedIndex(tmp_path, DIMENSION, lambda: (create_index(DIMENSION, params), params))
+    return index, params
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_filtered_search_with_large_subset(tmp_path, index_type):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(5000, DIMENSION)).astype(np.float32)
+    ids = np.arange(5000, dtype=np.int64)
+    index, params = _sharded_index(tmp_path, index_type, len(vectors))
+    if index_type == "ivf_flat":
+        shard = create_index(DIMENSION, params)
+        shard.train(vectors)
+        index.attach(DEFAULT_SHARD, shard, params)
+    index.add(DEFAULT_SHARD, vectors, ids)
+
+    mask = np.zeros(len(ids), dtype=bool)
+    mask[::2] = True  # 2500 erlaubte Vektoren, mehr als FILTER_EXACT_MAX
+    id_filter = IdFilter(mask)
+    queries = vectors[:20] + 0.01
+
+    _, I = index.search(queries, 5, id_filter)
+
+    assert (I != -1).all()
+    assert mask[I].all()
+    if index_type == "flat":
+        allowed = ids[mask]
+        _, expected = exact_search(vectors[mask], allowed, queries, 5, params)
+        np.testing.assert_array_equal(I, expected)
+
+def test_search_merges_shards(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(200, DIMENSION)).astype(np.float32)
+    index, params = _sharded_index(tmp_path, "flat", len(vectors))
+    index.add(DEFAULT_SHARD, vectors[:100], np.arange(100))
+    index.add("leitlinien", vectors[100:], np.arange(100, 200))
+
+    _, I = index.search(vectors[[5, 150]], 1)
+
+    assert I[:, 0].tolist() == [5, 150]
+
+def test_rebuild_keeps_empty_shard_searchable(tmp_path):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(2000, DIMENSION)).astype(np.float32)
+    index, _ = _sharded_index(tmp_path, "flat", len(vectors))
+    index.load(DEFAULT_SHARD)  # Standard-Shard bleibt leer (z.B. bei SHARD_BY)
+    index.add("guideline", vectors, np.arange(2000))
+
+    ivf_params = dict(default_index_params("ivf_flat"), metric="l2", storage="float32")
+    empty_params = index.rebuild(DEFAULT_SHARD, ivf_params)
+    shard_params = index.rebuild("guideline", ivf_params)
+
+    assert empty_params["index_type"] == "flat"
+    assert shard_params["index_type"] == "ivf_flat"
+    _, I = index.search(vectors[:3], 1)
+    assert I[:, 0].tolist() == [0, 1, 2]
+
+def test_save_and_reload_shards(tmp_path):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(50, DIMENSION)).astype(np.float32)
+    index, _ = _sharded_index(tmp_path, "flat", len(vectors))
+    index.add(DEFAULT_SHARD, vectors[:20], np.arange(20))
+    index.add("leitlinien", vectors[20:], np.arange(20, 50))
+    index.save()
+
+    reloaded, _ = _sharded_index(tmp_path, "flat", len(vectors))
+    for key in reloaded.available_keys():
+        reloaded.load(key, create=False)
+
+    assert reloaded.available_keys() == [DEFAULT_SHARD, "leitlinien"]
+    assert reloaded.ntotal == 50
+    assert reloaded.contains(np.array([5, 40])).all()
+
+def test_hnsw_remove_rebuilds_outside_write_lock(tmp_path, monkeypatch):
+    import threading
+    from app.rag import shards
+
+    rng = np.random.default_rng(4)
+    vectors = rng.normal(size=(300, DIMENSION)).astype(np.float32)
+    index, _ = _sharded_index(tmp_path, "hnsw", len(vectors))
+    index.add(DEFAULT_SHARD, vectors, np.arange(300))
+
+    searched = []
+    build_index = shards.build_index
+
+    def build_while_searching(*args, **kwargs):
+        # Eine Suche aus einem anderen Thread darf während des Neuaufbaus nicht blockieren
+        thread = threading.Thread(target=lambda: searched.append(index.search(vectors[:1], 1)))
+        thread.start()
+        thread.join(timeout=5)
+        return build_index(*args, **kwargs)
+
+    monkeypatch.setattr(shards, "build_index", build_while_searching)
+    assert index.remove(np.arange(100)) == 100
+
+    assert len(searched) == 1
+    assert index.shards[DEFAULT_SHARD].ntotal == 200
+    _, I = index.search(vectors[150:151], 1)
+    assert I[0, 0] == 150
+    assert not index.contains(np.array([0]))[0]
@@ -0,0 +1,80 @@
+import threading
+import time
+
+from app.rag.snapshot import ReadWriteLock
+
+def test_writer_waits_for_readers_and_may_reenter():
+    lock = ReadWriteLock()
+    events = []
+
+    def writer():
+        with lock.write():
+            with lock.read():  # Schreiber darf erneut lesend sperren
+                events.append("write")
+
+    with lock.read():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time.sleep(0.05)
+        events.append("read done")
+    thread.join(timeout=2)
+
+    assert events == ["read done", "write"]
+
+def test_waiting_writer_blocks_new_readers():
+    lock = ReadWriteLock()
+    events = []
+    first_reader = threading.Event()
+    release_first = threading.Event()
+
+    def reader(name, started=None, release=None):
+        with lock.read():
+            if started:
+                started.set()
+            if release:
+                release.wait(2)
+            events.append(name)
+
+    def writer():
+        with lock.write():
+            events.append("writer")
+
+    threads = [threading.Thread(target=reader, args=("reader 1", first_reader, release_first))]
+    threads[0].start()
+    first_reader.wait(2)
+    threads.append(threading.Thread(target=writer))
+    threads[1].start()
+    time.sleep(0.05)
+    threads.append(threading.Thread(target=reader, args=("reader 2",)))
+    threads[2].start()
+    time.sleep(0.05)
+    release_first.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert events == ["reader 1", "writer", "reader 2"]
+
+def test_search_sees_publication_completely_or_not_at_all():
+    from app.rag.snapshot import IndexSnapshot
+
+    vectors, chunks = [], []
+    snapshot = IndexSnapshot(vectors, {}, chunks, None, None)
+    torn = []
+
+    def writer():
+        for number in range(50):
+            with snapshot.publishing():
+                vectors.append(number)
+                time.sleep(0.001)
+                chunks.append(number)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    while thread.is_alive():
+        with snapshot.reading():
+            if len(vectors) != len(chunks):
+                torn.append((len(vectors), len(chunks)))
+    thread.join()
+
+    assert torn == []
+    assert snapshot.published == 50
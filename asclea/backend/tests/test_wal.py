@@ -0,0 +1,60 @@
+import numpy as np
+
+from app.rag.wal import VectorLog
+
+def _entries(log):
+    return [(op, ids.tolist(), None if vectors is None else vectors.tolist(), shard) for op, ids, vectors, shard in log.replay()]
+
+def test_replay_returns_appended_entries(tmp_path):
+    log = VectorLog(tmp_path / "faiss_index.wal", fsync=False)
+    vectors = np.arange(6, dtype=np.float32).reshape(3, 2)
+    log.append("add", np.array([1, 2, 3]), vectors)
+    log.append("add", np.array([4]), vectors[:1], shard="leitlinien")
+    log.append("remove", np.array([2]))
+    log.close()
+
+    assert _entries(VectorLog(tmp_path / "faiss_index.wal")) == [
+        ("add", [1, 2, 3], vectors.tolist(), None),
+        ("add", [4], [[0.0, 1.0]], "leitlinien"),
+        ("remove", [2], None, None),
+    ]
+
+def test_torn_tail_is_dropped_and_truncated(tmp_path):
+    path = tmp_path / "faiss_index.wal"
+    log = VectorLog(path, fsync=False)
+    log.append("add", np.array([1]), np.ones((1, 4), dtype=np.float32))
+    valid_size = log.size()
+    log.append("add", np.array([2]), np.ones((1, 4), dtype=np.float32))
+    log.close()
+    with open(path, "r+b") as f:  # Absturz während des zweiten Rahmens
+        f.truncate(valid_size + 10)
+
+    log = VectorLog(path, fsync=False)
+    assert [ids.tolist() for _, ids, _, _ in log.replay()] == [[1]]
+    assert log.size() == valid_size
+
+    log.append("remove", np.array([1]))
+    assert [op for op, _, _, _ in log.replay()] == ["add", "remove"]
+
+def test_corrupt_frame_stops_replay(tmp_path):
+    path = tmp_path / "faiss_index.wal"
+    log = VectorLog(path, fsync=False)
+    log.append("add", np.array([1]), np.ones((1, 2), dtype=np.float32))
+    valid_size = log.size()
+    log.append("add", np.array([2]), np.ones((1, 2), dtype=np.float32))
+    log.close()
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF  # Prüfsumme des zweiten Rahmens stimmt nicht mehr
+    path.write_bytes(bytes(data))
+
+    log = VectorLog(path, fsync=False)
+    assert [ids.tolist() for _, ids, _, _ in log.replay()] == [[1]]
+    assert log.size() == valid_size
+
+def test_reset_empties_log(tmp_path):
+    log = VectorLog(tmp_path / "faiss_index.wal", fsync=False)
+    log.append("remove", np.array([7]))
+    log.reset()
+
+    assert log.size() == 0
+    assert _entries(log) == []